@@ -8,11 +8,11 @@ from flask_migrate import Migrate
 from flask_wtf.csrf import CSRFProtect, generate_csrf
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
-from flask_caching import Cache
 
 from .models import db, User
 from config import config
-from .services import claude_service
+from .services import claude_service, job_queue, rate_governor, ingestion_queue
+from .caching import cache, init_cache
 
 # Initialize extensions
 login_manager = LoginManager()
@@ -23,7 +23,6 @@ socketio = SocketIO()
 csrf = CSRFProtect()
 migrate = Migrate()
 limiter = Limiter(key_func=get_remote_address, default_limits=["200 per day", "50 per hour"])
-cache = Cache()
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -43,6 +42,9 @@ def create_app(config_name='default'):
     limiter.init_app(app)
     
     claude_service.init_app(app)
+    job_queue.init_app(app)
+    rate_governor.init_app(app)
+    ingestion_queue.init_app(app)
 
     app.logger.handlers.clear()
     app.logger.propagate = False
@@ -121,9 +123,7 @@ def create_app(config_name='default'):
     
     from . import socket_events
 
-    app.config.setdefault('CACHE_TYPE', 'SimpleCache') 
-    app.config.setdefault('CACHE_DEFAULT_TIMEOUT', 300)
-    cache.init_app(app)
+    init_cache(app)
     
     @app.route('/')
     def index_route(): 
@@ -5,36 +5,82 @@ from . import data
 from .forms import UploadDatasetForm, ShareDatasetForm
 from ...models import db, Dataset, Share, User
 from ...services.data_processor import DataProcessor
-from ... import cache
+from ...caching import user_cached, invalidate_user, invalidate_dataset
+from ...permissions import dataset_access_or_404, visualisation_access_many
+from ...pagination import keyset_page, request_page, page_size, InvalidCursor
 import os
 
 # Initialize the data processor service
 data_processor = DataProcessor()
 
+# Columns of a dataset listing entry, selected as rows instead of whole Dataset
+# objects so that listings do not load stored profiles
+LISTING_COLUMNS = (
+    Dataset.id, Dataset.original_filename, Dataset.file_type, Dataset.n_rows, Dataset.n_columns,
+    Dataset.is_public, Dataset.status, Dataset.uploaded_at
+)
+
+def _listing_entry(row):
+    return {
+        'id': row.id,
+        'filename': row.original_filename,
+        'file_type': row.file_type,
+        'n_rows': row.n_rows,
+        'n_columns': row.n_columns,
+        'is_public': row.is_public,
+        'status': row.status,
+        'uploaded_at': row.uploaded_at.isoformat()
+    }
+
+# Datasets per section of the datasets page
+INDEX_PAGE_SIZE = 12
+
+def _shared_with_user():
+    return db.exists().where(
+        Share.target_id == current_user.id,
+        Share.object_type == 'dataset',
+        Share.object_id == Dataset.id
+    )
+
+def _api_page(query):
+    """Keyset page of a dataset listing for the ``cursor`` and ``limit`` query arguments."""
+    return keyset_page(query, Dataset.uploaded_at, Dataset.id, request.args.get('cursor'), page_size())
+
 @data.route('/')
 @login_required
 def index():
     """Display the user's datasets."""
-    # Get user's datasets
-    user_datasets = Dataset.query.filter_by(user_id=current_user.id).order_by(Dataset.uploaded_at.desc()).all()
-    
-    # Get datasets shared with the user
-    shared_datasets = db.session.query(Dataset).\
-        select_from(Share).\
-        join(Dataset, Share.object_id == Dataset.id).\
-        filter(
-            Share.target_id == current_user.id,
-            Share.object_type == 'dataset'
-        ).order_by(Dataset.uploaded_at.desc()).all()
-    
-    # Get public datasets (excluding user's own and already shared)
-    user_dataset_ids = [ds.id for ds in user_datasets]
-    shared_dataset_ids = [ds.id for ds in shared_datasets]
-    public_datasets = Dataset.query.filter(
-        Dataset.is_public == True,
-        Dataset.user_id != current_user.id,
-        ~Dataset.id.in_(shared_dataset_ids)
-    ).order_by(Dataset.uploaded_at.desc()).all()
+    # Each section is paginated on its own (?cursor=, ?shared_cursor=, ?public_cursor=)
+    user_datasets = request_page(
+        db.session.query(*LISTING_COLUMNS).filter(Dataset.user_id == current_user.id),
+        Dataset.uploaded_at, Dataset.id, limit=INDEX_PAGE_SIZE
+    )
+    
+    # Get datasets shared with the user (owner names selected in the same query)
+    shared_datasets = request_page(
+        db.session.query(*LISTING_COLUMNS, User.name.label('owner_name')).\
+            select_from(Share).\
+            join(Dataset, Share.object_id == Dataset.id).\
+            join(User, Dataset.user_id == User.id).\
+            filter(
+                Share.target_id == current_user.id,
+                Share.object_type == 'dataset'
+            ),
+        Dataset.uploaded_at, Dataset.id, arg='shared_cursor', limit=INDEX_PAGE_SIZE
+    )
+    
+    # Get public datasets (excluding user's own and those shared with the user)
+    public_datasets = request_page(
+        db.session.query(*LISTING_COLUMNS, User.name.label('owner_name')).\
+            select_from(Dataset).\
+            join(User, Dataset.user_id == User.id).\
+            filter(
+                Dataset.is_public == True,
+                Dataset.user_id != current_user.id,
+                ~_shared_with_user()
+            ),
+        Dataset.uploaded_at, Dataset.id, arg='public_cursor', limit=INDEX_PAGE_SIZE
+    )
     
     return render_template(
         'data/index.html',
@@ -51,14 +97,19 @@ def upload():
     form = UploadDatasetForm()
     if form.validate_on_submit():
         try:
-            # Process the uploaded file
+            # Save the file and queue it for background ingestion
             dataset = data_processor.process(
                 form.file.data,
                 current_user.id,
                 form.is_public.data
             )
             
-            flash('Dataset uploaded successfully!', 'success')
+            if dataset.status == 'failed':
+                flash(f'Error uploading dataset: {dataset.error_message}', 'danger')
+            elif dataset.status == 'ready':
+                flash('Dataset uploaded successfully!', 'success')
+            else:
+                flash('Dataset uploaded! It is being processed in the background.', 'info')
             return redirect(url_for('data.view', id=dataset.id))
         
         except Exception as e:
@@ -70,29 +121,28 @@ def upload():
 @login_required
 def view(id):
     """View a dataset."""
-    dataset = Dataset.query.get_or_404(id)
+    access = dataset_access_or_404(id)
+    dataset = access.dataset
     
-    # Check if the user has access to this dataset
-    if dataset.user_id != current_user.id and not dataset.is_public:
-        # Check if the dataset is shared with the user
-        share = Share.query.filter_by(
-            object_type='dataset',
-            object_id=dataset.id,
-            target_id=current_user.id
-        ).first()
-        
-        if not share:
-            flash('You do not have permission to view this dataset.', 'danger')
-            return redirect(url_for('data.index'))
+    if not access.can_view:
+        flash('You do not have permission to view this dataset.', 'danger')
+        return redirect(url_for('data.index'))
     
-    # Get dataset preview
-    try:
-        preview = data_processor.get_preview(dataset.id)
-    except Exception as e:
-        preview = f'<div class="alert alert-danger">Error loading preview: {str(e)}</div>'
+    # Get dataset preview (only once ingestion has finished)
+    preview = ''
+    if dataset.status == 'ready':
+        try:
+            preview = data_processor.get_preview(dataset.id)
+        except Exception as e:
+            preview = f'<div class="alert alert-danger">Error loading preview: {str(e)}</div>'
     
-    # Get visualisations for this dataset
+    # Get the visualisations of this dataset the user can open (all of them
+    # for the owner and for public datasets; a shared dataset does not share
+    # its dashboards)
     visualisations = dataset.visualisations.order_by(db.desc('created_at')).all()
+    if not access.is_owner:
+        viewable = visualisation_access_many([vis.id for vis in visualisations])
+        visualisations = [vis for vis in visualisations if viewable[vis.id].can_view]
     
     return render_template(
         'data/view.html',
@@ -141,6 +191,7 @@ def share(id):
             )
             db.session.add(share)
             db.session.commit()
+            invalidate_user(user_id)
             flash('Dataset shared successfully!', 'success')
         
         return redirect(url_for('data.share', id=id))
@@ -183,6 +234,7 @@ def unshare(id, user_id):
     
     db.session.delete(share)
     db.session.commit()
+    invalidate_user(user_id)
     flash('Sharing access removed successfully!', 'success')
     
     return redirect(url_for('data.share', id=id))
@@ -200,6 +252,7 @@ def toggle_public(id):
     
     dataset.is_public = not dataset.is_public
     db.session.commit()
+    invalidate_dataset(dataset)
     
     status = 'public' if dataset.is_public else 'private'
     flash(f'Dataset is now {status}.', 'success')
@@ -230,20 +283,12 @@ def delete(id):
 @login_required
 def download(id):
     """Download a dataset file."""
-    dataset = Dataset.query.get_or_404(id)
+    access = dataset_access_or_404(id)
+    dataset = access.dataset
     
-    # Check if the user has access to this dataset
-    if dataset.user_id != current_user.id and not dataset.is_public:
-        # Check if the dataset is shared with the user
-        share = Share.query.filter_by(
-            object_type='dataset',
-            object_id=dataset.id,
-            target_id=current_user.id
-        ).first()
-        
-        if not share:
-            flash('You do not have permission to download this dataset.', 'danger')
-            return redirect(url_for('data.index'))
+    if not access.can_view:
+        flash('You do not have permission to download this dataset.', 'danger')
+        return redirect(url_for('data.index'))
     
     # Check if the file exists
     if not os.path.exists(dataset.file_path):
@@ -261,53 +306,40 @@ def download(id):
 
 @data.route('/api/v1/datasets', methods=['GET'])
 @login_required
-@cache.cached(timeout=300)  # Cache this endpoint for 5 minutes
+@user_cached()  # Per-user; invalidated on upload, share, visibility and delete
 def api_get_datasets():
-    """API endpoint to get all datasets for the current user."""
-    datasets = Dataset.query.filter_by(user_id=current_user.id).order_by(Dataset.uploaded_at.desc()).all()
-    
-    result = []
-    for ds in datasets:
-        result.append({
-            'id': ds.id,
-            'filename': ds.original_filename,
-            'file_type': ds.file_type,
-            'n_rows': ds.n_rows,
-            'n_columns': ds.n_columns,
-            'is_public': ds.is_public,
-            'uploaded_at': ds.uploaded_at.isoformat()
-        })
-    
-    return jsonify(datasets=result)
+    """API endpoint to get the current user's datasets, newest first, one page at a time."""
+    try:
+        page = _api_page(db.session.query(*LISTING_COLUMNS).filter(Dataset.user_id == current_user.id))
+    except InvalidCursor as e:
+        return jsonify(error=str(e)), 400
+    
+    return jsonify(datasets=[_listing_entry(row) for row in page], next_cursor=page.next_cursor)
 
 @data.route('/api/v1/shared-datasets', methods=['GET'])
 @login_required
-@cache.cached(timeout=300)  # Cache this endpoint for 5 minutes
+@user_cached()  # Per-user; invalidated on upload, share, visibility and delete
 def api_get_shared_datasets():
-    """API endpoint to get all datasets shared with the current user."""
-    shared_datasets = db.session.query(Dataset).\
-        select_from(Share).\
-        join(Dataset, Share.object_id == Dataset.id).\
-        filter(
-            Share.target_id == current_user.id,
-            Share.object_type == 'dataset'
-        ).order_by(Dataset.uploaded_at.desc()).all()
-    
-    result = []
-    for ds in shared_datasets:
-        owner = User.query.get(ds.user_id)
-        result.append({
-            'id': ds.id,
-            'filename': ds.original_filename,
-            'file_type': ds.file_type,
-            'n_rows': ds.n_rows,
-            'n_columns': ds.n_columns,
-            'is_public': ds.is_public,
-            'uploaded_at': ds.uploaded_at.isoformat(),
-            'owner': owner.name if owner else 'Unknown'
-        })
-    
-    return jsonify(datasets=result)
+    """API endpoint to get the datasets shared with the current user, newest first, one page at a time."""
+    try:
+        shared_datasets = _api_page(
+            db.session.query(*LISTING_COLUMNS, User.name.label('owner_name')).\
+                select_from(Share).\
+                join(Dataset, Share.object_id == Dataset.id).\
+                outerjoin(User, Dataset.user_id == User.id).\
+                filter(
+                    Share.target_id == current_user.id,
+                    Share.object_type == 'dataset'
+                )
+        )
+    except InvalidCursor as e:
+        return jsonify(error=str(e)), 400
+    
+    result = [
+        dict(_listing_entry(row), owner=row.owner_name or 'Unknown')
+        for row in shared_datasets
+    ]
+    return jsonify(datasets=result, next_cursor=shared_datasets.next_cursor)
 
 @data.route('/api/v1/upload', methods=['POST'])
 @login_required
@@ -323,19 +355,23 @@ def api_upload():
     is_public = request.form.get('is_public', 'false').lower() == 'true'
     
     try:
-        # Process the uploaded file
+        # Save the file and queue it for background ingestion; progress goes to the user's room
         dataset = data_processor.process(
             file,
             current_user.id,
-            is_public,
-            current_user.id  # Use user ID as socket ID for progress updates
+            is_public
         )
         
+        if dataset.status == 'failed':
+            return jsonify(error=f'Error uploading dataset: {dataset.error_message}', dataset_id=dataset.id), 500
+        
         return jsonify(
             success=True,
             dataset_id=dataset.id,
-            message='Dataset uploaded successfully!'
-        )
+            status=dataset.status,
+            status_url=url_for('data.api_get_dataset_status', id=dataset.id),
+            message='Dataset uploaded successfully!' if dataset.status == 'ready' else 'Dataset uploaded and queued for processing.'
+        ), 200 if dataset.status == 'ready' else 202
     
     except Exception as e:
         return jsonify(error=f'Error uploading dataset: {str(e)}'), 500
@@ -344,27 +380,21 @@ def api_upload():
 @login_required
 def api_get_dataset(id):
     """API endpoint to get a specific dataset."""
-    dataset = Dataset.query.get_or_404(id)
+    access = dataset_access_or_404(id)
+    dataset = access.dataset
     
-    # Check if the user has access to this dataset
-    if dataset.user_id != current_user.id and not dataset.is_public:
-        # Check if the dataset is shared with the user
-        share = Share.query.filter_by(
-            object_type='dataset',
-            object_id=dataset.id,
-            target_id=current_user.id
-        ).first()
-        
-        if not share:
-            return jsonify(error='You do not have permission to view this dataset.'), 403
+    if not access.can_view:
+        return jsonify(error='You do not have permission to view this dataset.'), 403
     
     # Get dataset preview
-    try:
-        preview_html = data_processor.get_preview(dataset.id)
-    except Exception as e:
-        preview_html = f'<div class="alert alert-danger">Error loading preview: {str(e)}</div>'
+    preview_html = ''
+    if dataset.status == 'ready':
+        try:
+            preview_html = data_processor.get_preview(dataset.id)
+        except Exception as e:
+            preview_html = f'<div class="alert alert-danger">Error loading preview: {str(e)}</div>'
     
-    owner = User.query.get(dataset.user_id)
+    owner = dataset.owner
     
     return jsonify(
         id=dataset.id,
@@ -373,7 +403,25 @@ def api_get_dataset(id):
         n_rows=dataset.n_rows,
         n_columns=dataset.n_columns,
         is_public=dataset.is_public,
+        status=dataset.status,
         uploaded_at=dataset.uploaded_at.isoformat(),
         owner=owner.name if owner else 'Unknown',
         preview_html=preview_html
-    )
\ No newline at end of file
+    )
+
+@data.route('/api/v1/datasets/<int:id>/status', methods=['GET'])
+@login_required
+def api_get_dataset_status(id):
+    """API endpoint to poll the ingestion status of an uploaded dataset."""
+    dataset = Dataset.query.get_or_404(id)
+    
+    if dataset.user_id != current_user.id:
+        return jsonify(error='You do not have permission to view this dataset.'), 403
+    
+    return jsonify(
+        id=dataset.id,
+        status=dataset.status,
+        error=dataset.error_message,
+        n_rows=dataset.n_rows,
+        n_columns=dataset.n_columns
+    )
@@ -1,5 +1,5 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, TextAreaField, SelectField, SubmitField
+from wtforms import StringField, TextAreaField, SelectField, BooleanField, SubmitField
 from wtforms.validators import DataRequired, Length
 
 class GenerateVisualisationForm(FlaskForm):
@@ -12,6 +12,7 @@ class GenerateVisualisationForm(FlaskForm):
         Length(max=500)
     ])
     # Chart type selection removed; Claude now selects visualization type autonomously.
+    fresh = BooleanField('Generate a new design (ignore previously generated dashboards for this data)')
     submit = SubmitField('Generate Visualization')
 
 class ShareVisualisationForm(FlaskForm):
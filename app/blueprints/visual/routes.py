@@ -1,140 +1,113 @@
-from flask import render_template, redirect, url_for, flash, request, jsonify, current_app
+from flask import render_template, redirect, url_for, flash, request, jsonify, current_app, make_response
 from flask_login import login_required, current_user
 from markupsafe import Markup
+from sqlalchemy.orm import contains_eager
 from . import visual
-from ...models import db, Dataset, Visualisation, Share, User # db import might be redundant if not used directly
+from ...models import db, Dataset, Visualisation, Share, User, GenerationJob # db import might be redundant if not used directly
 from .forms import GenerateVisualisationForm, ShareVisualisationForm
 # from ...services.claude_client import ClaudeClient # No longer importing the class directly
-from ...services import claude_service # Import the initialized instance
-from ... import cache, socketio 
+from ...services import claude_service, rate_governor # Import the initialized instances
+from ...services.column_store import load_dataset_frame
+from ...services.dashboard_template import prepare_dashboard_template_html
+from ...services.generation_jobs import enqueue_generation
+from ...services.payload_reducer import dataset_payload_json, normalize_options, PAYLOAD_FORMATS
+from ... import socketio 
+from ...caching import cache, user_cached, bump_scopes, visualisation_scopes, invalidate_user, invalidate_visualisation
+from ...permissions import visualisation_access_or_404
+from ...pagination import keyset_page, request_page, page_size, InvalidCursor
+from ...responses import make_etag, not_modified, cacheable_response, json_with_raw_fields
 import traceback
 import re
 import os 
 import pandas as pd 
 import json 
-import anthropic # For specific API error handling
 
 
 # claude_client = ClaudeClient() # REMOVE THIS LINE - use claude_service instance
 
-# Helper function to clean/prepare HTML template from Claude (consolidated logic)
-# This function can be moved to a utils file if it grows or is used elsewhere
-def prepare_dashboard_template_html(html_content):
-    """
-    Clean and validate the dashboard HTML TEMPLATE to ensure it's suitable for iframe display
-    and later data injection.
-    """
-    if not html_content:
-        current_app.logger.warning("Empty HTML content provided to prepare_dashboard_template_html")
-        return "<!DOCTYPE html><html><head><meta charset='UTF-8'><title>Error</title></head><body><h2>No dashboard content template available.</h2></body></html>"
+def _job_to_dict(job):
+    """Serialize a GenerationJob for the job status API."""
+    return {
+        'id': job.id,
+        'status': job.status,
+        'progress': job.progress,
+        'message': job.message,
+        'error': job.error,
+        'dataset_id': job.dataset_id,
+        'visualisation_id': job.visualisation_id,
+        'usage': {
+            'input_tokens': job.input_tokens,
+            'output_tokens': job.output_tokens,
+            'cache_creation_input_tokens': job.cache_creation_input_tokens,
+            'cache_read_input_tokens': job.cache_read_input_tokens
+        } if job.input_tokens is not None else None,
+        'redirect_url': url_for('visual.view', id=job.visualisation_id) if job.visualisation_id else None,
+        'status_url': url_for('visual.api_get_job', id=job.id),
+        'created_at': job.created_at.isoformat() if job.created_at else None,
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    }
 
-    # Ensure the HTML starts with doctype
-    if not html_content.strip().lower().startswith("<!doctype html"):
-        html_content = "<!DOCTYPE html>\n" + html_content
-    
-    # Basic HTML structure checks
-    if "<html" not in html_content.lower():
-        html_content = html_content.replace("<!DOCTYPE html>", "<!DOCTYPE html>\n<html lang='en'>", 1)
-        if "</html>" not in html_content.lower(): html_content += "\n</html>"
-    
-    head_start_idx = html_content.lower().find("<head>")
-    head_end_idx = html_content.lower().find("</head>")
-
-    if head_start_idx == -1: 
-        html_tag_end = html_content.lower().find("<html>")
-        insert_pos = html_tag_end + len("<html>") if html_tag_end != -1 else len("<!DOCTYPE html>")
-        html_content = html_content[:insert_pos] + "\n<head><meta charset=\"UTF-8\"><title>Dashboard</title></head>\n" + html_content[insert_pos:]
-        head_start_idx = html_content.lower().find("<head>") 
-        head_end_idx = html_content.lower().find("</head>")
-
-    if head_start_idx != -1 and "<meta charset" not in html_content[head_start_idx:head_end_idx if head_end_idx!=-1 else len(html_content)].lower():
-        html_content = html_content[:head_start_idx+6] + "<meta charset=\"UTF-8\">\n" + html_content[head_start_idx+6:]
-        head_end_idx = html_content.lower().find("</head>") 
-
-    if "<body" not in html_content.lower():
-        if head_end_idx != -1:
-            html_content = html_content[:head_end_idx+7] + "\n<body>\n</body>" + html_content[head_end_idx+7:]
-        elif "</html>" in html_content.lower():
-            idx = html_content.lower().find("</html>")
-            html_content = html_content[:idx] + "\n<body>\n</body>\n" + html_content[idx:]
-        else:
-            html_content += "\n<body>\n</body>"
+def _dataset_payload(visualisation, df, payload_format='records'):
+    """Reduce a dashboard's data with its options, falling back to the defaults if they no longer apply."""
+    try:
+        return dataset_payload_json(df, visualisation.data_options, current_app.config, payload_format)
+    except ValueError as e:
+        current_app.logger.warning(f"Ignoring data options of visualisation {visualisation.id}: {str(e)}")
+        return dataset_payload_json(df, None, current_app.config, payload_format)
 
-    current_head_content = html_content[head_start_idx:head_end_idx if head_end_idx!=-1 else len(html_content)]
+# Columns of a dashboard listing entry; listings never load the (large) spec
+LISTING_COLUMNS = (Visualisation.id, Visualisation.title, Visualisation.description, Visualisation.created_at)
 
-    if head_start_idx != -1 and '<meta name="viewport"' not in current_head_content.lower():
-        viewport_meta = '<meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">\n'
-        html_content = html_content[:head_start_idx+6] + viewport_meta + html_content[head_start_idx+6:]
-        head_end_idx = html_content.lower().find("</head>")
+# Dashboards per section of the gallery page
+INDEX_PAGE_SIZE = 6
 
-    if head_start_idx != -1 and '<meta http-equiv="Content-Security-Policy"' not in current_head_content:
-        csp_tag = '<meta http-equiv="Content-Security-Policy" content="default-src \'self\'; script-src \'self\' \'unsafe-inline\' https://cdn.jsdelivr.net https://d3js.org; style-src \'self\' \'unsafe-inline\' https://cdn.jsdelivr.net; img-src \'self\' data: blob:; connect-src \'self\'; font-src \'self\' https://cdn.jsdelivr.net;">\n'
-        html_content = html_content[:head_start_idx+6] + csp_tag + html_content[head_start_idx+6:]
-        head_end_idx = html_content.lower().find("</head>")
-    
-    if head_end_idx != -1: 
-        responsive_css_script = """
-<style>
-    html, body { width: 100% !important; height: 100% !important; margin: 0 !important; padding: 0 !important; overflow-x: hidden !important; box-sizing: border-box !important; }
-    *, *:before, *:after { box-sizing: inherit !important; }
-    #dashboard-content, #root, #app, main, .main, .dashboard, .dashboard-main,
-    .container, .container-fluid, .row, .grid, div[class*="container"], section, article, .card, .panel, .box {
-        width: 100% !important; max-width: 100% !important; margin-left: auto !important; margin-right: auto !important;
-    }
-    canvas, svg, .chart, div[class*="chart"] { width: 100% !important; max-width: 100% !important; height: auto !important; }
-    img, table { max-width: 100% !important; height: auto !important; }
-</style>
-"""
-        html_content = html_content[:head_end_idx] + responsive_css_script + html_content[head_end_idx:]
-
-    if "console.error('Dashboard error:'" not in html_content:
-        error_handling_script = """
-<script>
-    window.addEventListener('error', function(event) {
-        console.error('Dashboard error:', event.message, 'at', event.filename, ':', event.lineno);
-        var errorDisplay = document.getElementById('dynadashInternalErrorDisplay');
-        if (!errorDisplay && document.body) {
-            errorDisplay = document.createElement('div');
-            errorDisplay.id = 'dynadashInternalErrorDisplay';
-            errorDisplay.style.cssText = 'position:fixed;top:5px;left:5px;right:5px;padding:10px;background:rgba(220,50,50,0.9);color:white;border-radius:4px;z-index:20000;font-family:sans-serif;font-size:14px;';
-            document.body.insertBefore(errorDisplay, document.body.firstChild);
-        }
-        if(errorDisplay) errorDisplay.textContent = 'Dashboard Error: ' + event.message + ' (in ' + (event.filename || 'inline script') + ':' + event.lineno + ')';
-    });
-    document.addEventListener('DOMContentLoaded', function() {
-        if (typeof window.dynadashData === 'undefined' || window.dynadashData === null || (Array.isArray(window.dynadashData) && window.dynadashData.length === 0)) {
-            console.warn('window.dynadashData is not defined or is empty. Dashboard might not render correctly.');
-            var dataWarningDiv = document.getElementById('dynadashDataWarningDisplay');
-            if(!dataWarningDiv && document.body) {
-                dataWarningDiv = document.createElement('div');
-                dataWarningDiv.id = 'dynadashDataWarningDisplay';
-                dataWarningDiv.style.cssText = 'padding:10px;background:rgba(255,220,50,0.8);color:black;text-align:center;font-family:sans-serif;font-size:14px;';
-                dataWarningDiv.textContent = 'Notice: Data for this dashboard (window.dynadashData) was not loaded or is empty. Visualizations may not appear as expected.';
-                document.body.insertBefore(dataWarningDiv, document.body.firstChild);
-            }
-        }
-        setTimeout(function() {
-            if (typeof Chart !== 'undefined' && typeof window.dynadashData !== 'undefined') {
-                var canvases = document.querySelectorAll('canvas');
-                canvases.forEach(function(canvas) {
-                    try {
-                        var chartInstance = Chart.getChart(canvas); 
-                        if (chartInstance) { chartInstance.update('none'); } 
-                    } catch(e) { console.warn('Could not update chart on canvas ' + (canvas.id || '(no id)') + ':', e); }
-                });
-            }
-        }, 1200);
-    });
-</script>
-"""
-        body_end_idx = html_content.lower().rfind('</body>')
-        if body_end_idx != -1:
-            html_content = html_content[:body_end_idx] + error_handling_script + html_content[body_end_idx:]
-        else:
-            html_content += error_handling_script
+def _shared_visualisations_query(dataset_name_column):
+    """Listing rows of the dashboards shared with the current user, with dataset and owner names, in one query."""
+    return db.session.query(*LISTING_COLUMNS, dataset_name_column, User.name.label('owner_name')).\
+        select_from(Share).\
+        join(Visualisation, Share.object_id == Visualisation.id).\
+        join(Dataset, Visualisation.dataset_id == Dataset.id).\
+        join(User, Dataset.user_id == User.id).\
+        filter(
+            Share.target_id == current_user.id,
+            Share.object_type == 'visualisation'
+        )
+
+def _api_page(query):
+    """Keyset page of a dashboard listing for the ``cursor`` and ``limit`` query arguments."""
+    return keyset_page(query, Visualisation.created_at, Visualisation.id, request.args.get('cursor'), page_size())
+
+def _payload_format(default):
+    """The ``format`` query argument (columns or records), or None if it is invalid."""
+    payload_format = request.args.get('format', default)
+    return payload_format if payload_format in PAYLOAD_FORMATS else None
+
+def _payload_etag(visualisation, dataset, payload_format):
+    """
+    ETag of a dashboard's data, from the file, the reduction settings and the format.
+
+    There is no Last-Modified: the data also changes with the dashboard's
+    data_options, which have no modification time.
+    """
+    stat = os.stat(dataset.file_path)
+    return make_etag(
+        'visualisation-data', dataset.id, stat.st_mtime_ns, stat.st_size, visualisation.data_options,
+        current_app.config.get('PAYLOAD_MAX_ROWS'), current_app.config.get('PAYLOAD_MAX_MB'), payload_format
+    )
 
-    return html_content
+def _shared_dataset_payload(visualisation, dataset, payload_format):
+    """
+    ``_dataset_payload`` of a dashboard's dataset file, cached once for all users.
 
+    Entries are keyed by the data's ETag, so a changed file, new data options
+    or new payload settings never reuse one and need no invalidation.
+    """
+    key = f'payload/{_payload_etag(visualisation, dataset, payload_format)}'
+    payload = cache.get(key)
+    if payload is None:
+        payload = _dataset_payload(visualisation, load_dataset_frame(dataset), payload_format)
+        cache.set(key, payload, timeout=current_app.config.get('API_CACHE_TIMEOUT', 300))
+    return payload
 
 @visual.route('/welcome')
 def welcome():
@@ -144,44 +117,24 @@ def welcome():
 @login_required
 def index():
     """Display the visualizations gallery."""
-    page = request.args.get('page', 1, type=int)
-    # And then: per_page = current_app.config.get('ITEMS_PER_PAGE', 6)
-    per_page = 6 
-
-    # Paginate user's own visualisations
-    # The variable passed to the template will be user_visualisations (a pagination object)
-    user_visualisations_pagination = Visualisation.query.join(Dataset).filter(
-        Dataset.user_id == current_user.id
-    ).order_by(Visualisation.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    
-    # Shared visualisations (currently not paginated in this example, but could be if needed)
-    # This remains a list
-    shared_visualisations_query = db.session.query(Visualisation, User.name.label("owner_name")).\
-        select_from(Share).\
-        join(Visualisation, Share.object_id == Visualisation.id).\
-        join(Dataset, Visualisation.dataset_id == Dataset.id).\
-        join(User, Dataset.user_id == User.id).\
-        filter(
-            Share.target_id == current_user.id,
-            Share.object_type == 'visualisation'
-        ).order_by(Visualisation.created_at.desc())
+    # Both sections are keyset-paginated on their own (?cursor=, ?shared_cursor=)
+    user_visualisations = request_page(
+        Visualisation.query.join(Dataset).\
+            options(contains_eager(Visualisation.dataset)).\
+            filter(Dataset.user_id == current_user.id),
+        Visualisation.created_at, Visualisation.id, limit=INDEX_PAGE_SIZE
+    )
     
-    shared_visualisations_list = [] 
-    for vis, owner_name in shared_visualisations_query.all():
-        shared_visualisations_list.append({
-            'id': vis.id,
-            'title': vis.title,
-            'description': vis.description,
-            'created_at': vis.created_at,
-            'dataset_filename': vis.dataset.original_filename, 
-            'owner_name': owner_name
-        })
+    shared_visualisations = request_page(
+        _shared_visualisations_query(Dataset.original_filename.label('dataset_filename')),
+        Visualisation.created_at, Visualisation.id, arg='shared_cursor', limit=INDEX_PAGE_SIZE
+    )
 
     return render_template(
         'visual/index.html',
         title='My Dashboards',
-        user_visualisations=user_visualisations_pagination, # Pass the pagination object
-        shared_visualisations=shared_visualisations_list 
+        user_visualisations=user_visualisations,
+        shared_visualisations=shared_visualisations
     )
 
 @visual.route('/generate/<int:dataset_id>', methods=['GET', 'POST'])
@@ -202,122 +155,78 @@ def generate(dataset_id):
         flash('You must own the dataset to generate a new visualization from it.', 'danger')
         return redirect(data_index_url) 
     
+    if dataset.status != 'ready':
+        flash('This dataset is still being processed. Try again once it is ready.', 'warning')
+        return redirect(data_index_url)
+    
     form = GenerateVisualisationForm()
+    job = None
     if form.validate_on_submit():
-        room_id = f"user_{current_user.id}" # Define room_id outside try for except block
-        try:
-            socketio.emit('progress_update', {'percent': 0, 'message': 'Starting dashboard generation...'}, room=room_id)
-            current_app.logger.info(f"Starting dashboard template generation for dataset ID: {dataset.id}, title: {form.title.data}")
-            
-            socketio.emit('progress_update', {'percent': 10, 'message': 'Analyzing dataset structure...'}, room=room_id)
-            
-            # Use the imported claude_service instance
-            dashboard_html_template = claude_service.generate_dashboard(
-                dataset.id, 
-                form.title.data, 
-                form.description.data
-            )
-            
-            prepared_template = prepare_dashboard_template_html(dashboard_html_template) 
-            
-            socketio.emit('progress_update', {'percent': 90, 'message': 'Dashboard template generated, saving...'}, room=room_id)
-            
-            visualisation = Visualisation(
-                dataset_id=dataset.id,
-                title=form.title.data,
-                description=form.description.data,
-                spec=prepared_template 
-            )
-            db.session.add(visualisation)
-            db.session.commit()
-            
-            socketio.emit('progress_update', {'percent': 100, 'message': 'Dashboard saved! Redirecting...'}, room=room_id)
-            socketio.emit('processing_complete', {'redirect_url': url_for('visual.view', id=visualisation.id)}, room=room_id)
-            
-            current_app.logger.info(f"Dashboard template generation completed for dataset ID: {dataset.id}")
+        job = enqueue_generation(
+            dataset, current_user.id, form.title.data, form.description.data,
+            use_template_cache=not form.fresh.data
+        )
+        current_app.logger.info(f"Queued dashboard generation job {job.id} for dataset ID: {dataset.id}, title: {form.title.data}")
+
+        if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
+            return jsonify(_job_to_dict(job)), 202
+
+        # Plain form submission: the job may already be done when running eagerly
+        if job.status == 'succeeded':
             flash('Dashboard generated successfully! You can now view it.', 'success')
-            return redirect(url_for('visual.view', id=visualisation.id))
-            
-        except anthropic.APIError as api_err: 
-            current_app.logger.error(f"Claude API Error during dashboard generation: {str(api_err)}", exc_info=True)
-            socketio.emit('processing_error', {'message': f'Claude API Error: {str(api_err)}'}, room=room_id)
-            flash(f'Error communicating with Claude API: {str(api_err)}', 'danger')
-        except Exception as e:
-            current_app.logger.error(f"Unexpected error in dashboard generation: {str(e)}", exc_info=True)
-            socketio.emit('processing_error', {'message': f'Unexpected error: {str(e)}'}, room=room_id)
-            flash(f'An unexpected error occurred: {str(e)}', 'danger')
+            return redirect(url_for('visual.view', id=job.visualisation_id))
+        if job.status == 'failed':
+            flash(f'Dashboard generation failed: {job.error}', 'danger')
+            job = None
     
     return render_template(
         'visual/generate.html',
         title='Generate Dashboard',
         dataset=dataset,
-        form=form
+        form=form,
+        job=_job_to_dict(job) if job else None
     )
 
 @visual.route('/view/<int:id>')
 @login_required
 def view(id):
-    """View a visualization by injecting data into its template."""
-    visualisation = Visualisation.query.get_or_404(id)
-    dataset = Dataset.query.get_or_404(visualisation.dataset_id)
-    
-    can_view = False
-    if dataset.user_id == current_user.id or dataset.is_public:
-        can_view = True
-    else:
-        share_record = Share.query.filter_by( # Renamed to avoid conflict
-            object_type='visualisation', object_id=id, target_id=current_user.id
-        ).first()
-        if share_record: # Check if a record was found
-            can_view = True
+    """View a visualization; its data is fetched by the page after it renders."""
+    access = visualisation_access_or_404(id, with_spec=True)
+    visualisation, dataset = access.obj, access.dataset
     
-    if not can_view:
+    if not access.can_view:
         flash('You do not have permission to view this dashboard.', 'danger')
         return redirect(url_for('visual.index'))
 
-    actual_dataset_json_for_js = "[]" 
     dashboard_template_html_content = "" # Renamed for clarity
 
     if visualisation.spec:
-        try:
-            file_path = dataset.file_path
-            if not os.path.exists(file_path):
-                current_app.logger.error(f"Dataset file {file_path} not found for visualization {id}.")
-                flash('Dataset file is missing. Cannot display dashboard.', 'danger')
-            else:
-                if dataset.file_type.lower() == 'csv':
-                    df = pd.read_csv(file_path)
-                elif dataset.file_type.lower() == 'json':
-                    df = pd.read_json(file_path)
-                else:
-                    current_app.logger.error(f"Unsupported dataset type {dataset.file_type} for viz {id}.")
-                    flash(f"Unsupported dataset type: {dataset.file_type}", 'danger')
-                    df = pd.DataFrame()
-
-                actual_dataset_for_js = df.to_dict(orient='records')
-                actual_dataset_json_for_js = json.dumps(actual_dataset_for_js)
-            
-            dashboard_template_html_content = Markup(visualisation.spec) # Spec is the template
-
-        except Exception as data_err:
-            current_app.logger.error(f"Error reading dataset content for visualization {id}: {str(data_err)}", exc_info=True)
-            flash('Error loading data for the dashboard. Some elements may not display correctly.', 'warning')
-            dashboard_template_html_content = Markup(visualisation.spec) # Still pass template even if data fails
-            
+        # The data is fetched separately from api_get_visualisation_data so the
+        # page and the (large) data are cached and revalidated independently
+        if not os.path.exists(dataset.file_path):
+            current_app.logger.error(f"Dataset file {dataset.file_path} not found for visualization {id}.")
+            flash('Dataset file is missing. Cannot display dashboard.', 'danger')
+        elif dataset.file_type.lower() not in ('csv', 'json'):
+            current_app.logger.error(f"Unsupported dataset type {dataset.file_type} for viz {id}.")
+            flash(f"Unsupported dataset type: {dataset.file_type}", 'danger')
+        dashboard_template_html_content = Markup(visualisation.spec) # Spec is the template
     else:
         current_app.logger.warning(f"Empty visualization spec for ID: {id}")
         flash('This dashboard has no content template. It may have been incorrectly generated.', 'warning')
         dashboard_template_html_content = Markup('<html><body><div class="p-4 text-center text-gray-500">No dashboard template available.</div></body></html>')
 
-    return render_template(
+    response = make_response(render_template(
         'visual/view.html',
         title=visualisation.title,
         visualisation=visualisation,
         dashboard_template_html=dashboard_template_html_content,
-        actual_dataset_json=actual_dataset_json_for_js, 
+        dataset_data_url=url_for('visual.api_get_visualisation_data', id=visualisation.id),
         dataset=dataset, 
         debug=current_app.debug 
-    )
+    ))
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
 
 @visual.route('/share/<int:id>', methods=['GET', 'POST'])
 @login_required
@@ -375,6 +284,7 @@ def share(id):
                 )
                 db.session.add(new_share)
                 db.session.commit()
+                invalidate_visualisation(visualisation)
                 flash(f'Dashboard shared successfully with {target_user.name}!', 'success')
         return redirect(url_for('visual.share', id=id)) # Redirect to refresh the page and list
     
@@ -412,6 +322,8 @@ def unshare(id, user_id):
         user_removed = User.query.get(user_id)
         db.session.delete(share_to_delete)
         db.session.commit()
+        invalidate_visualisation(visualisation)
+        invalidate_user(user_id)
         flash(f'Sharing access removed successfully for {user_removed.name if user_removed else "user"}.', 'success')
     else:
         flash('Share record not found or you are not the owner.', 'warning')
@@ -426,9 +338,11 @@ def delete(id):
         flash('You can only delete dashboards that you own.', 'danger')
         return redirect(url_for('visual.index'))
     
+    stale_scopes = visualisation_scopes(visualisation)
     Share.query.filter_by(object_type='visualisation', object_id=id).delete(synchronize_session='fetch')
     db.session.delete(visualisation)
     db.session.commit()
+    bump_scopes(*stale_scopes)
     
     flash('Dashboard deleted successfully!', 'success')
     return redirect(url_for('visual.index'))
@@ -437,83 +351,152 @@ def delete(id):
 
 @visual.route('/api/v1/visualisations', methods=['GET'])
 @login_required
-@cache.cached(timeout=60) 
+@user_cached()
 def api_get_visualisations():
-    visualisations = Visualisation.query.join(Dataset).filter(
-        Dataset.user_id == current_user.id
-    ).order_by(Visualisation.created_at.desc()).all()
+    try:
+        visualisations = _api_page(
+            db.session.query(*LISTING_COLUMNS, Dataset.original_filename.label('dataset_name')).\
+                join(Dataset, Visualisation.dataset_id == Dataset.id).\
+                filter(Dataset.user_id == current_user.id)
+        )
+    except InvalidCursor as e:
+        return jsonify(error=str(e)), 400
     
-    result = [{
-        'id': vis.id, 'title': vis.title, 'description': vis.description,
-        'dataset_name': vis.dataset.original_filename, 
-        'created_at': vis.created_at.isoformat()
-    } for vis in visualisations]
-    return jsonify(visualisations=result)
+    result = [dict(row._asdict(), created_at=row.created_at.isoformat()) for row in visualisations]
+    return jsonify(visualisations=result, next_cursor=visualisations.next_cursor)
 
 @visual.route('/api/v1/shared-visualisations', methods=['GET'])
 @login_required
-@cache.cached(timeout=60)
+@user_cached()
 def api_get_shared_visualisations():
-    shared_visualisations_data = db.session.query( # Renamed
-            Visualisation, User.name.label("owner_name")
-        ).\
-        select_from(Share).\
-        join(Visualisation, Share.object_id == Visualisation.id).\
-        join(Dataset, Visualisation.dataset_id == Dataset.id).\
-        join(User, Dataset.user_id == User.id).\
-        filter(
-            Share.target_id == current_user.id,
-            Share.object_type == 'visualisation'
-        ).order_by(Visualisation.created_at.desc()).all()
+    try:
+        shared_visualisations_data = _api_page(_shared_visualisations_query(Dataset.original_filename.label('dataset_name')))
+    except InvalidCursor as e:
+        return jsonify(error=str(e)), 400
     
-    result = [{
-        'id': vis.id, 'title': vis.title, 'description': vis.description,
-        'dataset_name': vis.dataset.original_filename,
-        'created_at': vis.created_at.isoformat(),
-        'owner_name': owner_name
-    } for vis, owner_name in shared_visualisations_data] # Use renamed variable
-    return jsonify(visualisations=result)
+    result = [dict(row._asdict(), created_at=row.created_at.isoformat()) for row in shared_visualisations_data]
+    return jsonify(visualisations=result, next_cursor=shared_visualisations_data.next_cursor)
 
 
 @visual.route('/api/v1/visualisations/<int:id>', methods=['GET'])
 @login_required
-@cache.cached(timeout=60) 
 def api_get_visualisation(id):
-    visualisation = Visualisation.query.get_or_404(id)
-    dataset = Dataset.query.get_or_404(visualisation.dataset_id)
-    
-    can_view = False
-    if dataset.user_id == current_user.id or dataset.is_public:
-        can_view = True
-    else:
-        share_record_api = Share.query.filter_by(object_type='visualisation', object_id=id, target_id=current_user.id).first() # Renamed
-        if share_record_api: can_view = True # Use renamed variable
+    """
+    A dashboard with its template and (reduced) data.
+
+    Not cached per user: the data, which makes up most of the response, is
+    shared by everyone who can view the dashboard (``_shared_dataset_payload``).
+    """
+    access = visualisation_access_or_404(id, with_spec=True)
+    visualisation, dataset = access.obj, access.dataset
     
-    if not can_view:
+    if not access.can_view:
         return jsonify(error='Permission denied'), 403
 
-    actual_data_for_js = []
+    # ?format=columns sends the data column-oriented, see payload_reducer.frame_to_columns_json
+    payload_format = _payload_format('records')
+    if payload_format is None:
+        return jsonify(error=f"format must be one of: {', '.join(PAYLOAD_FORMATS)}"), 400
+
+    actual_data_json = "[]"
+    dataset_payload_info = None
     try:
         file_path = dataset.file_path
         if os.path.exists(file_path):
-            if dataset.file_type.lower() == 'csv':
-                df = pd.read_csv(file_path)
-            elif dataset.file_type.lower() == 'json':
-                df = pd.read_json(file_path)
-            else: df = pd.DataFrame()
-            actual_data_for_js = df.to_dict(orient='records')
+            if dataset.file_type.lower() in ('csv', 'json'):
+                actual_data_json, dataset_payload_info = _shared_dataset_payload(visualisation, dataset, payload_format)
+            else:
+                actual_data_json, dataset_payload_info = _dataset_payload(visualisation, pd.DataFrame(), payload_format)
         else:
              current_app.logger.warning(f"API: Dataset file {file_path} not found for viz {id}")
     except Exception as e:
         current_app.logger.error(f"API: Error loading data for viz {id}: {e}", exc_info=True)
 
-    return jsonify(
-        id=visualisation.id,
-        title=visualisation.title,
-        description=visualisation.description,
-        dashboard_template_spec=visualisation.spec, 
-        actual_dataset=actual_data_for_js, 
-        dataset_id=visualisation.dataset_id,
-        dataset_filename=dataset.original_filename,
-        created_at=visualisation.created_at.isoformat()
-    )
\ No newline at end of file
+    # The (large) data is already JSON; embed it rather than parsing it back for jsonify
+    body = json_with_raw_fields({
+        'id': visualisation.id,
+        'title': visualisation.title,
+        'description': visualisation.description,
+        'dashboard_template_spec': visualisation.spec,
+        'dataset_payload': dataset_payload_info,
+        'data_options': visualisation.data_options,
+        'dataset_id': visualisation.dataset_id,
+        'dataset_filename': dataset.original_filename,
+        'created_at': visualisation.created_at.isoformat()
+    }, actual_dataset=actual_data_json)
+    return current_app.response_class(body, mimetype='application/json')
+
+@visual.route('/api/v1/visualisations/<int:id>/data', methods=['GET'])
+@login_required
+def api_get_visualisation_data(id):
+    """
+    A dashboard's (reduced) data as ``{"info": {...}, "data": ...}``.
+
+    ``data`` is column-oriented by default (``?format=records`` gives an
+    array of row objects). Supports conditional requests (ETag) and gzip
+    or brotli compression, so unchanged data is revalidated without being
+    rebuilt.
+    """
+    access = visualisation_access_or_404(id)
+    visualisation, dataset = access.obj, access.dataset
+    if not access.can_view:
+        return jsonify(error='Permission denied'), 403
+    if not os.path.exists(dataset.file_path):
+        current_app.logger.warning(f"API: Dataset file {dataset.file_path} not found for viz {id}")
+        return jsonify(error='Dataset file not found'), 404
+    if dataset.file_type.lower() not in ('csv', 'json'):
+        return jsonify(error=f'Unsupported dataset type: {dataset.file_type}'), 400
+
+    payload_format = _payload_format('columns')
+    if payload_format is None:
+        return jsonify(error=f"format must be one of: {', '.join(PAYLOAD_FORMATS)}"), 400
+
+    etag = _payload_etag(visualisation, dataset, payload_format)
+    unchanged = not_modified(etag)
+    if unchanged is not None:
+        return unchanged
+
+    payload_json, info = _shared_dataset_payload(visualisation, dataset, payload_format)
+    body = json_with_raw_fields({'info': info}, data=payload_json)
+    return cacheable_response(body, 'application/json', etag)
+
+@visual.route('/api/v1/visualisations/<int:id>/data-options', methods=['PUT'])
+@login_required
+def api_update_data_options(id):
+    """Set how a dashboard's data is reduced (mode, row budget and mode settings)."""
+    visualisation = Visualisation.query.get_or_404(id)
+    dataset = Dataset.query.get_or_404(visualisation.dataset_id)
+    if dataset.user_id != current_user.id:
+        return jsonify(error='Permission denied'), 403
+
+    try:
+        options = normalize_options(request.get_json(silent=True))
+        if dataset.profile:
+            columns = [options.get('stratify_by'), options.get('x')]
+            columns += options.get('y', []) + options.get('group_by', []) + list(options.get('aggregates', {}))
+            unknown = [col for col in columns if col is not None and col not in dataset.profile]
+            if unknown:
+                raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+
+    visualisation.data_options = options or None
+    db.session.commit()
+    invalidate_visualisation(visualisation)
+    current_app.logger.info(f"Updated data options of visualisation {id}: {options}")
+    return jsonify(id=visualisation.id, data_options=visualisation.data_options)
+
+@visual.route('/api/v1/jobs/<int:id>', methods=['GET'])
+@login_required
+def api_get_job(id):
+    """Status of a dashboard generation job (polling fallback for Socket.IO)."""
+    job = db.session.get(GenerationJob, id)
+    if job is None or job.user_id != current_user.id:
+        return jsonify(error='Job not found'), 404
+    return jsonify(_job_to_dict(job))
+
+@visual.route('/api/v1/jobs/queue', methods=['GET'])
+@login_required
+def api_get_job_queue():
+    """Claude API calls waiting for rate-limit capacity, overall and for the current user."""
+    return jsonify(rate_governor.queue_depth(current_user.id))
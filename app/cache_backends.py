@@ -0,0 +1,184 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+from flask_caching.backends.base import BaseCache
+
+
+class SQLiteCache(BaseCache):
+    """
+    Cache stored in a SQLite file, shared by every process on the host.
+
+    Needs no external service, unlike Redis, and keeps one row per key instead
+    of one file per key like FileSystemCache. The database runs in WAL mode so
+    readers in other workers are not blocked by writes. Entries past their
+    timeout are ignored on read and deleted by periodic pruning, which also
+    drops the oldest entries once there are more than ``threshold``.
+
+    Args:
+        path: Database file (created if missing)
+        default_timeout: Seconds entries live when ``set`` gets no timeout (0 = forever)
+        threshold: Maximum number of entries kept
+        key_prefix: Prefix for all keys, to share one file between apps
+    """
+
+    PRUNE_EVERY = 100  # writes between prunes
+
+    def __init__(self, path, default_timeout=300, threshold=500, key_prefix=''):
+        super().__init__(default_timeout)
+        self.path = path
+        self.threshold = threshold
+        self.key_prefix = key_prefix
+        self._local = threading.local()
+        self._writes = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._transaction() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, stored_at REAL NOT NULL)'
+            )
+
+    @classmethod
+    def factory(cls, app, config, args, kwargs):
+        kwargs.update(
+            threshold=config['CACHE_THRESHOLD'],
+            key_prefix=config['CACHE_KEY_PREFIX']
+        )
+        return cls(config['CACHE_SQLITE_PATH'], *args, **kwargs)
+
+    def _connection(self):
+        # One connection per thread, reopened after a fork (e.g. gunicorn --preload)
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    class _Transaction:
+        def __init__(self, conn):
+            self.conn = conn
+
+        def __enter__(self):
+            self.conn.execute('BEGIN IMMEDIATE')
+            return self.conn
+
+        def __exit__(self, exc_type, exc, tb):
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+
+    def _transaction(self):
+        return self._Transaction(self._connection())
+
+    def _expires(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time.time() + timeout if timeout > 0 else None
+
+    def _rows(self, values, timeout):
+        expires, now = self._expires(timeout), time.time()
+        return [
+            (self.key_prefix + key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires, now)
+            for key, value in values.items()
+        ]
+
+    def _written(self, count=1):
+        self._writes += count
+        if self._writes >= self.PRUNE_EVERY:
+            self._writes = 0
+            self._prune()
+
+    def _prune(self):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM cache WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+            excess = conn.execute('SELECT COUNT(*) FROM cache').fetchone()[0] - self.threshold
+            if excess > 0:
+                conn.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY stored_at LIMIT ?)', (excess,)
+                )
+
+    def get(self, key):
+        return self.get_many(key)[0]
+
+    def get_many(self, *keys):
+        if not keys:
+            return []
+        prefixed = [self.key_prefix + key for key in keys]
+        placeholders = ','.join('?' * len(prefixed))
+        rows = self._connection().execute(
+            f'SELECT key, value FROM cache WHERE key IN ({placeholders}) AND (expires IS NULL OR expires > ?)',
+            prefixed + [time.time()]
+        ).fetchall()
+        found = {key: value for key, value in rows}
+        values = []
+        for key in prefixed:
+            value = found.get(key)
+            try:
+                values.append(pickle.loads(value) if value is not None else None)
+            except (pickle.PickleError, EOFError, AttributeError, ImportError):
+                values.append(None)
+        return values
+
+    def set(self, key, value, timeout=None):
+        return bool(self.set_many({key: value}, timeout))
+
+    def set_many(self, mapping, timeout=None):
+        if not mapping:
+            return []
+        rows = self._rows(mapping, timeout)
+        with self._transaction() as conn:
+            conn.executemany('INSERT OR REPLACE INTO cache (key, value, expires, stored_at) VALUES (?, ?, ?, ?)', rows)
+        self._written(len(rows))
+        return list(mapping)
+
+    def add(self, key, value, timeout=None):
+        row = self._rows({key: value}, timeout)[0]
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM cache WHERE key = ? AND expires IS NOT NULL AND expires <= ?', (row[0], time.time()))
+            added = conn.execute(
+                'INSERT OR IGNORE INTO cache (key, value, expires, stored_at) VALUES (?, ?, ?, ?)', row
+            ).rowcount == 1
+        if added:
+            self._written()
+        return added
+
+    def delete(self, key):
+        return bool(self.delete_many(key))
+
+    def delete_many(self, *keys):
+        deleted = []
+        with self._transaction() as conn:
+            for key in keys:
+                if conn.execute('DELETE FROM cache WHERE key = ?', (self.key_prefix + key,)).rowcount:
+                    deleted.append(key)
+        return deleted
+
+    def has(self, key):
+        return self._connection().execute(
+            'SELECT 1 FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self.key_prefix + key, time.time())
+        ).fetchone() is not None
+
+    def clear(self):
+        with self._transaction() as conn:
+            conn.execute('DELETE FROM cache WHERE substr(key, 1, ?) = ?', (len(self.key_prefix), self.key_prefix))
+        return True
+
+    def inc(self, key, delta=1):
+        # Atomic across processes: the read and the write share one write transaction
+        prefixed = self.key_prefix + key
+        with self._transaction() as conn:
+            row = conn.execute(
+                'SELECT value, expires FROM cache WHERE key = ? AND (expires IS NULL OR expires > ?)',
+                (prefixed, time.time())
+            ).fetchone()
+            value = (pickle.loads(row[0]) if row else 0) + delta
+            conn.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires, stored_at) VALUES (?, ?, ?, ?)',
+                (prefixed, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), row[1] if row else self._expires(None), time.time())
+            )
+        return value
+
+    def dec(self, key, delta=1):
+        return self.inc(key, -delta)
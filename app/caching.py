@@ -0,0 +1,152 @@
+import os
+import hashlib
+import uuid
+from functools import wraps
+from flask import current_app, request
+from flask_caching import Cache
+from flask_login import current_user
+from .models import db, Share, Visualisation
+
+# API responses are cached per user. Every key embeds the requesting user's
+# id plus a version token for each scope the response depends on (the user
+# and, for single objects, the object itself). Changing data never deletes
+# keys: the invalidation hooks below replace the scope's version token, so
+# all entries built from the old one are simply never read again and age
+# out. Version tokens are random rather than counters so an evicted token
+# can never be recreated with a value an old entry still carries.
+
+# With a shared backend (CACHE_TYPE filesystem, sqlite or redis) the version
+# tokens live in the same store as the entries, so a write handled by one
+# worker invalidates the entries of every worker. The default in-process
+# SimpleCache is only correct for a single worker.
+
+cache = Cache()
+
+VERSION_PREFIX = 'version/'
+
+# Short CACHE_TYPE names; anything else is passed to Flask-Caching unchanged
+CACHE_BACKENDS = {
+    'simple': 'SimpleCache',
+    'filesystem': 'FileSystemCache',
+    'sqlite': f'{__package__}.cache_backends.SQLiteCache',
+    'redis': 'RedisCache',
+}
+
+
+def init_cache(app):
+    """Resolve the configured cache backend and initialise the cache for ``app``."""
+    backend = app.config.get('CACHE_TYPE') or 'simple'
+    app.config['CACHE_TYPE'] = CACHE_BACKENDS.get(backend.lower(), backend)
+    if app.config['CACHE_TYPE'] == 'FileSystemCache' and not app.config.get('CACHE_DIR'):
+        app.config['CACHE_DIR'] = os.path.join(app.instance_path, 'cache')
+    if app.config['CACHE_TYPE'] == CACHE_BACKENDS['sqlite'] and not app.config.get('CACHE_SQLITE_PATH'):
+        app.config['CACHE_SQLITE_PATH'] = os.path.join(app.instance_path, 'cache.sqlite3')
+    cache.init_app(app)
+    app.logger.info(f"Response cache backend: {app.config['CACHE_TYPE']}")
+
+
+def _scope_versions(scopes):
+    # One round trip for all scopes; missing tokens (new or evicted) are created
+    keys = [VERSION_PREFIX + scope for scope in scopes]
+    versions = cache.get_many(*keys)
+    missing = {key: uuid.uuid4().hex[:12] for key, version in zip(keys, versions) if version is None}
+    if missing:
+        cache.set_many(missing, timeout=0)
+    return [version or missing[key] for key, version in zip(keys, versions)]
+
+
+def bump_scopes(*scopes):
+    """Invalidate every cached response that depends on any of ``scopes``."""
+    cache.set_many({VERSION_PREFIX + scope: uuid.uuid4().hex[:12] for scope in scopes}, timeout=0)
+
+
+def user_scope(user_id):
+    return f'user/{user_id}'
+
+
+def visualisation_scope(visualisation_id):
+    return f'visualisation/{visualisation_id}'
+
+
+def user_cache_key(scopes=()):
+    """Cache key for the current request, the current user and the current versions of ``scopes``."""
+    user_id = current_user.get_id() if current_user.is_authenticated else 'anonymous'
+    scopes = (user_scope(user_id),) + tuple(scopes)
+    versions = ','.join(f'{scope}={version}' for scope, version in zip(scopes, _scope_versions(scopes)))
+    query = '&'.join(f'{k}={v}' for k, v in sorted(request.args.items(multi=True)))
+    digest = hashlib.sha256(f'{request.path}?{query}|{versions}'.encode('utf-8')).hexdigest()[:32]
+    return f'api/{user_id}/{digest}'
+
+
+def user_cached(timeout=None, scopes=None):
+    """
+    Cache a view's successful responses per user.
+
+    Args:
+        timeout: Seconds to keep entries; defaults to the ``API_CACHE_TIMEOUT`` config
+        scopes: Optional callable taking the view's arguments and returning the
+            extra scopes (e.g. ``visualisation_scope(id)``) the response depends on
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            key = user_cache_key(scopes(**kwargs) if scopes else ())
+            cached = cache.get(key)
+            if cached is not None:
+                body, mimetype = cached
+                return current_app.response_class(body, mimetype=mimetype)
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200 and not response.direct_passthrough:
+                ttl = timeout if timeout is not None else current_app.config.get('API_CACHE_TIMEOUT', 300)
+                cache.set(key, (response.get_data(), response.mimetype), timeout=ttl)
+            return response
+        return wrapper
+    return decorator
+
+
+# Invalidation hooks, called after the change is committed. Deletes collect
+# the scopes first (``*_scopes``) and bump them once the rows are gone.
+
+def invalidate_user(*user_ids):
+    """A user's own listings changed (e.g. something was shared with or unshared from them)."""
+    bump_scopes(*(user_scope(user_id) for user_id in user_ids))
+
+
+def visualisation_scopes(visualisation):
+    """Scopes affected by a dashboard: the dashboard, its owner and everyone it is shared with."""
+    target_ids = [row.target_id for row in Share.query.filter_by(
+        object_type='visualisation', object_id=visualisation.id
+    ).with_entities(Share.target_id)]
+    user_ids = {visualisation.dataset.user_id, *target_ids}
+    return [visualisation_scope(visualisation.id)] + [user_scope(user_id) for user_id in user_ids]
+
+
+def invalidate_visualisation(visualisation):
+    """A dashboard was created, changed or (un)shared."""
+    bump_scopes(*visualisation_scopes(visualisation))
+
+
+def dataset_scopes(dataset):
+    """
+    Scopes affected by a dataset.
+
+    Its owner and share targets see it in their listings, and every dashboard
+    built on it (and everyone those are shared with) embeds its data and
+    visibility.
+    """
+    visualisation_ids = [row.id for row in db.session.query(Visualisation.id).filter_by(dataset_id=dataset.id)]
+    shares = Share.query.filter(
+        db.or_(
+            db.and_(Share.object_type == 'dataset', Share.object_id == dataset.id),
+            db.and_(Share.object_type == 'visualisation', Share.object_id.in_(visualisation_ids))
+        )
+    ).with_entities(Share.target_id)
+    user_ids = {dataset.user_id, *(row.target_id for row in shares)}
+    return [visualisation_scope(visualisation_id) for visualisation_id in visualisation_ids] + \
+        [user_scope(user_id) for user_id in user_ids]
+
+
+def invalidate_dataset(dataset):
+    """A dataset was uploaded, ingested, made public or private, or (un)shared."""
+    bump_scopes(*dataset_scopes(dataset))
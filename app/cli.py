@@ -153,4 +153,21 @@ def register_commands(app):
         # Copy the database file
         shutil.copy2(db_path, output_file)
         
-        click.echo(f'Backed up database to {output_file}.')
\ No newline at end of file
+        click.echo(f'Backed up database to {output_file}.')
+
+    @app.cli.command('template-cache')
+    @click.argument('action', type=click.Choice(['stats', 'clear', 'evict']), default='stats')
+    @with_appcontext
+    def template_cache_command(action):
+        """Show statistics of, clear, or evict from the generated template cache."""
+        from .services.template_cache import template_cache_stats, clear_templates, evict
+        
+        if action == 'clear':
+            click.echo(f'Removed {clear_templates()} cached templates.')
+        elif action == 'evict':
+            click.echo(f'Evicted {evict()} cached templates.')
+        else:
+            stats = template_cache_stats()
+            hit_rate = f"{stats['hit_rate']:.0%}" if stats['hit_rate'] is not None else 'n/a'
+            click.echo(f"Entries: {stats['entries']} ({stats['size_bytes'] / 1024 / 1024:.1f} MB)")
+            click.echo(f"Hits: {stats['hits']}  Misses: {stats['misses']}  Hit rate: {hit_rate}")
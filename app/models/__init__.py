@@ -1,16 +1,51 @@
 from datetime import datetime
+from flask import current_app, has_app_context
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from sqlalchemy.dialects import sqlite
 
-# Enable SQLite foreign key support
+# Pragmas applied to every SQLite connection, selected by SQLITE_PROFILE
+# (single pragmas can be overridden with SQLITE_PRAGMAS).
+SQLITE_PROFILES = {
+    # SQLite's own defaults: rollback journal, fsync on every commit
+    'default': {},
+    # WAL lets readers (Socket.IO polling, page views) run while one writer
+    # commits, and with synchronous=NORMAL a commit appends to the WAL without
+    # an fsync (a power loss can drop the last commits, never corrupt).
+    # busy_timeout makes writers wait for the lock instead of failing with
+    # "database is locked".
+    'performance': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': 10000,          # ms
+        'mmap_size': 256 * 1024 * 1024,  # bytes of the file read through mmap
+        'cache_size': -64000,           # negative: KiB of page cache per connection
+        'temp_store': 'MEMORY'
+    }
+}
+DEFAULT_SQLITE_PROFILE = 'performance'
+
+
+def sqlite_pragmas():
+    """Pragmas for new SQLite connections, from the app config when there is one."""
+    if not has_app_context():
+        return SQLITE_PROFILES[DEFAULT_SQLITE_PROFILE]
+    profile = SQLITE_PROFILES[current_app.config.get('SQLITE_PROFILE', DEFAULT_SQLITE_PROFILE)]
+    return dict(profile, **current_app.config.get('SQLITE_PRAGMAS', {}))
+
+
+# Enable SQLite foreign key support and apply the tuning profile
 @event.listens_for(Engine, "connect")
-def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+def configure_sqlite_connection(dbapi_connection, connection_record):
     if dbapi_connection.__class__.__module__.startswith('sqlite3'):
         cursor = dbapi_connection.cursor()
         cursor.execute("PRAGMA foreign_keys=ON")
+        for name, value in sqlite_pragmas().items():
+            cursor.execute(f"PRAGMA {name}={value}")
         cursor.close()
 
 # Initialize SQLAlchemy
@@ -30,6 +65,7 @@ class User(UserMixin, db.Model):
     datasets = db.relationship('Dataset', backref='owner', lazy='dynamic', cascade='all, delete-orphan')
     owned_shares = db.relationship('Share', foreign_keys='Share.owner_id', backref='owner', lazy='dynamic')
     received_shares = db.relationship('Share', foreign_keys='Share.target_id', backref='target', lazy='dynamic')
+    generation_jobs = db.relationship('GenerationJob', backref='user', lazy='dynamic', cascade='all, delete-orphan')
     
     @property
     def password(self):
@@ -51,6 +87,11 @@ class User(UserMixin, db.Model):
 class Dataset(db.Model):
     """Dataset model for storing uploaded datasets."""
     __tablename__ = 'dataset'
+    __table_args__ = (
+        # Owner's listing (newest first) and the public listing
+        db.Index('ix_dataset_user_id_uploaded_at', 'user_id', 'uploaded_at'),
+        db.Index('ix_dataset_is_public_uploaded_at', 'is_public', 'uploaded_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
@@ -62,9 +103,17 @@ class Dataset(db.Model):
     n_columns = db.Column(db.Integer, nullable=False)
     is_public = db.Column(db.Boolean, default=False)
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
+    status = db.Column(db.String(20), nullable=False, default='ready', server_default='ready')  # pending, processing, ready, failed
+    error_message = db.Column(db.Text, nullable=True)
+    profile = db.Column(db.JSON, nullable=True)  # per-column statistics computed at ingestion
     
     # Relationships
     visualisations = db.relationship('Visualisation', backref='dataset', lazy='dynamic', cascade='all, delete-orphan')
+    generation_jobs = db.relationship('GenerationJob', backref='dataset', lazy='dynamic', cascade='all, delete-orphan')
+    
+    @property
+    def is_ready(self):
+        return self.status == 'ready'
     
     def __repr__(self):
         return f'<Dataset {self.filename}>'
@@ -72,20 +121,116 @@ class Dataset(db.Model):
 class Visualisation(db.Model):
     """Visualisation model for storing generated visualisations."""
     __tablename__ = 'visualisation'
+    __table_args__ = (
+        # A dataset's dashboards, newest first
+        db.Index('ix_visualisation_dataset_id_created_at', 'dataset_id', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id'), nullable=False)
     title = db.Column(db.String(128), nullable=False)
     description = db.Column(db.Text, nullable=True)
-    spec = db.Column(db.Text, nullable=False)  # HTML/SVG/js snippet
+    # HTML/SVG/js template (the ``spec`` property), compressed and with its
+    # boilerplate replaced by DashboardAsset references, see
+    # services/spec_storage. Deferred so listings never load it; the dashboard
+    # views load it with the access check (see permissions)
+    spec_blob = db.deferred(db.Column(db.LargeBinary, nullable=False))
+    spec_codec = db.Column(db.String(8), nullable=False)  # zstd or zlib
+    data_options = db.Column(db.JSON, nullable=True)  # payload reduction settings, see services/payload_reducer
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
+    @property
+    def spec(self):
+        """The dashboard template, decompressed on first access."""
+        from ..services.spec_storage import unpack_spec
+        blob = self.spec_blob
+        cached = self.__dict__.get('_spec_html')
+        if cached is None or cached[0] is not blob:
+            cached = self.__dict__['_spec_html'] = (blob, unpack_spec(blob, self.spec_codec))
+        return cached[1]
+    
+    @spec.setter
+    def spec(self, html):
+        # Compression only; the assets it references are saved with the row (store_dashboard_assets)
+        from ..services.spec_storage import pack_spec
+        self.spec_blob, self.spec_codec, self.__dict__['_spec_assets'] = pack_spec(html)
+        self.__dict__['_spec_html'] = (self.spec_blob, html)
+    
     def __repr__(self):
         return f'<Visualisation {self.title}>'
 
+class DashboardAsset(db.Model):
+    """Boilerplate shared by many dashboard templates, stored once per version."""
+    __tablename__ = 'dashboard_asset'
+    __table_args__ = (
+        db.UniqueConstraint('name', 'version', name='uq_dashboard_asset_name_version'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(64), nullable=False)
+    version = db.Column(db.String(16), nullable=False)  # hash of the content
+    content = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<DashboardAsset {self.name}@{self.version}>'
+
+class GenerationJob(db.Model):
+    """Background dashboard generation request and its progress."""
+    __tablename__ = 'generation_job'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False, index=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey('dataset.id', ondelete='CASCADE'), nullable=False)
+    visualisation_id = db.Column(db.Integer, db.ForeignKey('visualisation.id', ondelete='SET NULL'), nullable=True)
+    title = db.Column(db.String(128), nullable=False)
+    description = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    use_template_cache = db.Column(db.Boolean, nullable=False, default=True)  # False: always call Claude
+    # Token usage of the Claude request (none when a cached template was reused)
+    input_tokens = db.Column(db.Integer, nullable=True)
+    output_tokens = db.Column(db.Integer, nullable=True)
+    cache_creation_input_tokens = db.Column(db.Integer, nullable=True)
+    cache_read_input_tokens = db.Column(db.Integer, nullable=True)
+    message = db.Column(db.String(256), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+    
+    def __repr__(self):
+        return f'<GenerationJob {self.id} {self.status}>'
+
+class TemplateCacheEntry(db.Model):
+    """Generated dashboard template, keyed by a hash of the prompt and model settings."""
+    __tablename__ = 'template_cache'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(64), nullable=False, unique=True)  # see services/template_cache
+    model_name = db.Column(db.String(64), nullable=False)
+    template = db.Column(db.Text, nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    def __repr__(self):
+        return f'<TemplateCacheEntry {self.key[:12]}>'
+
 class Share(db.Model):
     """Share model for managing access to datasets and visualisations."""
     __tablename__ = 'share'
+    __table_args__ = (
+        # Permission checks and "who is this shared with" (object first) ...
+        db.Index('ix_share_object_type_object_id_target_id', 'object_type', 'object_id', 'target_id'),
+        # ... and "what is shared with me" listings (target first)
+        db.Index('ix_share_target_id_object_type_object_id', 'target_id', 'object_type', 'object_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     owner_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -95,4 +240,27 @@ class Share(db.Model):
     granted_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __repr__(self):
-        return f'<Share {self.object_type} {self.object_id} from {self.owner_id} to {self.target_id}>'
\ No newline at end of file
+        return f'<Share {self.object_type} {self.object_id} from {self.owner_id} to {self.target_id}>'
+
+
+@event.listens_for(Session, 'before_flush')
+def store_dashboard_assets(session, flush_context, instances):
+    """Save the DashboardAssets referenced by dashboard templates set since the last flush."""
+    assets = {}
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Visualisation):
+            for name, version, content in obj.__dict__.pop('_spec_assets', None) or ():
+                assets[(name, version)] = content
+    if not assets:
+        return
+    if session.get_bind().dialect.name == 'sqlite':
+        # Assets are immutable per version, so another worker storing the same one is fine
+        session.execute(sqlite.insert(DashboardAsset).values([
+            {'name': name, 'version': version, 'content': content, 'created_at': datetime.utcnow()}
+            for (name, version), content in assets.items()
+        ]).on_conflict_do_nothing(index_elements=['name', 'version']))
+        return
+    with session.no_autoflush:
+        for (name, version), content in assets.items():
+            if session.query(DashboardAsset.id).filter_by(name=name, version=version).first() is None:
+                session.add(DashboardAsset(name=name, version=version, content=content))
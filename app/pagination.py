@@ -0,0 +1,125 @@
+import json
+import base64
+import binascii
+from datetime import datetime
+from flask import current_app, request, url_for
+from sqlalchemy import and_, or_
+
+# Keyset pagination: listings are ordered newest first by (timestamp, id) and
+# each page starts after the last row of the previous one, so fetching a page
+# costs the same however deep it is and rows inserted meanwhile do not shift
+# later pages. The cursor token is the URL-safe base64 of that last
+# (timestamp, id) pair; it names a position, not a page number, so it stays
+# valid as rows are added or removed.
+
+
+class InvalidCursor(ValueError):
+    """A cursor token that was not produced by ``encode_cursor``."""
+
+
+def encode_cursor(timestamp, object_id):
+    """Opaque token for the position after the row ``(timestamp, object_id)``."""
+    payload = json.dumps([timestamp.isoformat(), object_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """The ``(timestamp, id)`` pair of a cursor token; raises InvalidCursor if it is malformed."""
+    try:
+        payload = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        timestamp, object_id = json.loads(payload)
+        if not isinstance(object_id, int) or isinstance(object_id, bool):
+            raise TypeError(object_id)
+        return datetime.fromisoformat(timestamp), object_id
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError) as e:
+        raise InvalidCursor(f'Invalid cursor: {token!r}') from e
+
+
+def page_size(arg='limit'):
+    """
+    Page size requested in the query argument ``arg``.
+
+    Defaults to ``PAGE_SIZE`` and is clamped to 1..``PAGE_SIZE_MAX``.
+    """
+    default = current_app.config.get('PAGE_SIZE', 50)
+    size = request.args.get(arg, default, type=int)
+    return max(1, min(size, current_app.config.get('PAGE_SIZE_MAX', 100)))
+
+
+class KeysetPage:
+    """One page of a keyset-paginated listing."""
+
+    def __init__(self, items, cursor, next_cursor):
+        self.items = items
+        self.cursor = cursor  # token this page started after, None on the first page
+        self.next_cursor = next_cursor  # token of the following page, None on the last page
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    def next_url(self, endpoint, arg='cursor', **values):
+        """URL of the following page, keeping the request's other query arguments."""
+        args = dict(request.args.items(), **values)
+        args[arg] = self.next_cursor
+        return url_for(endpoint, **args)
+
+    def first_url(self, endpoint, arg='cursor', **values):
+        """URL of the first page, keeping the request's other query arguments."""
+        args = dict(request.args.items(), **values)
+        args.pop(arg, None)
+        return url_for(endpoint, **args)
+
+
+def keyset_page(query, timestamp_column, id_column, cursor=None, limit=50):
+    """
+    Fetch the page of ``query`` after ``cursor``, newest first.
+
+    Args:
+        query: Query selecting entities or rows that carry ``timestamp_column``
+            and ``id_column`` under their own names; its ORDER BY is replaced
+        timestamp_column: Sort column, e.g. ``Dataset.uploaded_at``
+        id_column: Unique tiebreaker, e.g. ``Dataset.id``
+        cursor: Token from a previous page's ``next_cursor``, or None for the first page
+        limit: Rows per page
+
+    Raises:
+        InvalidCursor: If ``cursor`` is malformed
+    """
+    if cursor:
+        after_timestamp, after_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            timestamp_column < after_timestamp,
+            and_(timestamp_column == after_timestamp, id_column < after_id)
+        ))
+    rows = query.order_by(None).order_by(timestamp_column.desc(), id_column.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor(getattr(last, timestamp_column.key), getattr(last, id_column.key))
+    return KeysetPage(rows, cursor or None, next_cursor)
+
+
+def request_page(query, timestamp_column, id_column, arg='cursor', limit=None):
+    """
+    ``keyset_page`` for the cursor in the query argument ``arg``.
+
+    An invalid cursor on a page (not an API) just shows the first page, so
+    this is meant for HTML views; APIs report InvalidCursor as a 400.
+    """
+    cursor = request.args.get(arg)
+    limit = limit or page_size()
+    try:
+        return keyset_page(query, timestamp_column, id_column, cursor, limit)
+    except InvalidCursor:
+        return keyset_page(query, timestamp_column, id_column, None, limit)
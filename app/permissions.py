@@ -0,0 +1,139 @@
+from functools import partial
+from typing import NamedTuple, Optional
+from flask import abort, g, request, has_request_context
+from flask_login import current_user
+from sqlalchemy.orm import undefer
+from .models import db, Dataset, Visualisation, Share
+
+# Who may see a dataset or dashboard, resolved in one query per lookup:
+#   owner  - the dataset's uploader (dashboards belong to their dataset's owner)
+#   shared - shared with the user (dataset shares cover the dataset only)
+#   public - the dataset is public, which also opens every dashboard built on it
+# Results are memoized in flask.g for the rest of the request, so repeated
+# checks (a route, then its template or helpers) do not query again. A route
+# that changes ownership, shares or visibility and then checks again in the
+# same request must call forget_access() first.
+
+OWNER = 'owner'
+SHARED = 'shared'
+PUBLIC = 'public'
+
+
+class Access(NamedTuple):
+    """A user's access to one dataset or dashboard."""
+    obj: object  # the Dataset or Visualisation
+    dataset: Dataset  # the dataset itself, or the dashboard's dataset
+    level: Optional[str]  # OWNER, SHARED, PUBLIC or None
+
+    @property
+    def can_view(self):
+        return self.level is not None
+
+    @property
+    def is_owner(self):
+        return self.level == OWNER
+
+
+def _user_id():
+    return current_user.id if current_user.is_authenticated else None
+
+
+def _memo():
+    if not has_request_context():
+        return {}
+    # g belongs to the app context, which requests may share (e.g. under an
+    # app context pushed by a test or a job), so the memo is tied to the request
+    current = request._get_current_object()
+    if g.get('_access_request') is not current:
+        g._access_request, g._access = current, {}
+    return g._access
+
+
+def _level(dataset, shared, user_id):
+    if user_id is not None and dataset.user_id == user_id:
+        return OWNER
+    if shared:
+        return SHARED
+    if dataset.is_public:
+        return PUBLIC
+    return None
+
+
+def _resolve(kind, ids, query):
+    user_id = _user_id()
+    memo = _memo()
+    missing = [object_id for object_id in set(ids) if (kind, user_id, object_id) not in memo]
+    if missing:
+        found = {}
+        for obj, dataset, shared in query(missing, user_id):
+            found[obj.id] = Access(obj, dataset, _level(dataset, shared, user_id))
+        for object_id in missing:
+            memo[(kind, user_id, object_id)] = found.get(object_id)
+    return {object_id: memo[(kind, user_id, object_id)] for object_id in ids}
+
+
+def _shared_with(user_id, object_type, object_id_column):
+    return db.exists().where(
+        Share.object_type == object_type,
+        Share.object_id == object_id_column,
+        Share.target_id == user_id
+    )
+
+
+def _dataset_rows(ids, user_id):
+    rows = db.session.query(Dataset, _shared_with(user_id, 'dataset', Dataset.id)).filter(Dataset.id.in_(ids))
+    return [(dataset, dataset, shared) for dataset, shared in rows]
+
+
+def _visualisation_rows(ids, user_id, with_spec=False):
+    query = db.session.query(Visualisation, Dataset, _shared_with(user_id, 'visualisation', Visualisation.id)).\
+        join(Dataset, Visualisation.dataset_id == Dataset.id).\
+        filter(Visualisation.id.in_(ids))
+    if with_spec:
+        query = query.options(undefer(Visualisation.spec_blob))
+    return query.all()
+
+
+def dataset_access_many(dataset_ids):
+    """Access of the current user to each dataset, as ``{id: Access}`` (None for ids that do not exist)."""
+    return _resolve('dataset', dataset_ids, _dataset_rows)
+
+
+def visualisation_access_many(visualisation_ids, with_spec=False):
+    """
+    Access of the current user to each dashboard, as ``{id: Access}`` (None for ids that do not exist).
+
+    ``with_spec`` loads the (deferred) stored dashboard templates in the same query.
+    """
+    return _resolve('visualisation', visualisation_ids, partial(_visualisation_rows, with_spec=with_spec))
+
+
+def dataset_access(dataset_id):
+    """Access of the current user to a dataset, or None if it does not exist."""
+    return dataset_access_many([dataset_id])[dataset_id]
+
+
+def visualisation_access(visualisation_id, with_spec=False):
+    """Access of the current user to a dashboard, or None if it does not exist."""
+    return visualisation_access_many([visualisation_id], with_spec)[visualisation_id]
+
+
+def dataset_access_or_404(dataset_id):
+    """Like ``dataset_access``, aborting with 404 if the dataset does not exist."""
+    access = dataset_access(dataset_id)
+    if access is None:
+        abort(404)
+    return access
+
+
+def visualisation_access_or_404(visualisation_id, with_spec=False):
+    """Like ``visualisation_access``, aborting with 404 if the dashboard does not exist."""
+    access = visualisation_access(visualisation_id, with_spec)
+    if access is None:
+        abort(404)
+    return access
+
+
+def forget_access():
+    """Drop the memoized results of this request."""
+    _memo().clear()
@@ -0,0 +1,87 @@
+import gzip
+import hashlib
+import json
+from flask import current_app, request, Response
+from werkzeug.http import is_resource_modified
+
+try:
+    import brotli
+except ImportError:  # optional: without it responses fall back to gzip
+    brotli = None
+
+COMPRESS_MIN_BYTES = 1024
+
+
+def make_etag(*parts):
+    """Stable validator for a response built from ``parts`` (any JSON-serialisable values)."""
+    payload = json.dumps(parts, sort_keys=True, default=str).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()[:32]
+
+
+def json_with_raw_fields(obj, **raw_fields):
+    """
+    Serialise the dict ``obj`` plus fields whose values are already JSON text.
+
+    Lets large pre-encoded payloads be embedded without parsing them back
+    into Python objects first.
+    """
+    parts = [json.dumps(obj)[1:-1]] if obj else []
+    parts += [f'{json.dumps(key)}: {value}' for key, value in raw_fields.items()]
+    return '{' + ', '.join(parts) + '}'
+
+
+def choose_encoding(accept_encodings):
+    """Best supported content coding the client accepts: ``'br'``, ``'gzip'`` or None."""
+    if brotli is not None and accept_encodings['br']:
+        return 'br'
+    if accept_encodings['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    """Compress ``body`` (bytes) with a coding from ``choose_encoding``."""
+    if encoding == 'br':
+        return brotli.compress(body, quality=current_app.config.get('BROTLI_QUALITY', 5))
+    if encoding == 'gzip':
+        return gzip.compress(body, compresslevel=current_app.config.get('GZIP_LEVEL', 6))
+    return body
+
+
+def _cache_headers(response, etag):
+    response.set_etag(etag, weak=True)  # weak: the same data is served in several encodings
+    # Private (per-user permissions) and revalidated on every use; the ETag
+    # makes revalidation a cheap 304 when nothing changed
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Accept-Encoding')
+    response.vary.add('Cookie')
+    return response
+
+
+def not_modified(etag):
+    """
+    A 304 response if the client's copy (If-None-Match) is current, else None.
+
+    Call it before building the body so unchanged resources cost no work.
+    """
+    if is_resource_modified(request.environ, etag=etag):
+        return None
+    return _cache_headers(Response(status=304), etag)
+
+
+def cacheable_response(body, mimetype, etag):
+    """
+    Build a revalidatable response, compressed with the best coding the client accepts.
+
+    Args:
+        body: Response body (str or bytes)
+        mimetype: Content type of the body
+        etag: Validator from ``make_etag``
+    """
+    if isinstance(body, str):
+        body = body.encode('utf-8')
+    encoding = choose_encoding(request.accept_encodings) if len(body) >= COMPRESS_MIN_BYTES else None
+    response = Response(compress(body, encoding), mimetype=mimetype)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    return _cache_headers(response, etag)
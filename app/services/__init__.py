@@ -1,12 +1,17 @@
 # Import services for easier access
 from .data_processor import DataProcessor
 from .claude_client import ClaudeClient
+from .job_queue import JobQueue
+from .rate_governor import RateGovernor
+from .ingestion import ingestion_queue
 
 # Instantiate services that need app context for configuration
 claude_service = ClaudeClient()
+job_queue = JobQueue()
+rate_governor = RateGovernor()
 # DataProcessor can be instantiated directly where needed if it doesn't require app-level config at init
 # or you can instantiate it here too if you prefer:
 # data_processor_service = DataProcessor()
 
 
-__all__ = ['DataProcessor', 'claude_service'] # Make the instance available
\ No newline at end of file
+__all__ = ['DataProcessor', 'claude_service', 'job_queue', 'rate_governor', 'ingestion_queue'] # Make the instance available
\ No newline at end of file
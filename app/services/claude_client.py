@@ -1,10 +1,186 @@
 import os
+import re
 import json
-import time
+import codecs
+import random
+import asyncio
+import contextvars
+import email.utils
+from datetime import datetime, timezone
+import httpx
 import anthropic
 from flask import current_app
-import pandas as pd
 from ..models import Dataset
+from .profiling import get_dataset_profile
+from .dashboard_template import ERROR_HANDLING_SCRIPT
+from .template_cache import template_cache_enabled, template_cache_key, get_cached_template, store_template
+
+# Status codes worth retrying: timeouts, conflicts, rate limits, server errors
+# and 529 (overloaded). Other 4xx responses fail the same way on every retry.
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def retry_after_seconds(error):
+    """Delay requested by the API in ``retry-after-ms`` / ``retry-after`` headers, or None."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None)
+    if not headers:
+        return None
+    try:
+        if headers.get('retry-after-ms'):
+            return max(float(headers['retry-after-ms']) / 1000, 0.0)
+    except ValueError:
+        pass
+    value = headers.get('retry-after')
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:  # HTTP-date form
+        retry_at = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+# Streamed dashboards are checked as they arrive: output that still has no
+# HTML document start after this many characters is abandoned early
+DASHBOARD_START = re.compile(r'<!doctype html|<html', re.IGNORECASE)
+VALIDATE_WITHIN_CHARS = 600
+CHARS_PER_TOKEN = 4  # rough size of a token, for progress while streaming
+
+# State of the ClaudeClient._run call in progress, if any: {'client': ...} once it made one
+_call_client = contextvars.ContextVar('claude_call_client', default=None)
+
+# Sample of the raw file included in the analysis prompt
+ANALYSIS_HEAD_ROWS = 50
+ANALYSIS_HEAD_CHARS = 2000
+
+
+class MalformedOutputError(ValueError):
+    """Streamed output that is clearly not what was asked for; the request was aborted."""
+
+
+def check_dashboard_prefix(text):
+    """
+    Validate the start of a partial dashboard response.
+
+    Returns True once the response is known to be an HTML document, False
+    while it is too short to tell, and raises MalformedOutputError when it
+    can no longer become one.
+    """
+    if DASHBOARD_START.search(text, 0, VALIDATE_WITHIN_CHARS):
+        return True
+    if len(text) >= VALIDATE_WITHIN_CHARS:
+        preview = ' '.join(text[:120].split())
+        raise MalformedOutputError(f"Claude's response is not an HTML document: {preview!r}")
+    return False
+
+
+def is_retryable(error):
+    if isinstance(error, anthropic.APIConnectionError):  # includes timeouts
+        return True
+    return isinstance(error, anthropic.APIStatusError) and error.status_code in RETRYABLE_STATUS_CODES
+
+
+DASHBOARD_SYSTEM_PROMPT = (
+    "You are a data visualization expert that creates beautiful, interactive dashboard HTML templates using "
+    "HTML, CSS, and JavaScript. The data will be injected via a `window.dynadashData` variable. You only respond "
+    "with complete HTML code, with no explanations or Markdown outside the HTML itself."
+)
+
+# Identical for every dashboard, so it is sent as a cacheable prompt prefix
+# (see ClaudeClient._dashboard_system); keep request-specific text out of it.
+DASHBOARD_INSTRUCTIONS = """
+# Dashboard template instructions
+You are an expert data visualization web developer. Your task is to create a complete, interactive, self-contained HTML file (with embedded CSS and JavaScript) that serves as a template for a dashboard. This template will later be populated with actual data. Each request gives the dashboard title, description and the dataset's structure.
+
+# CRITICAL DATA INJECTION INSTRUCTION:
+The actual dataset will be injected into the dashboard via a global JavaScript variable: `window.dynadashData`.
+This `window.dynadashData` will be an array of JavaScript objects, where each object represents a row from the dataset.
+For example, if the dataset has columns "Name" (string) and "Age" (number), `window.dynadashData` would look like:
+`[
+  { "Name": "Alice", "Age": 30, ... },
+  { "Name": "Bob", "Age": 24, ... },
+  ...
+]`
+Your generated JavaScript code MUST:
+1. Access the data exclusively from `window.dynadashData`.
+2. Perform any necessary data transformations (e.g., string to number, date parsing if strings) on `window.dynadashData` before using it in charts.
+3. Do NOT embed any static example data directly into the script for the main visualizations. Placeholder data for UI layout during development is fine, but it should be replaced by `window.dynadashData`.
+4. Initialize all charts and interactive elements using the data from `window.dynadashData`.
+
+# Requirements for the Dashboard Template:
+1.  **Self-Contained HTML:** Produce a single HTML file with all CSS (in `<style>` tags) and JavaScript (in `<script>` tags) embedded.
+2.  **Multiple Visualizations:** Include at least 3-5 diverse and complementary charts (e.g., bar, line, scatter, pie, heatmap) suitable for the provided column types and dataset description.
+3.  **Interactivity:** Implement interactive elements (e.g., filters based on categorical columns, date range selectors if applicable, tooltips on charts). These interactive elements should dynamically update the visualizations based on `window.dynadashData`.
+4.  **Layout & Styling:**
+    *   Professionally designed, responsive, and visually appealing.
+    *   Clear sections, headers, and potentially a summary/KPI section.
+    *   Use a modern, clean aesthetic.
+5.  **Chart Libraries:** Use Chart.js (preferred for simplicity and wide compatibility) or D3.js for visualizations. Ensure the necessary library is linked via CDN if not fully embedded.
+6.  **Chart Best Practices:** Ensure charts have titles, axis labels, and legends where appropriate.
+7.  **Robust Initialization:** All JavaScript code for chart creation (e.g., `new Chart(ctx, config)`) must be complete and self-initializing on DOM load, using `window.dynadashData`.
+8.  **Error Handling (Basic):** The JavaScript should be robust enough not to break completely if `window.dynadashData` is empty or has unexpected minor variations (though assume the schema provided is generally correct).
+9.  **No External File Dependencies:** All assets like CSS or JS code snippets must be embedded. CDN links for major libraries (Chart.js, D3.js) are acceptable.
+
+# Response Format:
+Return ONLY the complete HTML code for the dashboard template, starting with `<!DOCTYPE html>`. Do not include any explanations, comments, or markdown formatting outside the HTML itself.
+The HTML should be ready to have the `window.dynadashData` variable populated and then viewed in a browser.
+""".strip()
+
+
+def read_file_head(path, max_chars=ANALYSIS_HEAD_CHARS, max_lines=ANALYSIS_HEAD_ROWS + 1):
+    """
+    Return the start of a UTF-8 text file without reading the rest of it.
+
+    At most ``max_lines`` lines and ``max_chars`` characters are kept, so only
+    ``4 * max_chars`` bytes (the most those characters can take) are read.
+
+    Returns:
+        (text, truncated) where ``truncated`` tells whether the file goes on
+    """
+    limit = max_chars * 4
+    with open(path, 'rb') as f:
+        raw = f.read(limit + 1)
+    # Incremental decoding drops a character cut off at the end of the read; invalid bytes still raise
+    text = codecs.getincrementaldecoder('utf-8')().decode(raw[:limit]).replace('\r\n', '\n')
+    head = ''.join(text.splitlines(keepends=True)[:max_lines])[:max_chars]
+    return head, len(raw) > limit or len(head) < len(text)
+
+
+def usage_to_dict(usage):
+    """Token counts of a response, including prompt cache reads and writes."""
+    return {
+        'input_tokens': getattr(usage, 'input_tokens', None) or 0,
+        'output_tokens': getattr(usage, 'output_tokens', None) or 0,
+        'cache_creation_input_tokens': getattr(usage, 'cache_creation_input_tokens', None) or 0,
+        'cache_read_input_tokens': getattr(usage, 'cache_read_input_tokens', None) or 0
+    }
+
+
+def _response_text(response):
+    if response.content and isinstance(response.content, list):
+        for block in response.content:
+            if block.type == 'text':
+                return block.text
+    return None
+
+
+def _strip_code_fence(text, language):
+    """Remove a Markdown code fence (```language ... ```) around a response."""
+    if text.strip().startswith(f"```{language}"):
+        text = text.split(f"```{language}", 1)[-1]
+        if text.strip().endswith("```"):
+            text = text.rsplit("```", 1)[0]
+    elif text.strip().startswith("```"):
+        text = text.strip()[3:-3] if text.strip().endswith("```") else text.strip()[3:]
+    return text.strip()
+
 
 class ClaudeClient:
     """Service for interacting with the Anthropic Claude API."""
@@ -12,12 +188,18 @@ class ClaudeClient:
     def __init__(self):
         """Initialize the Claude client with placeholders."""
         self.client = None
+        self._client_loop = None
+        self.base_url = None
+        self.stream = True
+        self.prompt_caching = True
         # Reverted to your original model name as a default.
         # This should ideally be configured via ANTHROPIC_MODEL_NAME in .env
         self.model_name = "claude-3-7-sonnet-20250219" 
         self.api_key = None
         self.max_retries = 3
         self.retry_delay = 5 
+        self.retry_max_delay = 60
+        self.max_connections = 20
         self.max_tokens_dashboard = 15000
         self.temperature_dashboard = 0.7
         self.max_tokens_analysis = 4000
@@ -27,8 +209,13 @@ class ClaudeClient:
         """Initialize with application-specific configuration."""
         self.model_name = app.config.get("ANTHROPIC_MODEL_NAME", self.model_name)
         self.api_key = app.config.get('ANTHROPIC_API_KEY')
+        self.base_url = app.config.get('ANTHROPIC_BASE_URL', self.base_url)
+        self.stream = app.config.get('ANTHROPIC_STREAM', self.stream)
+        self.prompt_caching = app.config.get('ANTHROPIC_PROMPT_CACHING', self.prompt_caching)
         self.max_retries = app.config.get("ANTHROPIC_MAX_RETRIES", self.max_retries)
         self.retry_delay = app.config.get("ANTHROPIC_RETRY_DELAY", self.retry_delay)
+        self.retry_max_delay = app.config.get("ANTHROPIC_RETRY_MAX_DELAY", self.retry_max_delay)
+        self.max_connections = app.config.get("ANTHROPIC_MAX_CONNECTIONS", self.max_connections)
         self.max_tokens_dashboard = app.config.get("ANTHROPIC_MAX_TOKENS_DASHBOARD", self.max_tokens_dashboard)
         self.temperature_dashboard = app.config.get("ANTHROPIC_TEMPERATURE_DASHBOARD", self.temperature_dashboard)
         self.max_tokens_analysis = app.config.get("ANTHROPIC_MAX_TOKENS_ANALYSIS", self.max_tokens_analysis)
@@ -37,83 +224,148 @@ class ClaudeClient:
         if not self.api_key:
             app.logger.warning("Anthropic API key is not set in config. ClaudeClient will not function if API calls are made.")
 
+    def _new_client(self):
+        """A new AsyncAnthropic client with its own HTTP connection pool; the SDK's retries are disabled."""
+        if not self.api_key:
+            current_app.logger.error("Anthropic API key is missing. Cannot initialize client.")
+            raise ValueError("Anthropic API key is not set. ClaudeClient cannot be initialized.")
+        try:
+            current_app.logger.info(f"Initializing Anthropic client with model: {self.model_name}, SDK version: {anthropic.__version__}")
+            return anthropic.AsyncAnthropic(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                max_retries=0,
+                http_client=anthropic.DefaultAsyncHttpxClient(limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections
+                ))
+            )
+        except Exception as e:
+            current_app.logger.error(f"Error initializing Anthropic client: {str(e)}", exc_info=True)
+            raise
+
     def _initialize_client(self):
-        if not self.client:
-            if not self.api_key:
-                current_app.logger.error("Anthropic API key is missing. Cannot initialize client.")
-                raise ValueError("Anthropic API key is not set. ClaudeClient cannot be initialized.")
-            
+        """
+        Return the AsyncAnthropic client for the running call.
+
+        Inside ``_run`` that is the call's own client. Otherwise the client
+        (and its HTTP connection pool) is created once per loop and reused by
+        every request made on it; in production that is the job queue's loop,
+        so all concurrent generations share one pool. Retries are left to
+        ``_create_message``.
+        """
+        call = _call_client.get()
+        if call is not None:
+            if 'client' not in call:
+                call['client'] = self._new_client()
+            return call['client']
+        loop = asyncio.get_running_loop()
+        if self.client is None or self._client_loop is not loop:
+            self.client = self._new_client()
+            self._client_loop = loop
+        return self.client
+
+    def _retry_delay(self, attempt, error=None):
+        """
+        Seconds to wait before retry number ``attempt + 1``.
+
+        A delay requested by the API (``retry-after``) is honoured as is;
+        otherwise exponential backoff with full jitter, so concurrent jobs
+        that failed together do not retry together.
+        """
+        requested = retry_after_seconds(error)
+        if requested is not None:
+            return requested
+        return random.uniform(0, min(self.retry_max_delay, self.retry_delay * 2 ** attempt))
+
+    async def _send(self, client, params, on_text):
+        if on_text is None:
+            return await client.messages.create(**params)
+        async with client.messages.stream(**params) as stream:
+            async for event in stream:
+                if event.type == 'text':
+                    on_text(event.snapshot)
+            return await stream.get_final_message()
+
+    async def _create_message(self, params, purpose, on_text=None, user_id=None):
+        """
+        Send a Messages API request, retrying transient failures without blocking the loop.
+
+        With ``on_text`` the response is streamed and ``on_text(text_so_far)``
+        is called for every text delta. If it raises, the stream is closed at
+        once, which abandons the rest of the generation, and the error
+        propagates without retries.
+
+        Each attempt first waits for a slot from the rate governor (see
+        services/rate_governor), queued fairly with the other calls of
+        ``user_id``'s peers; a 429 pauses every caller for the retry delay.
+        """
+        client = self._initialize_client()
+        governor = current_app.extensions.get('rate_governor')
+        if governor is not None:
+            # Estimated input and the full max_tokens are reserved, as the API counts them, until the usage is known
+            input_estimate = len(json.dumps([params.get('system', ''), params.get('messages', [])])) // CHARS_PER_TOKEN
+        for attempt in range(self.max_retries):
+            try:
+                if governor is None:
+                    return await self._send(client, params, on_text)
+                async with governor.slot(user_id, input_estimate, params.get('max_tokens', 0)) as permit:
+                    response = await self._send(client, params, on_text)
+                    usage = usage_to_dict(response.usage)
+                    permit.settle(usage['input_tokens'] + usage['cache_creation_input_tokens'], usage['output_tokens'])
+                    return response
+            except anthropic.APIError as e:
+                if isinstance(e, anthropic.NotFoundError):
+                    current_app.logger.error(f"Claude API NotFoundError for {purpose}: Model '{self.model_name}' not found or access denied. {e}")
+                    raise
+                retryable = is_retryable(e)
+                current_app.logger.error(f"Claude API error for {purpose} (attempt {attempt + 1}/{self.max_retries}): {type(e).__name__} - {e}")
+                if not retryable or attempt == self.max_retries - 1:
+                    raise
+                delay = self._retry_delay(attempt, e)
+                if governor is not None and isinstance(e, anthropic.RateLimitError):
+                    await asyncio.to_thread(governor.pause, delay)
+                current_app.logger.info(f"Retrying Claude {purpose} request in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+    def _run(self, coro):
+        """
+        Run a coroutine to completion from synchronous code.
+
+        The coroutine gets an event loop and, if it calls the API, a client
+        of its own, which is closed with its connections when it finishes;
+        the shared client of the job queue's loop is left alone.
+        """
+        async def run():
+            call = {}
+            _call_client.set(call)
             try:
-                current_app.logger.info(f"Initializing Anthropic client with model: {self.model_name}, SDK version: {anthropic.__version__}")
-                self.client = anthropic.Anthropic(api_key=self.api_key)
-            except Exception as e:
-                current_app.logger.error(f"Error initializing Anthropic client: {str(e)}", exc_info=True)
-                raise
+                return await coro
+            finally:
+                if 'client' in call:
+                    await call['client'].close()
+        return asyncio.run(run())
     
     def _get_dataset_metadata(self, dataset_id):
-        dataset = Dataset.query.get_or_404(dataset_id)
-        file_path = dataset.file_path
+        return self._metadata_for(Dataset.query.get_or_404(dataset_id))
 
-        if not os.path.exists(file_path):
-            current_app.logger.error(f"Dataset file not found for metadata: {file_path}")
-            raise FileNotFoundError(f"Dataset file not found: {file_path}")
-        
-        column_info = {}
-        df_preview = None 
-        full_df_for_stats = None
+    def _metadata_for(self, dataset):
+        dataset_id = dataset.id
+        if dataset.profile is None and not os.path.exists(dataset.file_path):
+            current_app.logger.error(f"Dataset file not found for metadata: {dataset.file_path}")
+            raise FileNotFoundError(f"Dataset file not found: {dataset.file_path}")
 
         try:
-            if dataset.file_type.lower() == 'csv':
-                df_preview = pd.read_csv(file_path, nrows=5) 
-                full_df_for_stats = pd.read_csv(file_path)
-            elif dataset.file_type.lower() == 'json':
-                full_df_for_stats = pd.read_json(file_path) 
-                df_preview = full_df_for_stats.head(5)
-            else:
+            if dataset.file_type.lower() not in ('csv', 'json'):
                 current_app.logger.error(f"Unsupported file type for metadata: {dataset.file_type}")
                 raise ValueError(f"Unsupported file type: {dataset.file_type}")
-                
-            for col_name_original in full_df_for_stats.columns:
-                col_name = str(col_name_original)
-                col_series = full_df_for_stats[col_name_original]
-                col_type_str = str(col_series.dtype)
-                stats = {"type": col_type_str, "name": col_name}
-
-                if pd.api.types.is_numeric_dtype(col_series):
-                    stats.update({
-                        "min": float(col_series.min()) if pd.notna(col_series.min()) else None,
-                        "max": float(col_series.max()) if pd.notna(col_series.max()) else None,
-                        "mean": float(col_series.mean()) if pd.notna(col_series.mean()) else None,
-                        "median": float(col_series.median()) if pd.notna(col_series.median()) else None,
-                        "std": float(col_series.std()) if pd.notna(col_series.std()) else None
-                    })
-                elif pd.api.types.is_datetime64_any_dtype(col_series):
-                    stats["type"] = "datetime"
-                    stats.update({
-                        "min": col_series.min().isoformat() if pd.notna(col_series.min()) else None,
-                        "max": col_series.max().isoformat() if pd.notna(col_series.max()) else None
-                    })
-                elif pd.api.types.is_categorical_dtype(col_series) or pd.api.types.is_object_dtype(col_series) or pd.api.types.is_string_dtype(col_series):
-                    unique_values_count = col_series.nunique()
-                    stats["unique_values"] = int(unique_values_count)
-                    if unique_values_count > 0 and unique_values_count < 10 : # Check if series is not all NaN for value_counts
-                         stats["top_values"] = col_series.value_counts().head(5).to_dict()
-                    elif unique_values_count > 0:
-                        stats["example_values"] = col_series.dropna().unique()[:3].tolist()
-                    else: # All NaN case
-                        stats["example_values"] = []
-
-
-                column_info[col_name] = stats
-                
+
+            # Profiled once at ingestion; older datasets are profiled and saved on first use
+            column_info = get_dataset_profile(dataset)
+
         except Exception as e:
             current_app.logger.warning(f"Could not generate detailed column statistics for dataset {dataset_id}: {str(e)}", exc_info=True)
-            if df_preview is not None:
-                for col_name_original in df_preview.columns:
-                    col_name = str(col_name_original)
-                    column_info[col_name] = {"type": str(df_preview[col_name_original].dtype), "name": col_name}
-            else:
-                 column_info = {"error": "Could not load dataframe to extract column info."}
+            column_info = {"error": "Could not load dataframe to extract column info."}
 
         return {
             "original_filename": dataset.original_filename,
@@ -124,10 +376,11 @@ class ClaudeClient:
         }
 
     def _create_dashboard_prompt(self, dataset_metadata, title, description=""):
+        """The per-request part of the dashboard prompt; the fixed instructions are in the system prompt."""
         column_info_str = json.dumps(dataset_metadata["column_info"], indent=2)
         
         prompt = f"""
-        You are an expert data visualization web developer. Your task is to create a complete, interactive, self-contained HTML file (with embedded CSS and JavaScript) that serves as a template for a dashboard. This template will later be populated with actual data.
+        Create the dashboard template described below, following the dashboard template instructions.
 
         # Dashboard Information
         Title: {title}
@@ -141,113 +394,105 @@ class ClaudeClient:
         
         # Column Information (Schema and basic statistics):
         {column_info_str}
-        
-        # CRITICAL DATA INJECTION INSTRUCTION:
-        The actual dataset will be injected into the dashboard via a global JavaScript variable: `window.dynadashData`.
-        This `window.dynadashData` will be an array of JavaScript objects, where each object represents a row from the dataset.
-        For example, if the dataset has columns "Name" (string) and "Age" (number), `window.dynadashData` would look like:
-        `[
-          {{ "Name": "Alice", "Age": 30, ... }},
-          {{ "Name": "Bob", "Age": 24, ... }},
-          ...
-        ]`
-        Your generated JavaScript code MUST:
-        1. Access the data exclusively from `window.dynadashData`.
-        2. Perform any necessary data transformations (e.g., string to number, date parsing if strings) on `window.dynadashData` before using it in charts.
-        3. Do NOT embed any static example data directly into the script for the main visualizations. Placeholder data for UI layout during development is fine, but it should be replaced by `window.dynadashData`.
-        4. Initialize all charts and interactive elements using the data from `window.dynadashData`.
-
-        # Requirements for the Dashboard Template:
-        1.  **Self-Contained HTML:** Produce a single HTML file with all CSS (in `<style>` tags) and JavaScript (in `<script>` tags) embedded.
-        2.  **Multiple Visualizations:** Include at least 3-5 diverse and complementary charts (e.g., bar, line, scatter, pie, heatmap) suitable for the provided column types and dataset description.
-        3.  **Interactivity:** Implement interactive elements (e.g., filters based on categorical columns, date range selectors if applicable, tooltips on charts). These interactive elements should dynamically update the visualizations based on `window.dynadashData`.
-        4.  **Layout & Styling:**
-            *   Professionally designed, responsive, and visually appealing.
-            *   Clear sections, headers, and potentially a summary/KPI section.
-            *   Use a modern, clean aesthetic.
-        5.  **Chart Libraries:** Use Chart.js (preferred for simplicity and wide compatibility) or D3.js for visualizations. Ensure the necessary library is linked via CDN if not fully embedded.
-        6.  **Chart Best Practices:** Ensure charts have titles, axis labels, and legends where appropriate.
-        7.  **Robust Initialization:** All JavaScript code for chart creation (e.g., `new Chart(ctx, config)`) must be complete and self-initializing on DOM load, using `window.dynadashData`.
-        8.  **Error Handling (Basic):** The JavaScript should be robust enough not to break completely if `window.dynadashData` is empty or has unexpected minor variations (though assume the schema provided is generally correct).
-        9.  **No External File Dependencies:** All assets like CSS or JS code snippets must be embedded. CDN links for major libraries (Chart.js, D3.js) are acceptable.
-
-        # Response Format:
-        Return ONLY the complete HTML code for the dashboard template, starting with `<!DOCTYPE html>`. Do not include any explanations, comments, or markdown formatting outside the HTML itself.
-        The HTML should be ready to have the `window.dynadashData` variable populated and then viewed in a browser.
         """
         return prompt.strip()
+
+    def _dashboard_system(self):
+        """
+        System prompt blocks for dashboard generation.
+
+        Everything that is the same for every dashboard comes first and ends
+        with a ``cache_control`` breakpoint, so the API can serve that prefix
+        from its prompt cache; only the dataset-specific user message is new
+        on each request.
+        """
+        instructions = {"type": "text", "text": DASHBOARD_INSTRUCTIONS}
+        if self.prompt_caching:
+            instructions["cache_control"] = {"type": "ephemeral"}
+        return [{"type": "text", "text": DASHBOARD_SYSTEM_PROMPT}, instructions]
     
-    def generate_dashboard(self, dataset_id, title, description="", use_thinking=False):
-        self._initialize_client()
-        
-        dataset_metadata = self._get_dataset_metadata(dataset_id)
+    async def agenerate_dashboard(self, dataset_id, title, description="", use_thinking=False, progress=None, use_cache=True, record_usage=None, user_id=None):
+        """
+        Generate a dashboard template; waiting on the API (and retry backoff) does not hold a thread.
+
+        When streaming is enabled (``ANTHROPIC_STREAM``), ``progress(tokens,
+        max_tokens)`` is called as the HTML arrives with the number of output
+        tokens so far (estimated from the text until the final usage is
+        known), and responses that are clearly not HTML are aborted early.
+
+        Identical requests are answered from the template cache (see
+        services/template_cache) unless ``use_cache`` is False; a fresh
+        template then replaces the cached one.
+
+        ``record_usage(usage)`` receives the token usage of the API call (see
+        ``usage_to_dict``), including prompt cache reads and writes.
+        ``user_id`` is the requesting user, for fair queueing of API calls.
+        """
+        # Metadata is normally the stored profile, but a backfill reads the whole file
+        dataset_metadata = await asyncio.to_thread(self._get_dataset_metadata, dataset_id)
         prompt = self._create_dashboard_prompt(dataset_metadata, title, description)
+
+        params = {
+            "model": self.model_name,
+            "max_tokens": self.max_tokens_dashboard,
+            "temperature": self.temperature_dashboard,
+            "system": self._dashboard_system(),
+            "messages": [{"role": "user", "content": prompt}]
+        }
         
+        if use_thinking:
+             current_app.logger.info("Note: 'use_thinking' parameter usage is illustrative.")
+
+        cache_key = template_cache_key(params) if template_cache_enabled() else None
+        if cache_key and use_cache:
+            cached_template = await asyncio.to_thread(get_cached_template, cache_key)
+            if cached_template is not None:
+                current_app.logger.info(f"Using cached dashboard template {cache_key[:12]} for dataset_id: {dataset_id}")
+                return cached_template
+
         current_app.logger.info(f"Requesting dashboard generation from Claude for dataset_id: {dataset_id}, title: '{title}'")
 
-        for attempt in range(self.max_retries):
-            try:
-                params = {
-                    "model": self.model_name,
-                    "max_tokens": self.max_tokens_dashboard,
-                    "temperature": self.temperature_dashboard,
-                    "system": "You are a data visualization expert that creates beautiful, interactive dashboard HTML templates using HTML, CSS, and JavaScript. The data will be injected via a `window.dynadashData` variable. You only respond with complete HTML code, with no explanations or Markdown outside the HTML itself.",
-                    "messages": [{"role": "user", "content": prompt}]
-                }
-                
-                if use_thinking:
-                     current_app.logger.info("Note: 'use_thinking' parameter usage is illustrative.")
-
-                response = self.client.messages.create(**params)
-                
-                dashboard_html_template = None
-                if response.content and isinstance(response.content, list):
-                    for block in response.content:
-                        if block.type == 'text':
-                            dashboard_html_template = block.text
-                            break
-                
-                if not dashboard_html_template:
-                    current_app.logger.error("No text content found in Claude's response.")
-                    raise ValueError("No text content found in the response from Claude.")
-                
-                if dashboard_html_template.strip().startswith("```html"):
-                    dashboard_html_template = dashboard_html_template.split("```html", 1)[-1]
-                    if dashboard_html_template.strip().endswith("```"):
-                        dashboard_html_template = dashboard_html_template.rsplit("```", 1)[0]
-                elif dashboard_html_template.strip().startswith("```"):
-                     dashboard_html_template = dashboard_html_template.strip()[3:-3] if dashboard_html_template.strip().endswith("```") else dashboard_html_template.strip()[3:]
-
-                dashboard_html_template = dashboard_html_template.strip()
-                
-                sanitized_template = self._sanitize_dashboard_html(dashboard_html_template)
-                
-                current_app.logger.debug(f"Generated dashboard HTML template (first 500 chars): {sanitized_template[:500]}...")
-                current_app.logger.info(f"Successfully generated dashboard template from Claude for dataset_id: {dataset_id}.")
-                return sanitized_template
-                    
-            except anthropic.APIConnectionError as e:
-                current_app.logger.error(f"Claude API connection error (attempt {attempt + 1}/{self.max_retries}): {e}")
-                if attempt == self.max_retries - 1: raise
-                time.sleep(self.retry_delay * (attempt + 1))
-            except anthropic.RateLimitError as e:
-                current_app.logger.error(f"Claude API rate limit error (attempt {attempt + 1}/{self.max_retries}): {e}")
-                if attempt == self.max_retries - 1: raise
-                time.sleep(self.retry_delay * (attempt + 1) * 2) 
-            except anthropic.APIStatusError as e: # Specific check for NotFoundError which indicates model name issue
-                if isinstance(e, anthropic.NotFoundError):
-                    current_app.logger.error(f"Claude API NotFoundError (attempt {attempt + 1}/{self.max_retries}): Model '{self.model_name}' not found or access denied. {e.response}")
-                else:
-                    current_app.logger.error(f"Claude API status error {e.status_code} (attempt {attempt + 1}/{self.max_retries}): {e.response}")
-                if attempt == self.max_retries - 1: raise
-                time.sleep(self.retry_delay * (attempt + 1))
-            except Exception as e:
-                current_app.logger.error(f"Claude API request failed (attempt {attempt + 1}/{self.max_retries}): {str(e)}", exc_info=True)
-                if attempt == self.max_retries - 1: raise
-                time.sleep(self.retry_delay)
+        on_text = None
+        if self.stream:
+            validated = False
+
+            def on_text(text):
+                nonlocal validated
+                validated = validated or check_dashboard_prefix(text)
+                if progress:
+                    progress(len(text) // CHARS_PER_TOKEN, self.max_tokens_dashboard)
+
+        response = await self._create_message(params, 'dashboard generation', on_text=on_text, user_id=user_id)
+        if on_text and progress and response.usage:
+            progress(response.usage.output_tokens, self.max_tokens_dashboard)
+        if response.stop_reason == 'max_tokens':
+            current_app.logger.warning(f"Dashboard for dataset_id {dataset_id} was cut off at {self.max_tokens_dashboard} tokens.")
+        usage = usage_to_dict(response.usage)
+        current_app.logger.info(
+            f"Dashboard generation usage for dataset_id {dataset_id}: {usage['input_tokens']} input, "
+            f"{usage['cache_read_input_tokens']} cache read, {usage['cache_creation_input_tokens']} cache write, "
+            f"{usage['output_tokens']} output tokens"
+        )
+        if record_usage:
+            record_usage(usage)
         
-        current_app.logger.error(f"Failed to generate dashboard from Claude after {self.max_retries} attempts for dataset_id: {dataset_id}.")
-        raise Exception(f"Failed to generate dashboard from Claude after {self.max_retries} attempts.")
+        dashboard_html_template = _response_text(response)
+        if not dashboard_html_template:
+            current_app.logger.error("No text content found in Claude's response.")
+            raise ValueError("No text content found in the response from Claude.")
+        
+        sanitized_template = self._sanitize_dashboard_html(_strip_code_fence(dashboard_html_template, 'html'))
+        
+        if cache_key:
+            await asyncio.to_thread(store_template, cache_key, self.model_name, sanitized_template)
+        
+        current_app.logger.debug(f"Generated dashboard HTML template (first 500 chars): {sanitized_template[:500]}...")
+        current_app.logger.info(f"Successfully generated dashboard template from Claude for dataset_id: {dataset_id}.")
+        return sanitized_template
+
+    def generate_dashboard(self, dataset_id, title, description="", use_thinking=False, user_id=None):
+        """Blocking version of ``agenerate_dashboard``."""
+        return self._run(self.agenerate_dashboard(dataset_id, title, description, use_thinking, user_id=user_id))
 
     def _sanitize_dashboard_html(self, html_content):
         if not html_content:
@@ -313,45 +558,8 @@ class ClaudeClient:
                     insertion_point += len(script_tag) 
         
         if "console.error('Dashboard error:'" not in html_content:
-            error_handling_script = """
-            <script>
-            window.addEventListener('error', function(event) {
-                console.error('Dashboard error:', event.message, 'at', event.filename, ':', event.lineno);
-                var errorDisplay = document.getElementById('dynadashInternalErrorDisplay');
-                if (!errorDisplay && document.body) {
-                    errorDisplay = document.createElement('div');
-                    errorDisplay.id = 'dynadashInternalErrorDisplay';
-                    errorDisplay.style.cssText = 'position:fixed;top:5px;left:5px;right:5px;padding:10px;background:rgba(220,50,50,0.9);color:white;border-radius:4px;z-index:20000;font-family:sans-serif;font-size:14px;';
-                    document.body.insertBefore(errorDisplay, document.body.firstChild);
-                }
-                if(errorDisplay) errorDisplay.textContent = 'Dashboard Error: ' + event.message + ' (in ' + (event.filename || 'inline script') + ':' + event.lineno + ')';
-            });
-            document.addEventListener('DOMContentLoaded', function() {
-                if (typeof window.dynadashData === 'undefined' || window.dynadashData === null || (Array.isArray(window.dynadashData) && window.dynadashData.length === 0)) {
-                    console.warn('window.dynadashData is not defined or is empty. Dashboard might not render correctly.');
-                    var dataWarningDiv = document.getElementById('dynadashDataWarningDisplay');
-                    if(!dataWarningDiv && document.body) {
-                        dataWarningDiv = document.createElement('div');
-                        dataWarningDiv.id = 'dynadashDataWarningDisplay';
-                        dataWarningDiv.style.cssText = 'padding:10px;background:rgba(255,220,50,0.8);color:black;text-align:center;font-family:sans-serif;font-size:14px;';
-                        dataWarningDiv.textContent = 'Notice: Data for this dashboard (window.dynadashData) was not loaded or is empty. Visualizations may not appear as expected.';
-                        document.body.insertBefore(dataWarningDiv, document.body.firstChild);
-                    }
-                }
-                setTimeout(function() {
-                    if (typeof Chart !== 'undefined' && typeof window.dynadashData !== 'undefined') {
-                        var canvases = document.querySelectorAll('canvas');
-                        canvases.forEach(function(canvas) {
-                            try {
-                                var chartInstance = Chart.getChart(canvas); 
-                                if (chartInstance) { chartInstance.update('none'); } 
-                            } catch(e) { console.warn('Could not update chart on canvas ' + (canvas.id || '(no id)') + ':', e); }
-                        });
-                    }
-                }, 1200);
-            });
-            </script>
-            """
+            # The shared text, so stored templates reference it as an asset (see services/spec_storage)
+            error_handling_script = ERROR_HANDLING_SCRIPT
             body_end_idx = html_content.lower().rfind('</body>')
             if body_end_idx != -1:
                  html_content = html_content[:body_end_idx] + error_handling_script + html_content[body_end_idx:]
@@ -360,9 +568,9 @@ class ClaudeClient:
         
         return html_content
 
-    def analyze_dataset(self, dataset_id, use_thinking=True):
-        self._initialize_client()
-        dataset_metadata_and_content = self._read_dataset_file(dataset_id)
+    async def aanalyze_dataset(self, dataset_id, use_thinking=True, user_id=None):
+        """Ask Claude for insights about a dataset, returned as a dict."""
+        dataset_metadata_and_content = await asyncio.to_thread(self._read_dataset_file, dataset_id)
         
         prompt = f"""
         You are a data analysis expert. Analyze the following dataset and provide insights.
@@ -374,9 +582,9 @@ class ClaudeClient:
         - Columns: {dataset_metadata_and_content['n_columns']}
         - Column Details: {json.dumps(dataset_metadata_and_content['column_info'])}
         
-        Dataset Content (first 50 rows or 2000 characters):
+        Dataset Content (first {ANALYSIS_HEAD_ROWS} rows or {ANALYSIS_HEAD_CHARS} characters):
         ```{dataset_metadata_and_content['file_type']}
-        { (dataset_metadata_and_content['content'][:2000] + '...' if len(dataset_metadata_and_content['content']) > 2000 else dataset_metadata_and_content['content']) }
+        {dataset_metadata_and_content['content']}
         ```
         
         Please provide:
@@ -398,54 +606,37 @@ class ClaudeClient:
         
         current_app.logger.info(f"Requesting dataset analysis from Claude for dataset_id: {dataset_id}")
 
+        params = {
+            "model": self.model_name,
+            "max_tokens": self.max_tokens_analysis,
+            "temperature": self.temperature_analysis,
+            "system": "You are a data analysis expert. Respond strictly with JSON.",
+            "messages": [{"role": "user", "content": prompt}]
+        }
+
+        # API errors are retried by _create_message; this loop retries replies that are not valid JSON
         for attempt in range(self.max_retries):
+            response = await self._create_message(params, 'dataset analysis', user_id=user_id)
+            
+            analysis_text = _response_text(response)
+            if not analysis_text:
+                current_app.logger.error("No text content found in Claude's analysis response.")
+                raise ValueError("No text content found in the analysis response from Claude.")
+
+            analysis_text = _strip_code_fence(analysis_text, 'json')
             try:
-                params = {
-                    "model": self.model_name,
-                    "max_tokens": self.max_tokens_analysis,
-                    "temperature": self.temperature_analysis,
-                    "system": "You are a data analysis expert. Respond strictly with JSON.",
-                    "messages": [{"role": "user", "content": prompt}]
-                }
-
-                response = self.client.messages.create(**params)
-                
-                analysis_text = None
-                if response.content and isinstance(response.content, list):
-                     for block in response.content:
-                        if block.type == 'text': analysis_text = block.text; break
-                
-                if not analysis_text:
-                    current_app.logger.error("No text content found in Claude's analysis response.")
-                    raise ValueError("No text content found in the analysis response from Claude.")
-
-                if analysis_text.strip().startswith("```json"):
-                    analysis_text = analysis_text.split("```json",1)[-1]
-                    if analysis_text.strip().endswith("```"): analysis_text = analysis_text.rsplit("```",1)[0]
-                elif analysis_text.strip().startswith("```"):
-                    analysis_text = analysis_text.strip()[3:-3] if analysis_text.strip().endswith("```") else analysis_text.strip()[3:]
-                
-                analysis_text = analysis_text.strip()
                 analysis = json.loads(analysis_text)
-                current_app.logger.info(f"Successfully received dataset analysis from Claude for dataset_id: {dataset_id}.")
-                return analysis
-            
             except json.JSONDecodeError as e:
                 current_app.logger.error(f"Failed to parse JSON from Claude's analysis response (attempt {attempt + 1}/{self.max_retries}): {e}. Response: {analysis_text[:500]}", exc_info=True)
                 if attempt == self.max_retries - 1: raise ValueError(f"Invalid JSON response from Claude after retries: {e}")
-                time.sleep(self.retry_delay)
-            except anthropic.APIError as e: 
-                current_app.logger.error(f"Claude API Error for analysis (attempt {attempt + 1}/{self.max_retries}): {type(e).__name__} - {e}")
-                if attempt == self.max_retries - 1: raise
-                delay_multiplier = 2 if isinstance(e, anthropic.RateLimitError) else 1
-                time.sleep(self.retry_delay * (attempt + 1) * delay_multiplier)
-            except Exception as e:
-                current_app.logger.error(f"Claude analysis request failed (attempt {attempt + 1}/{self.max_retries}): {str(e)}", exc_info=True)
-                if attempt == self.max_retries - 1: raise
-                time.sleep(self.retry_delay)
-        
-        current_app.logger.error(f"Failed to get dataset analysis from Claude after {self.max_retries} attempts for dataset_id: {dataset_id}.")
-        raise Exception(f"Failed to get dataset analysis from Claude after {self.max_retries} attempts.")
+                await asyncio.sleep(self._retry_delay(attempt))
+                continue
+            current_app.logger.info(f"Successfully received dataset analysis from Claude for dataset_id: {dataset_id}.")
+            return analysis
+
+    def analyze_dataset(self, dataset_id, use_thinking=True, user_id=None):
+        """Blocking version of ``aanalyze_dataset``."""
+        return self._run(self.aanalyze_dataset(dataset_id, use_thinking, user_id=user_id))
 
     def _read_dataset_file(self, dataset_id):
         dataset = Dataset.query.get_or_404(dataset_id)
@@ -453,13 +644,12 @@ class ClaudeClient:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"Dataset file not found: {file_path}")
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            file_content = f.read()
-        
-        metadata = self._get_dataset_metadata(dataset_id)
+        # Only the head goes into the prompt; the statistics come from the stored profile
+        head, truncated = read_file_head(file_path)
+        metadata = self._metadata_for(dataset)
         
         return {
-            "content": file_content,
+            "content": head + '...' if truncated else head,
             "file_type": dataset.file_type,
             "original_filename": dataset.original_filename,
             "n_rows": dataset.n_rows,
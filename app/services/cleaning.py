@@ -0,0 +1,484 @@
+import os
+import re
+import functools
+import numpy as np
+import pandas as pd
+
+try:
+    from pandas.tseries.api import guess_datetime_format
+except ImportError:  # pandas < 2.2
+    from pandas._libs.tslibs.parsing import guess_datetime_format
+
+from .column_store import ColumnStoreWriter
+
+# Cleaning rules shared by the in-memory and the chunked (streaming) ingestion
+# paths: numeric gaps are filled with the median, text gaps with the mode,
+# numeric outliers are tagged in ``<col>_outlier`` and date-like text columns
+# get a normalised ``<col>_date`` companion.
+
+DATE_FORMATS = [
+    '%Y-%m-%d', '%m/%d/%Y', '%d/%m/%Y', '%Y/%m/%d',
+    '%b %d, %Y', '%d %b %Y', '%B %d, %Y', '%d %B %Y',
+    '%m-%d-%Y', '%d-%m-%Y', '%Y.%m.%d', '%d.%m.%Y'
+]
+
+OUTLIER_IQR_FACTOR = 1.5
+DATE_KEEP_RATIO = 0.5
+DATE_SAMPLE_SIZE = 200
+DATE_MAX_LENGTH = 40
+BOOL_STRINGS = {'True': True, 'TRUE': True, 'true': True, 'False': False, 'FALSE': False, 'false': False}
+
+# Cheap pre-filter for date-like text: 2024-01-31, 31/01/2024, 2024.01.31,
+# 31 Jan 2024 or January 31, 2024 (optionally followed by a time)
+DATE_CANDIDATE = re.compile(
+    r'^\s*(?:\d{1,4}[-/.]\d{1,2}[-/.]\d{1,4}'
+    r'|\d{1,2}\s+[A-Za-z]{3,9}\.?,?\s+\d{2,4}'
+    r'|[A-Za-z]{3,9}\.?\s+\d{1,2},?\s+\d{2,4})'
+)
+
+_DIRECTIVE_SHAPES = {'%Y': '9999', '%m': '9{1,2}', '%d': '9{1,2}', '%b': 'a{3}', '%B': 'a{3,9}'}
+
+
+def _shape_pattern(date_format):
+    pattern, i = '', 0
+    while i < len(date_format):
+        directive = date_format[i:i + 2]
+        if directive in _DIRECTIVE_SHAPES:
+            pattern += _DIRECTIVE_SHAPES[directive]
+            i += 2
+        else:
+            pattern += re.escape(date_format[i])
+            i += 1
+    return re.compile(pattern)
+
+
+_FORMAT_SHAPES = {date_format: _shape_pattern(date_format) for date_format in DATE_FORMATS}
+
+
+@functools.lru_cache(maxsize=1024)
+def formats_for_shape(shape):
+    """Known ``DATE_FORMATS`` whose layout fits a value shape (digits -> 9, letters -> a)."""
+    return tuple(fmt for fmt in DATE_FORMATS if _FORMAT_SHAPES[fmt].fullmatch(shape))
+
+
+def _best_format(values, formats, threshold):
+    """Of ``formats``, the one parsing the most ``values`` if that beats ``threshold``."""
+    best, best_hits = None, threshold
+    for date_format in formats:
+        hits = int(parse_dates(values, date_format).notna().sum())
+        if hits > best_hits:
+            best, best_hits = date_format, hits
+    return best
+
+
+def infer_date_format(series, sample_size=DATE_SAMPLE_SIZE, seed=0):
+    """
+    Infer the date format of a text column from a bounded random sample.
+
+    Non-date columns are rejected cheaply with a regex and length check. For
+    the rest, the format is chosen by majority over the sample: known
+    ``DATE_FORMATS`` matching the values' shapes first, then formats pandas
+    guesses per value, then per-value ``'mixed'`` parsing.
+
+    Returns a format for ``parse_dates`` when more than ``DATE_KEEP_RATIO`` of
+    the sample parses with it, otherwise None.
+    """
+    non_null = series.dropna()
+    if non_null.empty:
+        return None
+    sample = non_null.sample(sample_size, random_state=seed) if len(non_null) > sample_size else non_null
+    threshold = DATE_KEEP_RATIO * len(sample)
+
+    text = sample[sample.map(lambda value: isinstance(value, str))]
+    if len(text) <= threshold:
+        return None
+    candidates = text[(text.str.len() <= DATE_MAX_LENGTH) & text.str.match(DATE_CANDIDATE)]
+    if len(candidates) <= threshold:
+        return None
+
+    shapes = candidates.str.strip().str.replace(r'\d', '9', regex=True).str.replace(r'[A-Za-z]', 'a', regex=True)
+    votes = {}
+    for shape, count in shapes.value_counts().items():
+        for date_format in formats_for_shape(shape):
+            votes[date_format] = votes.get(date_format, 0) + int(count)
+    known = [fmt for fmt in DATE_FORMATS if votes.get(fmt, 0) > threshold]
+    date_format = _best_format(candidates, known, threshold)
+    if date_format:
+        return date_format
+
+    guessed = candidates.map(guess_datetime_format).value_counts()
+    date_format = _best_format(candidates, [fmt for fmt, count in guessed.items() if count > threshold], threshold)
+    if date_format:
+        return date_format
+
+    return _best_format(candidates, ['mixed'], threshold)
+
+
+def parse_dates(series, date_format):
+    """Parse a column with a format from ``infer_date_format``; failures become NaT."""
+    return pd.to_datetime(series, format=date_format, errors='coerce')
+
+
+def iqr_bounds(q1, q3):
+    """Return the (lower, upper) outlier bounds for the given quartiles."""
+    iqr = q3 - q1
+    return q1 - OUTLIER_IQR_FACTOR * iqr, q3 + OUTLIER_IQR_FACTOR * iqr
+
+
+def outlier_block(df, lower, upper):
+    """
+    Boolean ``<col>_outlier`` flags for every column in ``lower``/``upper``.
+
+    ``lower`` and ``upper`` are Series of bounds indexed by column name; the
+    comparison runs on the whole block at once rather than column by column.
+    """
+    if len(lower) == 0:
+        return pd.DataFrame(index=df.index)
+    values = df[list(lower.index)]
+    flags = values.lt(lower, axis=1) | values.gt(upper, axis=1)
+    if not (flags.dtypes == bool).all():
+        # Nullable (masked) columns compare to "boolean" with <NA>
+        flags = flags.fillna(False).astype(bool)
+    return flags.add_suffix('_outlier')
+
+
+def date_block(df, date_columns):
+    """``<col>_date`` (YYYY-MM-DD strings) for each parsed column in ``date_columns``."""
+    return pd.DataFrame(
+        {col + '_date': parsed.dt.strftime('%Y-%m-%d') for col, parsed in date_columns.items()},
+        index=df.index
+    )
+
+
+def reservoir_add(reservoir, seen, values, sample_size, rng):
+    """
+    Reservoir-sample ``values`` (Algorithm R, vectorised per chunk).
+
+    ``seen`` is how many values were offered so far; returns the updated
+    ``(reservoir, seen)``. The sample is exact while ``seen <= sample_size``.
+    """
+    free = sample_size - len(reservoir)
+    if free > 0:
+        reservoir = np.concatenate([reservoir, values[:free]])
+        seen += min(free, len(values))
+        values = values[free:]
+    if len(values):
+        positions = seen + np.arange(1, len(values) + 1)
+        slots = (rng.random(len(values)) * positions).astype(np.int64)
+        keep = slots < sample_size
+        reservoir[slots[keep]] = values[keep]
+        seen += len(values)
+    return reservoir, seen
+
+
+def append_columns(df, *blocks):
+    """
+    Return ``df`` with the columns of ``blocks`` appended in a single concat.
+
+    ``df`` itself is not modified. A derived column that already exists (e.g.
+    when a cleaned file is cleaned again) is overwritten in place, as plain
+    column assignment would do.
+    """
+    blocks = [block for block in blocks if len(block.columns)]
+    if not blocks:
+        return df.copy()
+    new = pd.concat(blocks, axis=1) if len(blocks) > 1 else blocks[0]
+    overlap = [col for col in new.columns if col in df.columns]
+    result = pd.concat([df, new.drop(columns=overlap)], axis=1)
+    for col in overlap:
+        result[col] = new[col]
+    return result
+
+
+def clean_frame(df):
+    """
+    Clean and preprocess an in-memory DataFrame.
+
+    Medians, quartiles and modes are each computed for all columns in one
+    call, and the outlier and date columns are appended with one concat, so
+    wide frames are not rebuilt once per column.
+    """
+    dtypes = df.dtypes
+    numeric_cols = [col for col, dtype in dtypes.items() if pd.api.types.is_numeric_dtype(dtype)]
+    text_cols = [
+        col for col, dtype in dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(dtype)
+    ]
+
+    # Handle missing values: numeric gaps get the median, text gaps the mode.
+    # Each block is filled with one masked write instead of a fillna per column.
+    has_nulls = df.isna().any()
+    filled = []
+    missing_numeric = [col for col in numeric_cols if has_nulls[col]]
+    if missing_numeric:
+        block = df[missing_numeric]
+        filled.append(block.where(block.notna(), block.median(), axis=1))
+    missing_text = [col for col in text_cols if has_nulls[col]]
+    if missing_text:
+        block = df[missing_text]
+        modes = block.mode()
+        first_modes = modes.iloc[0] if len(modes) else pd.Series(index=missing_text, dtype=object)
+        fill_values = first_modes.astype(object).where(first_modes.notna(), 'Unknown')
+        filled.append(block.where(block.notna(), fill_values, axis=1))
+    if filled:
+        filled = pd.concat(filled, axis=1)
+        df_cleaned = pd.concat([df.drop(columns=filled.columns), filled], axis=1)[df.columns]
+    else:
+        df_cleaned = df
+
+    # Tag outliers in numeric columns (don't remove them)
+    numeric = df_cleaned.select_dtypes(include=[np.number])
+    quartiles = numeric.quantile([0.25, 0.75])
+    lower, upper = iqr_bounds(quartiles.iloc[0], quartiles.iloc[1])
+    outliers = outlier_block(df_cleaned, lower, upper)
+
+    # Convert date columns; only columns confirmed on a sample get a full
+    # parse, and they are kept only if more than half the values parse
+    date_columns = {}
+    for col in df.columns:
+        if not pd.api.types.is_object_dtype(df_cleaned[col]):
+            continue
+        try:
+            date_format = infer_date_format(df_cleaned[col])
+            if date_format is None:
+                continue
+            parsed = parse_dates(df_cleaned[col], date_format)
+            if parsed.notna().mean() > DATE_KEEP_RATIO:
+                date_columns[col] = parsed
+        except Exception:
+            # If conversion fails, ignore
+            pass
+
+    return append_columns(df_cleaned, outliers, date_block(df_cleaned, date_columns))
+
+
+class _ColumnStats:
+    """Pass-one accumulator for a single CSV column."""
+
+    def __init__(self):
+        self.nulls = 0
+        self.numeric = True
+        self.all_int = True
+        self.bool_like = True
+        self.reservoir = np.empty(0, dtype=np.float64)
+        self.numeric_seen = 0
+        self.needs_rescan = False
+        self.counts = {}
+        self.date_format = False  # False: undecided, None: not a date column
+        self.date_hits = 0
+
+
+class ChunkedCsvCleaner:
+    """
+    Two-pass, bounded-memory cleaner for large CSV files.
+
+    Pass one streams the file in ``chunk_rows`` blocks (every column read as
+    text) and accumulates what ``clean_frame`` would compute over the whole
+    frame: column kinds, medians and quartiles (from a fixed-size reservoir
+    sample, exact while a column has at most ``sample_size`` values), modes
+    (merged value counts, capped at ``max_distinct`` values per column) and
+    date formats with their parse rates. Pass two re-reads the file, applies
+    those fixed statistics chunk by chunk and streams the cleaned rows to a
+    temporary CSV (and, optionally, the column store) before swapping it in.
+    """
+
+    def __init__(self, chunk_rows=50000, sample_size=100000, max_distinct=200000, seed=0):
+        self.chunk_rows = chunk_rows
+        self.sample_size = sample_size
+        self.max_distinct = max_distinct
+        self.rng = np.random.default_rng(seed)
+        self.columns = None
+        self.stats = {}
+        self.n_rows = 0
+
+    def _read_chunks(self, file_path, usecols=None):
+        return pd.read_csv(file_path, dtype=str, chunksize=self.chunk_rows, usecols=usecols)
+
+    def _add_to_reservoir(self, st, values):
+        st.reservoir, st.numeric_seen = reservoir_add(st.reservoir, st.numeric_seen, values, self.sample_size, self.rng)
+
+    def _add_text(self, st, non_null):
+        st.bool_like = st.bool_like and bool(non_null.isin(BOOL_STRINGS.keys()).all())
+        for value, count in non_null.value_counts(sort=False).items():
+            st.counts[value] = st.counts.get(value, 0) + int(count)
+        if len(st.counts) > self.max_distinct:
+            # Keep the most frequent half; the mode is then approximate
+            top = sorted(st.counts.items(), key=lambda kv: kv[1], reverse=True)[:self.max_distinct // 2]
+            st.counts = dict(top)
+        if st.date_format is False and not non_null.empty:
+            # Decided from a sample of the first chunk with values
+            st.date_format = infer_date_format(non_null)
+        if st.date_format:
+            st.date_hits += int(parse_dates(non_null, st.date_format).notna().sum())
+
+    def _accumulate(self, chunk):
+        for col in chunk.columns:
+            st = self.stats[col]
+            series = chunk[col]
+            non_null = series.dropna()
+            st.nulls += len(series) - len(non_null)
+
+            if st.numeric:
+                converted = pd.to_numeric(non_null, errors='coerce')
+                if converted.notna().all():
+                    st.all_int = st.all_int and pd.api.types.is_integer_dtype(converted)
+                    self._add_to_reservoir(st, converted.to_numpy(dtype=np.float64))
+                    continue
+                st.numeric = False
+                st.needs_rescan = st.numeric_seen > 0
+                st.reservoir = np.empty(0, dtype=np.float64)
+            self._add_text(st, non_null)
+
+    def _rescan(self, file_path, columns):
+        """Recount text statistics for columns that only turned non-numeric late."""
+        for col in columns:
+            st = self.stats[col]
+            st.counts, st.bool_like, st.date_hits = {}, True, 0
+            st.date_format = False
+        for chunk in self._read_chunks(file_path, usecols=columns):
+            for col in columns:
+                self._add_text(self.stats[col], chunk[col].dropna())
+
+    def collect(self, file_path):
+        """Pass one: gather the statistics for every column."""
+        for chunk in self._read_chunks(file_path):
+            if self.columns is None:
+                self.columns = list(chunk.columns)
+                self.stats = {col: _ColumnStats() for col in self.columns}
+            self.n_rows += len(chunk)
+            self._accumulate(chunk)
+
+        if self.columns is None:
+            self.columns = list(pd.read_csv(file_path, nrows=0).columns)
+            self.stats = {col: _ColumnStats() for col in self.columns}
+
+        late_text = [col for col in self.columns if self.stats[col].needs_rescan]
+        if late_text:
+            self._rescan(file_path, late_text)
+        return self.plan()
+
+    def plan(self):
+        """Turn the accumulated statistics into fixed cleaning parameters."""
+        kinds, fill_values, bounds, date_formats = {}, {}, {}, {}
+        for col in self.columns:
+            st = self.stats[col]
+            if st.numeric:
+                kinds[col] = 'int' if st.all_int and st.nulls == 0 and st.numeric_seen else 'float'
+                median = float(np.median(st.reservoir)) if st.numeric_seen else np.nan
+                fill_values[col] = median
+                if st.numeric_seen:
+                    # Quartiles are taken after the median fill, as clean_frame does
+                    padding = int(round(len(st.reservoir) * st.nulls / st.numeric_seen))
+                    values = np.concatenate([st.reservoir, np.full(padding, median)])
+                    q1, q3 = np.quantile(values, [0.25, 0.75])
+                    bounds[col] = iqr_bounds(q1, q3)
+                else:
+                    bounds[col] = (np.nan, np.nan)
+                continue
+
+            if st.bool_like and st.nulls == 0:
+                kinds[col] = 'bool'
+                continue
+
+            kinds[col] = 'text'
+            if st.counts:
+                top = max(st.counts.values())
+                mode = min(value for value, count in st.counts.items() if count == top)
+            else:
+                mode = 'Unknown'
+            fill_values[col] = mode
+
+            if st.date_format and self.n_rows:
+                hits = st.date_hits
+                if st.nulls and parse_dates(pd.Series([mode]), st.date_format).notna().all():
+                    hits += st.nulls
+                if hits / self.n_rows > DATE_KEEP_RATIO:
+                    date_formats[col] = st.date_format
+
+        return {'kinds': kinds, 'fill_values': fill_values, 'outlier_bounds': bounds, 'date_formats': date_formats}
+
+    def _convert_kinds(self, chunk, kinds):
+        for col, kind in kinds.items():
+            if kind == 'int':
+                chunk[col] = pd.to_numeric(chunk[col]).astype(np.int64)
+            elif kind == 'float':
+                chunk[col] = pd.to_numeric(chunk[col]).astype(np.float64)
+            elif kind == 'bool':
+                chunk[col] = chunk[col].map(BOOL_STRINGS).astype(bool)
+        return chunk
+
+    def apply(self, file_path, plan, column_store=False, progress=None, profile=None):
+        """
+        Pass two: clean the file chunk by chunk and replace it in place.
+
+        Returns ``(columns, column_store_written)``. The column store is
+        best-effort: if a chunk cannot be appended it is dropped and readers
+        fall back to the text file. ``profile`` (a ``ProfileBuilder``) is fed
+        every cleaned chunk.
+        """
+        tmp_path = f"{file_path}.cleaning"
+        writer = ColumnStoreWriter(file_path) if column_store else None
+        columns = None
+
+        def append_to_store(frame):
+            nonlocal writer
+            if writer is None:
+                return
+            try:
+                writer.append(frame)
+            except ValueError:
+                writer.abort()
+                writer = None
+
+        try:
+            bounds = plan['outlier_bounds']
+            lower = pd.Series({col: bound[0] for col, bound in bounds.items()}, dtype=np.float64)
+            upper = pd.Series({col: bound[1] for col, bound in bounds.items()}, dtype=np.float64)
+
+            rows_done = 0
+            header = True
+            for chunk in self._read_chunks(file_path):
+                chunk = self._convert_kinds(chunk, plan['kinds'])
+                chunk = chunk.fillna(value=plan['fill_values'])
+                chunk = append_columns(
+                    chunk,
+                    outlier_block(chunk, lower, upper),
+                    date_block(chunk, {
+                        col: parse_dates(chunk[col], fmt) for col, fmt in plan['date_formats'].items()
+                    })
+                )
+                chunk.to_csv(tmp_path, mode='w' if header else 'a', header=header, index=False)
+                header = False
+                columns = list(chunk.columns)
+                append_to_store(chunk)
+                if profile is not None:
+                    profile.update(chunk)
+                rows_done += len(chunk)
+                if progress and self.n_rows:
+                    progress(rows_done / self.n_rows)
+
+            if columns is None:
+                # Header-only file: keep the header and add the derived columns
+                empty = self._convert_kinds(pd.DataFrame(columns=self.columns, dtype=str), plan['kinds'])
+                empty = append_columns(empty, outlier_block(empty, lower, upper))
+                empty.to_csv(tmp_path, index=False)
+                columns = list(empty.columns)
+                append_to_store(empty)
+                if profile is not None:
+                    profile.update(empty)
+
+            os.replace(tmp_path, file_path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            if writer is not None:
+                writer.abort()
+            raise
+
+        if writer is None:
+            return columns, False
+        try:
+            writer.close()
+        except Exception:
+            return columns, False
+        return columns, True
@@ -0,0 +1,345 @@
+import os
+import json
+import shutil
+import uuid
+import numpy as np
+import pandas as pd
+from flask import current_app
+
+# Columnar sidecar store for cleaned datasets.
+#
+# Next to every cleaned text file (``<uuid>.csv`` / ``<uuid>.json``) we keep a
+# ``<uuid>.csv.cols/`` directory holding one ``.npy`` array per column plus a
+# small ``schema.json`` header. Readers memory-map the arrays instead of
+# re-parsing the text file, so loading a dataset costs a few ``np.load`` calls.
+
+SIDECAR_SUFFIX = '.cols'
+SCHEMA_FILENAME = 'schema.json'
+SCHEMA_FORMAT = 'dynadash-columns'
+SCHEMA_VERSION = 1
+
+# Strings up to this many characters are stored as a fixed-width unicode array
+# (fast to load). Wider columns use a UTF-8 byte buffer plus an offsets array so
+# a single long value does not blow up the width of every row.
+MAX_FIXED_STRING_WIDTH = 256
+
+
+def sidecar_path(file_path):
+    """Return the sidecar directory path for a dataset text file."""
+    return file_path + SIDECAR_SUFFIX
+
+
+def _source_signature(file_path):
+    stat = os.stat(file_path)
+    return {'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+
+
+class ColumnStoreWriter:
+    """
+    Build a sidecar incrementally from DataFrame chunks with bounded memory.
+
+    Each column is appended to a raw ``.part`` file; ``close()`` turns the parts
+    into ``.npy`` arrays block by block. Every chunk must have the same columns
+    and dtypes as the first one, otherwise ``append`` raises ``ValueError``.
+    """
+
+    BLOCK_ROWS = 65536
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.target_dir = sidecar_path(file_path)
+        self.tmp_dir = f"{self.target_dir}.tmp-{uuid.uuid4().hex}"
+        os.makedirs(self.tmp_dir)
+        self.columns = None
+        self.n_rows = 0
+
+    def _part(self, stem, suffix):
+        return os.path.join(self.tmp_dir, f'{stem}.{suffix}.part')
+
+    def _column_kind(self, series):
+        if pd.api.types.is_bool_dtype(series) and not series.isna().any():
+            return 'bool', np.dtype(bool)
+        if pd.api.types.is_datetime64_any_dtype(series) and getattr(series.dt, 'tz', None) is None:
+            return 'datetime', np.dtype(np.int64)
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            if series.isna().any() or pd.api.types.is_extension_array_dtype(series):
+                return 'numeric', np.dtype(np.float64)
+            return 'numeric', series.to_numpy().dtype
+        if pd.api.types.infer_dtype(series, skipna=True) == 'boolean' and not series.isna().any():
+            return 'bool', np.dtype(bool)
+        return 'string', None
+
+    def append(self, df):
+        """Append a chunk of rows."""
+        if self.columns is None:
+            self.columns = []
+            for idx, col in enumerate(df.columns):
+                kind, dtype = self._column_kind(df[col])
+                self.columns.append({
+                    'name': str(col), 'source': col, 'dtype': str(df[col].dtype),
+                    'kind': kind, 'np_dtype': dtype, 'stem': f'c{idx:04d}',
+                    'width': 0, 'has_nulls': False,
+                })
+        elif [c['source'] for c in self.columns] != list(df.columns):
+            raise ValueError("Chunk columns do not match the first chunk.")
+
+        for col in self.columns:
+            series = df[col['source']]
+            kind = col['kind']
+            if kind == 'string':
+                mask = series.isna().to_numpy()
+                col['has_nulls'] = col['has_nulls'] or bool(mask.any())
+                texts = ['' if is_null else str(v) for v, is_null in zip(series.to_numpy(dtype=object), mask)]
+                encoded = [t.encode('utf-8') for t in texts]
+                col['width'] = max(col['width'], max((len(t) for t in texts), default=0))
+                with open(self._part(col['stem'], 'bytes'), 'ab') as f:
+                    f.write(b''.join(encoded))
+                with open(self._part(col['stem'], 'len'), 'ab') as f:
+                    f.write(np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded)).tobytes())
+                with open(self._part(col['stem'], 'mask'), 'ab') as f:
+                    f.write(mask.astype(bool).tobytes())
+                continue
+
+            if self._column_kind(series)[0] != kind:
+                raise ValueError(f"Column {col['name']!r} changed type between chunks.")
+            if kind == 'datetime':
+                values = series.to_numpy(dtype='datetime64[ns]').view(np.int64)
+            elif kind == 'bool':
+                values = series.to_numpy(dtype=bool)
+            else:
+                values = series.to_numpy(dtype=col['np_dtype'], na_value=np.nan) if col['np_dtype'].kind == 'f' else series.to_numpy()
+                if values.dtype != col['np_dtype']:
+                    raise ValueError(f"Column {col['name']!r} changed dtype between chunks.")
+            with open(self._part(col['stem'], 'data'), 'ab') as f:
+                f.write(np.ascontiguousarray(values).tobytes())
+
+        self.n_rows += len(df)
+
+    def _finalize_fixed(self, col, entry):
+        out_name = f"{col['stem']}.npy"
+        out = np.lib.format.open_memmap(os.path.join(self.tmp_dir, out_name), mode='w+', dtype=col['np_dtype'], shape=(self.n_rows,))
+        if self.n_rows:
+            part = np.memmap(self._part(col['stem'], 'data'), dtype=col['np_dtype'], mode='r', shape=(self.n_rows,))
+            for start in range(0, self.n_rows, self.BLOCK_ROWS):
+                out[start:start + self.BLOCK_ROWS] = part[start:start + self.BLOCK_ROWS]
+            del part
+        out.flush()
+        del out
+        entry['file'] = out_name
+
+    def _finalize_string(self, col, entry):
+        stem = col['stem']
+        lengths = np.fromfile(self._part(stem, 'len'), dtype=np.int64) if self.n_rows else np.zeros(0, dtype=np.int64)
+        offsets = np.zeros(self.n_rows + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        del lengths
+
+        if col['width'] <= MAX_FIXED_STRING_WIDTH:
+            # Re-encode block by block into a fixed-width unicode array
+            out = np.lib.format.open_memmap(os.path.join(self.tmp_dir, f'{stem}.npy'), mode='w+', dtype=f"<U{max(col['width'], 1)}", shape=(self.n_rows,))
+            with open(self._part(stem, 'bytes'), 'rb') as f:
+                for start in range(0, self.n_rows, self.BLOCK_ROWS):
+                    stop = min(start + self.BLOCK_ROWS, self.n_rows)
+                    raw = f.read(int(offsets[stop] - offsets[start]))
+                    bounds = (offsets[start:stop + 1] - offsets[start]).tolist()
+                    out[start:stop] = [raw[bounds[i]:bounds[i + 1]].decode('utf-8') for i in range(stop - start)]
+            out.flush()
+            del out
+            entry.update({'kind': 'string', 'file': f'{stem}.npy'})
+        else:
+            total = int(offsets[-1])
+            out = np.lib.format.open_memmap(os.path.join(self.tmp_dir, f'{stem}.npy'), mode='w+', dtype=np.uint8, shape=(total,))
+            with open(self._part(stem, 'bytes'), 'rb') as f:
+                pos = 0
+                while pos < total:
+                    block = f.read(min(16 * 1024 * 1024, total - pos))
+                    out[pos:pos + len(block)] = np.frombuffer(block, dtype=np.uint8)
+                    pos += len(block)
+            out.flush()
+            del out
+            np.save(os.path.join(self.tmp_dir, f'{stem}.offsets.npy'), offsets, allow_pickle=False)
+            entry.update({'kind': 'varstring', 'file': f'{stem}.npy', 'offsets': f'{stem}.offsets.npy'})
+
+        if col['has_nulls']:
+            mask = np.fromfile(self._part(stem, 'mask'), dtype=bool)
+            np.save(os.path.join(self.tmp_dir, f'{stem}.mask.npy'), mask, allow_pickle=False)
+            entry['mask'] = f'{stem}.mask.npy'
+
+    def close(self):
+        """Finalize the arrays and swap the sidecar into place."""
+        try:
+            entries = []
+            for col in self.columns or []:
+                entry = {'name': col['name'], 'dtype': col['dtype'], 'kind': col['kind'], 'mask': None}
+                if col['kind'] == 'string':
+                    self._finalize_string(col, entry)
+                else:
+                    self._finalize_fixed(col, entry)
+                entries.append(entry)
+
+            for name in os.listdir(self.tmp_dir):
+                if name.endswith('.part'):
+                    os.remove(os.path.join(self.tmp_dir, name))
+
+            schema = {
+                'format': SCHEMA_FORMAT,
+                'version': SCHEMA_VERSION,
+                'n_rows': int(self.n_rows),
+                'columns': entries,
+            }
+            schema.update(_source_signature(self.file_path))
+            with open(os.path.join(self.tmp_dir, SCHEMA_FILENAME), 'w', encoding='utf-8') as f:
+                json.dump(schema, f)
+
+            if os.path.isdir(self.target_dir):
+                shutil.rmtree(self.target_dir)
+            os.replace(self.tmp_dir, self.target_dir)
+        except Exception:
+            self.abort()
+            raise
+
+    def abort(self):
+        """Discard a partially written sidecar."""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+
+def write_column_store(df, file_path):
+    """
+    Write the columnar sidecar for ``file_path`` from an in-memory DataFrame.
+
+    The text file must already be written, because its size and mtime are
+    recorded in the schema so stale sidecars can be detected on read.
+    The sidecar is built in a temporary directory and swapped into place.
+    """
+    writer = ColumnStoreWriter(file_path)
+    try:
+        writer.append(df)
+    except Exception:
+        writer.abort()
+        raise
+    writer.close()
+
+
+def read_schema(file_path):
+    """Return the sidecar schema, or None if it is missing, unreadable or stale."""
+    schema_file = os.path.join(sidecar_path(file_path), SCHEMA_FILENAME)
+    if not os.path.exists(schema_file) or not os.path.exists(file_path):
+        return None
+
+    try:
+        with open(schema_file, 'r', encoding='utf-8') as f:
+            schema = json.load(f)
+    except (OSError, ValueError):
+        return None
+
+    if schema.get('format') != SCHEMA_FORMAT or schema.get('version') != SCHEMA_VERSION:
+        return None
+    signature = _source_signature(file_path)
+    if (schema.get('source_size') != signature['source_size']
+            or schema.get('source_mtime_ns') != signature['source_mtime_ns']):
+        return None
+    return schema
+
+
+def _decode_column(entry, col_dir, nrows):
+    data = np.load(os.path.join(col_dir, entry['file']), mmap_mode='r', allow_pickle=False)
+    kind = entry['kind']
+
+    if kind == 'varstring':
+        offsets = np.load(os.path.join(col_dir, entry['offsets']), mmap_mode='r', allow_pickle=False)
+        count = len(offsets) - 1 if nrows is None else min(nrows, len(offsets) - 1)
+        raw = data[:offsets[count]].tobytes()
+        starts = offsets[:count + 1].tolist()
+        values = np.array([raw[starts[i]:starts[i + 1]].decode('utf-8') for i in range(count)], dtype=object)
+    else:
+        values = data if nrows is None else data[:nrows]
+
+    if kind == 'datetime':
+        return pd.Series(np.asarray(values, dtype=np.int64).view('datetime64[ns]'))
+    if kind in ('string', 'varstring'):
+        values = np.asarray(values).astype(object)
+        if entry.get('mask'):
+            mask = np.load(os.path.join(col_dir, entry['mask']), mmap_mode='r', allow_pickle=False)
+            mask = np.asarray(mask if nrows is None else mask[:nrows])
+            values[mask] = np.nan
+        return pd.Series(values, dtype=object)
+    return pd.Series(np.array(values, copy=True))
+
+
+def read_column_store(file_path, columns=None, nrows=None):
+    """
+    Load a dataset from its columnar sidecar.
+
+    Args:
+        file_path: Path of the dataset text file the sidecar belongs to
+        columns: Optional list of column names to load
+        nrows: Optional number of leading rows to load
+
+    Returns:
+        A DataFrame, or None if no valid sidecar exists
+    """
+    schema = read_schema(file_path)
+    if schema is None:
+        return None
+
+    col_dir = sidecar_path(file_path)
+    wanted = set(columns) if columns is not None else None
+    data = {}
+    for entry in schema['columns']:
+        if wanted is not None and entry['name'] not in wanted:
+            continue
+        data[entry['name']] = _decode_column(entry, col_dir, nrows)
+
+    n_rows = schema['n_rows'] if nrows is None else min(nrows, schema['n_rows'])
+    return pd.DataFrame(data, index=pd.RangeIndex(n_rows))
+
+
+def remove_column_store(file_path):
+    """Delete the sidecar directory for ``file_path`` if it exists."""
+    target_dir = sidecar_path(file_path)
+    if os.path.isdir(target_dir):
+        shutil.rmtree(target_dir, ignore_errors=True)
+
+
+def _read_text_file(file_path, file_type, nrows=None):
+    file_type = file_type.lower()
+    if file_type == 'csv':
+        return pd.read_csv(file_path, nrows=nrows)
+    if file_type == 'json':
+        df = pd.read_json(file_path)
+        return df.head(nrows) if nrows is not None else df
+    raise ValueError(f"Unsupported file type: {file_type}")
+
+
+def load_dataset_frame(dataset, nrows=None, columns=None):
+    """
+    Load a dataset as a DataFrame, preferring the columnar sidecar.
+
+    Datasets uploaded before the sidecar existed (or whose sidecar is stale)
+    are parsed from text once and the sidecar is backfilled, so later reads
+    take the fast path.
+    """
+    file_path = dataset.file_path
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"Dataset file not found: {file_path}")
+
+    enabled = current_app.config.get('COLUMN_STORE_ENABLED', True)
+    if enabled:
+        try:
+            df = read_column_store(file_path, columns=columns, nrows=nrows)
+            if df is not None:
+                return df
+        except Exception as e:
+            current_app.logger.warning(f"Could not read column store for dataset {dataset.id}: {e}")
+
+    df = _read_text_file(file_path, dataset.file_type, nrows=None if enabled else nrows)
+
+    if enabled:
+        try:
+            write_column_store(df, file_path)
+        except Exception as e:
+            current_app.logger.warning(f"Could not backfill column store for dataset {dataset.id}: {e}")
+
+    if columns is not None:
+        df = df[[c for c in df.columns if c in set(columns)]]
+    return df.head(nrows) if nrows is not None else df
@@ -0,0 +1,129 @@
+from flask import current_app
+
+# Boilerplate injected into every dashboard template. Stored templates
+# reference these as shared assets instead of repeating them (see
+# services/spec_storage), so edit them freely: a changed text is a new asset
+# version and existing dashboards keep the version they were saved with.
+RESPONSIVE_CSS = """
+<style>
+    html, body { width: 100% !important; height: 100% !important; margin: 0 !important; padding: 0 !important; overflow-x: hidden !important; box-sizing: border-box !important; }
+    *, *:before, *:after { box-sizing: inherit !important; }
+    #dashboard-content, #root, #app, main, .main, .dashboard, .dashboard-main,
+    .container, .container-fluid, .row, .grid, div[class*="container"], section, article, .card, .panel, .box {
+        width: 100% !important; max-width: 100% !important; margin-left: auto !important; margin-right: auto !important;
+    }
+    canvas, svg, .chart, div[class*="chart"] { width: 100% !important; max-width: 100% !important; height: auto !important; }
+    img, table { max-width: 100% !important; height: auto !important; }
+</style>
+"""
+
+ERROR_HANDLING_SCRIPT = """
+<script>
+    window.addEventListener('error', function(event) {
+        console.error('Dashboard error:', event.message, 'at', event.filename, ':', event.lineno);
+        var errorDisplay = document.getElementById('dynadashInternalErrorDisplay');
+        if (!errorDisplay && document.body) {
+            errorDisplay = document.createElement('div');
+            errorDisplay.id = 'dynadashInternalErrorDisplay';
+            errorDisplay.style.cssText = 'position:fixed;top:5px;left:5px;right:5px;padding:10px;background:rgba(220,50,50,0.9);color:white;border-radius:4px;z-index:20000;font-family:sans-serif;font-size:14px;';
+            document.body.insertBefore(errorDisplay, document.body.firstChild);
+        }
+        if(errorDisplay) errorDisplay.textContent = 'Dashboard Error: ' + event.message + ' (in ' + (event.filename || 'inline script') + ':' + event.lineno + ')';
+    });
+    document.addEventListener('DOMContentLoaded', function() {
+        if (typeof window.dynadashData === 'undefined' || window.dynadashData === null || (Array.isArray(window.dynadashData) && window.dynadashData.length === 0)) {
+            console.warn('window.dynadashData is not defined or is empty. Dashboard might not render correctly.');
+            var dataWarningDiv = document.getElementById('dynadashDataWarningDisplay');
+            if(!dataWarningDiv && document.body) {
+                dataWarningDiv = document.createElement('div');
+                dataWarningDiv.id = 'dynadashDataWarningDisplay';
+                dataWarningDiv.style.cssText = 'padding:10px;background:rgba(255,220,50,0.8);color:black;text-align:center;font-family:sans-serif;font-size:14px;';
+                dataWarningDiv.textContent = 'Notice: Data for this dashboard (window.dynadashData) was not loaded or is empty. Visualizations may not appear as expected.';
+                document.body.insertBefore(dataWarningDiv, document.body.firstChild);
+            }
+        }
+        setTimeout(function() {
+            if (typeof Chart !== 'undefined' && typeof window.dynadashData !== 'undefined') {
+                var canvases = document.querySelectorAll('canvas');
+                canvases.forEach(function(canvas) {
+                    try {
+                        var chartInstance = Chart.getChart(canvas); 
+                        if (chartInstance) { chartInstance.update('none'); } 
+                    } catch(e) { console.warn('Could not update chart on canvas ' + (canvas.id || '(no id)') + ':', e); }
+                });
+            }
+        }, 1200);
+    });
+</script>
+"""
+
+DASHBOARD_ASSETS = {
+    'responsive-css': RESPONSIVE_CSS,
+    'error-handler': ERROR_HANDLING_SCRIPT
+}
+
+
+def prepare_dashboard_template_html(html_content):
+    """
+    Clean and validate the dashboard HTML TEMPLATE to ensure it's suitable for iframe display
+    and later data injection.
+    """
+    if not html_content:
+        current_app.logger.warning("Empty HTML content provided to prepare_dashboard_template_html")
+        return "<!DOCTYPE html><html><head><meta charset='UTF-8'><title>Error</title></head><body><h2>No dashboard content template available.</h2></body></html>"
+
+    # Ensure the HTML starts with doctype
+    if not html_content.strip().lower().startswith("<!doctype html"):
+        html_content = "<!DOCTYPE html>\n" + html_content
+    
+    # Basic HTML structure checks
+    if "<html" not in html_content.lower():
+        html_content = html_content.replace("<!DOCTYPE html>", "<!DOCTYPE html>\n<html lang='en'>", 1)
+        if "</html>" not in html_content.lower(): html_content += "\n</html>"
+    
+    head_start_idx = html_content.lower().find("<head>")
+    head_end_idx = html_content.lower().find("</head>")
+
+    if head_start_idx == -1: 
+        html_tag_end = html_content.lower().find("<html>")
+        insert_pos = html_tag_end + len("<html>") if html_tag_end != -1 else len("<!DOCTYPE html>")
+        html_content = html_content[:insert_pos] + "\n<head><meta charset=\"UTF-8\"><title>Dashboard</title></head>\n" + html_content[insert_pos:]
+        head_start_idx = html_content.lower().find("<head>") 
+        head_end_idx = html_content.lower().find("</head>")
+
+    if head_start_idx != -1 and "<meta charset" not in html_content[head_start_idx:head_end_idx if head_end_idx!=-1 else len(html_content)].lower():
+        html_content = html_content[:head_start_idx+6] + "<meta charset=\"UTF-8\">\n" + html_content[head_start_idx+6:]
+        head_end_idx = html_content.lower().find("</head>") 
+
+    if "<body" not in html_content.lower():
+        if head_end_idx != -1:
+            html_content = html_content[:head_end_idx+7] + "\n<body>\n</body>" + html_content[head_end_idx+7:]
+        elif "</html>" in html_content.lower():
+            idx = html_content.lower().find("</html>")
+            html_content = html_content[:idx] + "\n<body>\n</body>\n" + html_content[idx:]
+        else:
+            html_content += "\n<body>\n</body>"
+
+    current_head_content = html_content[head_start_idx:head_end_idx if head_end_idx!=-1 else len(html_content)]
+
+    if head_start_idx != -1 and '<meta name="viewport"' not in current_head_content.lower():
+        viewport_meta = '<meta name="viewport" content="width=device-width, initial-scale=1.0, maximum-scale=1.0, user-scalable=no">\n'
+        html_content = html_content[:head_start_idx+6] + viewport_meta + html_content[head_start_idx+6:]
+        head_end_idx = html_content.lower().find("</head>")
+
+    if head_start_idx != -1 and '<meta http-equiv="Content-Security-Policy"' not in current_head_content:
+        csp_tag = '<meta http-equiv="Content-Security-Policy" content="default-src \'self\'; script-src \'self\' \'unsafe-inline\' https://cdn.jsdelivr.net https://d3js.org; style-src \'self\' \'unsafe-inline\' https://cdn.jsdelivr.net; img-src \'self\' data: blob:; connect-src \'self\'; font-src \'self\' https://cdn.jsdelivr.net;">\n'
+        html_content = html_content[:head_start_idx+6] + csp_tag + html_content[head_start_idx+6:]
+        head_end_idx = html_content.lower().find("</head>")
+    
+    if head_end_idx != -1: 
+        html_content = html_content[:head_end_idx] + RESPONSIVE_CSS + html_content[head_end_idx:]
+
+    if "console.error('Dashboard error:'" not in html_content:
+        body_end_idx = html_content.lower().rfind('</body>')
+        if body_end_idx != -1:
+            html_content = html_content[:body_end_idx] + ERROR_HANDLING_SCRIPT + html_content[body_end_idx:]
+        else:
+            html_content += ERROR_HANDLING_SCRIPT
+
+    return html_content
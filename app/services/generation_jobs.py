@@ -0,0 +1,202 @@
+import time
+import asyncio
+from datetime import datetime
+import anthropic
+from flask import current_app, url_for
+from ..models import db, GenerationJob, Visualisation
+from . import claude_service, job_queue
+from .dashboard_template import prepare_dashboard_template_html
+from ..caching import invalidate_visualisation
+
+
+def _emit(job, event, payload):
+    """Send a Socket.IO event to the job owner's room."""
+    from .. import socketio
+    payload = dict(payload, job_id=job.id)
+    socketio.emit(event, payload, room=f"user_{job.user_id}")
+
+
+PROGRESS_STEP = 5  # percent
+PROGRESS_INTERVAL = 1.0  # seconds
+
+
+def _save_progress(job, percent, message):
+    job.progress = percent
+    job.message = message
+    db.session.commit()
+    _emit(job, 'progress_update', {'percent': percent, 'message': message})
+
+
+async def _set_progress(job, percent, message):
+    """Record and announce the job's progress from a worker thread, so the commit does not block the loop."""
+    await asyncio.to_thread(_save_progress, job, percent, message)
+
+
+class _GenerationProgress:
+    """
+    Progress callback for streamed generation.
+
+    Maps output tokens onto 10-89% of the job (against the typical size of a
+    dashboard, ``ANTHROPIC_EXPECTED_DASHBOARD_TOKENS``) and records a change
+    only once it reaches ``PROGRESS_STEP`` percent or ``PROGRESS_INTERVAL``
+    seconds have passed, so a long stream costs about 16 updates.
+
+    The callback runs on the event loop, inside the stream, so updates are
+    written by a task that saves them from a worker thread, in a session of
+    its own, one at a time and skipping to the newest value when it falls
+    behind.
+    """
+
+    def __init__(self, job):
+        self.app = current_app._get_current_object()
+        self.job_id = job.id
+        self.expected = current_app.config.get('ANTHROPIC_EXPECTED_DASHBOARD_TOKENS', 8000)
+        self.percent = 10
+        self.updated_at = time.monotonic()
+        self._pending = None
+        self._writer = None
+
+    def __call__(self, tokens, max_tokens):
+        percent = 10 + int(79 * min(tokens / min(self.expected, max_tokens), 1))
+        now = time.monotonic()
+        if percent <= self.percent:
+            return
+        if percent - self.percent < PROGRESS_STEP and now - self.updated_at < PROGRESS_INTERVAL:
+            return
+        self.percent, self.updated_at = percent, now
+        self._pending = (percent, f'Generating dashboard... ({tokens} tokens)')
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.get_running_loop().create_task(self._write())
+
+    async def _write(self):
+        while self._pending is not None:
+            percent, message = self._pending
+            self._pending = None
+            await asyncio.to_thread(self._save, percent, message)
+
+    def _save(self, percent, message):
+        with self.app.app_context():
+            job = db.session.get(GenerationJob, self.job_id)
+            if job is not None:
+                _save_progress(job, percent, message)
+
+    async def wait(self):
+        """Wait until every recorded update has been written."""
+        if self._writer is not None:
+            await self._writer
+
+
+def enqueue_generation(dataset, user_id, title, description="", use_template_cache=True):
+    """
+    Record a dashboard generation job and hand it to the job queue.
+
+    Args:
+        dataset: The Dataset to generate a dashboard for
+        user_id: ID of the user requesting the dashboard
+        title: Dashboard title
+        description: Optional description of the insights wanted
+        use_template_cache: False to always call Claude instead of reusing a
+            template cached for identical inputs
+
+    Returns:
+        The GenerationJob (already finished when the queue runs eagerly)
+    """
+    job = GenerationJob(
+        user_id=user_id,
+        dataset_id=dataset.id,
+        title=title,
+        description=description,
+        use_template_cache=use_template_cache,
+        status='queued',
+        progress=0,
+        message='Waiting for a worker...'
+    )
+    db.session.add(job)
+    db.session.commit()
+
+    job_queue.submit_async(run_generation_job, job.id)
+    db.session.refresh(job)
+    return job
+
+
+def _save_dashboard(job, template, usage):
+    """Store the generated template as the job's dashboard and finish the job."""
+    for name, tokens in usage.items():
+        setattr(job, name, tokens)
+    visualisation = Visualisation(
+        dataset_id=job.dataset_id,
+        title=job.title,
+        description=job.description,
+        spec=prepare_dashboard_template_html(template)
+    )
+    db.session.add(visualisation)
+    db.session.flush()
+
+    job.visualisation_id = visualisation.id
+    job.status = 'succeeded'
+    job.finished_at = datetime.utcnow()
+    _save_progress(job, 100, 'Dashboard saved! Redirecting...')
+    invalidate_visualisation(visualisation)
+    _emit(job, 'processing_complete', {'redirect_url': url_for('visual.view', id=visualisation.id)})
+
+
+def _fail_job(job_id, error):
+    """Record that a job failed with ``error``."""
+    db.session.rollback()
+    job = db.session.get(GenerationJob, job_id)
+    if job is None:
+        return
+    if isinstance(error, anthropic.APIError):
+        error_message = f'Claude API Error: {str(error)}'
+    else:
+        error_message = f'Unexpected error: {str(error)}'
+    job.status = 'failed'
+    job.error = error_message
+    job.message = 'Dashboard generation failed.'
+    job.finished_at = datetime.utcnow()
+    db.session.commit()
+    _emit(job, 'processing_error', {'message': error_message})
+
+
+async def run_generation_job(job_id):
+    """
+    Generate, prepare and save the dashboard for a queued job.
+
+    Runs on the job queue's event loop: while the Claude request (or its
+    retry backoff) is pending, other jobs run on the same thread. Database
+    writes and Socket.IO events go through worker threads, one at a time.
+    """
+    job = await asyncio.to_thread(db.session.get, GenerationJob, job_id)
+    if job is None:
+        current_app.logger.warning(f"Generation job {job_id} no longer exists.")
+        return
+
+    try:
+        job.status = 'running'
+        job.started_at = datetime.utcnow()
+        await _set_progress(job, 10, 'Analyzing dataset structure...')
+        current_app.logger.info(f"Starting dashboard template generation for job {job.id}, dataset ID: {job.dataset_id}")
+
+        progress = _GenerationProgress(job)
+        usage = {}
+        try:
+            dashboard_html_template = await claude_service.agenerate_dashboard(
+                job.dataset_id,
+                job.title,
+                job.description,
+                progress=progress,
+                use_cache=job.use_template_cache,
+                record_usage=usage.update,
+                user_id=job.user_id
+            )
+        finally:
+            await progress.wait()
+
+        await _set_progress(job, 90, 'Dashboard template generated, saving...')
+        await asyncio.to_thread(_save_dashboard, job, dashboard_html_template, usage)
+
+        current_app.logger.info(f"Dashboard template generation completed for job {job_id}")
+
+    except Exception as e:
+        current_app.logger.error(f"Error in dashboard generation job {job_id}: {str(e)}", exc_info=True)
+        await asyncio.to_thread(_fail_job, job_id, e)
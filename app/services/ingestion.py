@@ -0,0 +1,300 @@
+import os
+import json
+import queue
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import pandas as pd
+from flask import current_app, url_for
+from ..models import db, Dataset
+from .cleaning import clean_frame, ChunkedCsvCleaner
+from .column_store import write_column_store, remove_column_store
+from .profiling import ProfileBuilder, profile_frame
+from .job_queue import JobQueue
+from ..caching import invalidate_dataset
+
+
+def ingest_options(config):
+    """Ingestion settings handed to worker processes, which have no app context."""
+    return {
+        'chunked_threshold': config.get('INGEST_CHUNKED_THRESHOLD'),
+        'chunk_rows': config.get('INGEST_CHUNK_ROWS', 50000),
+        'quantile_sample': config.get('INGEST_QUANTILE_SAMPLE', 100000),
+        'mode_max_distinct': config.get('INGEST_MODE_MAX_DISTINCT', 200000),
+        'column_store': config.get('COLUMN_STORE_ENABLED', True),
+    }
+
+
+def read_json_frame(file_path):
+    """Read an uploaded JSON file into a DataFrame, flattening nested structures."""
+    with open(file_path, 'r') as f:
+        data = json.load(f)
+
+    if isinstance(data, list):
+        return pd.DataFrame(data)
+    if isinstance(data, dict):
+        # Handle nested JSON structures
+        if any(isinstance(v, (list, dict)) for v in data.values()):
+            # Flatten the structure
+            flattened = []
+            for key, value in data.items():
+                if isinstance(value, list):
+                    for item in value:
+                        if isinstance(item, dict):
+                            item['_key'] = key
+                            flattened.append(item)
+                elif isinstance(value, dict):
+                    value['_key'] = key
+                    flattened.append(value)
+            return pd.DataFrame(flattened)
+        # Simple key-value pairs
+        return pd.DataFrame([data])
+    raise ValueError("Invalid JSON structure. Expected a list or dictionary.")
+
+
+def ingest_file(file_path, file_type, options, progress=None):
+    """
+    Clean an uploaded file in place and write its column store.
+
+    This does no database or Socket.IO work, so it can run in a worker process.
+
+    Args:
+        file_path: Path of the saved upload
+        file_type: 'csv' or 'json'
+        options: Settings from ingest_options()
+        progress: Optional callable(percent, message)
+
+    Returns:
+        dict with n_rows, n_columns, the column profile and a list of
+        non-fatal warnings
+    """
+    def report(percent, message):
+        if progress:
+            progress(percent, message)
+
+    if file_type == 'csv':
+        threshold = options.get('chunked_threshold')
+        if threshold is not None and os.path.getsize(file_path) >= threshold:
+            return _ingest_csv_chunked(file_path, options, report)
+        report(10, 'Reading CSV file...')
+        df = pd.read_csv(file_path)
+    elif file_type == 'json':
+        report(10, 'Reading JSON file...')
+        df = read_json_frame(file_path)
+    else:
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+    report(30, 'Cleaning data...')
+    df = clean_frame(df)
+
+    profile = profile_frame(
+        df,
+        sample_size=options.get('quantile_sample', 100000),
+        max_distinct=options.get('mode_max_distinct', 200000)
+    )
+
+    report(60, 'Saving cleaned data...')
+    if file_type == 'csv':
+        df.to_csv(file_path, index=False)
+    else:
+        df.to_json(file_path, orient='records')
+
+    warnings = []
+    if options.get('column_store', True):
+        try:
+            write_column_store(df, file_path)
+        except Exception as e:
+            # Readers fall back to the text file (and backfill), so this is not fatal
+            warnings.append(f"Failed to write column store for {file_path}: {e}")
+
+    return {'n_rows': len(df), 'n_columns': len(df.columns), 'profile': profile, 'warnings': warnings}
+
+
+def _ingest_csv_chunked(file_path, options, report):
+    """Clean a large CSV file in two streaming passes with bounded memory."""
+    cleaner = ChunkedCsvCleaner(
+        chunk_rows=options.get('chunk_rows', 50000),
+        sample_size=options.get('quantile_sample', 100000),
+        max_distinct=options.get('mode_max_distinct', 200000)
+    )
+
+    # First pass: medians, modes, quantiles and date formats
+    report(10, 'Scanning CSV file...')
+    plan = cleaner.collect(file_path)
+
+    # Second pass: apply the statistics, profile the cleaned chunks and
+    # stream the cleaned rows back to disk
+    report(40, 'Cleaning data...')
+    profile = ProfileBuilder(
+        sample_size=options.get('quantile_sample', 100000),
+        max_distinct=options.get('mode_max_distinct', 200000)
+    )
+    columns, sidecar_written = cleaner.apply(
+        file_path,
+        plan,
+        column_store=options.get('column_store', True),
+        progress=lambda fraction: report(40 + int(fraction * 50), 'Cleaning data...'),
+        profile=profile
+    )
+
+    warnings = []
+    if options.get('column_store', True) and not sidecar_written:
+        warnings.append(f"Column store not written for {file_path}; readers will parse the CSV.")
+
+    return {'n_rows': cleaner.n_rows, 'n_columns': len(columns), 'profile': profile.result(), 'warnings': warnings}
+
+
+def _ingest_in_worker(file_path, file_type, options, progress_queue):
+    """Process pool entry point: forward progress through a managed queue."""
+    return ingest_file(
+        file_path,
+        file_type,
+        options,
+        progress=lambda percent, message: progress_queue.put((percent, message))
+    )
+
+
+class IngestionQueue(JobQueue):
+    """
+    Runs dataset ingestion in a process pool so pandas work is not bound by the GIL.
+
+    Each upload gets a coordinator thread (from the JobQueue thread pool) that
+    tracks the dataset status, relays progress to the owner's Socket.IO room
+    and waits on the worker process.
+    """
+
+    extension_name = 'ingestion_queue'
+    poll_interval = 0.5
+
+    def __init__(self):
+        super().__init__()
+        self.max_workers = 2
+        self._process_pool = None
+        self._manager = None
+
+    def init_app(self, app):
+        """Initialize the queue with the application configuration."""
+        super().init_app(app)
+        self.max_workers = app.config.get('INGEST_WORKERS', self.max_workers)
+
+    def _get_process_pool(self):
+        with self._lock:
+            if self._process_pool is None:
+                # spawn: the web process is multi-threaded, so forking it is unsafe
+                context = multiprocessing.get_context('spawn')
+                self._manager = context.Manager()
+                self._process_pool = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+            return self._process_pool, self._manager
+
+    def _discard_process_pool(self, pool):
+        """Drop ``pool`` and its manager after a worker died, so the next ingestion starts new ones."""
+        manager = None
+        with self._lock:
+            if self._process_pool is pool:
+                self._process_pool = None
+                manager, self._manager = self._manager, None
+        pool.shutdown(wait=False, cancel_futures=True)
+        if manager is not None:
+            manager.shutdown()
+
+    def submit_dataset(self, dataset_id):
+        """Queue ingestion of a pending dataset."""
+        return self.submit(self._run_ingestion, dataset_id)
+
+    def _emit(self, dataset, event, payload):
+        from .. import socketio
+        payload = dict(payload, dataset_id=dataset.id)
+        socketio.emit(event, payload, room=f"user_{dataset.user_id}")
+
+    def _run_ingestion(self, dataset_id):
+        dataset = db.session.get(Dataset, dataset_id)
+        if dataset is None:
+            current_app.logger.warning(f"Dataset {dataset_id} was deleted before ingestion started.")
+            return
+
+        dataset.status = 'processing'
+        db.session.commit()
+
+        file_path = dataset.file_path
+        options = ingest_options(current_app.config)
+        progress = lambda percent, message: self._emit(dataset, 'progress_update', {'percent': percent, 'message': message})
+
+        try:
+            if self.eager:
+                result = ingest_file(file_path, dataset.file_type, options, progress=progress)
+            else:
+                result = self._ingest_in_process(dataset, options, progress)
+
+            for warning in result['warnings']:
+                current_app.logger.warning(warning)
+
+            dataset.n_rows = result['n_rows']
+            dataset.n_columns = result['n_columns']
+            dataset.profile = result['profile']
+            dataset.status = 'ready'
+            db.session.commit()
+            invalidate_dataset(dataset)
+
+            progress(100, 'Processing complete!')
+            self._emit(dataset, 'processing_complete', {'redirect_url': url_for('data.view', id=dataset.id)})
+
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(f"Error ingesting dataset {dataset_id}: {str(e)}", exc_info=True)
+
+            # Clean up the file if there was an error
+            if os.path.exists(file_path):
+                os.remove(file_path)
+            remove_column_store(file_path)
+
+            dataset = db.session.get(Dataset, dataset_id)
+            if dataset is None:
+                current_app.logger.warning(f"Dataset {dataset_id} was deleted during ingestion.")
+                return
+            dataset.status = 'failed'
+            dataset.error_message = str(e)
+            db.session.commit()
+            invalidate_dataset(dataset)
+            self._emit(dataset, 'processing_error', {'message': str(e)})
+
+    def _ingest_in_process(self, dataset, options, progress):
+        pool, manager = self._get_process_pool()
+        progress_queue = manager.Queue()
+        try:
+            future = pool.submit(_ingest_in_worker, dataset.file_path, dataset.file_type, options, progress_queue)
+        except BrokenProcessPool:
+            # A worker died during an earlier ingestion; this one gets a new pool
+            self._discard_process_pool(pool)
+            pool, manager = self._get_process_pool()
+            progress_queue = manager.Queue()
+            future = pool.submit(_ingest_in_worker, dataset.file_path, dataset.file_type, options, progress_queue)
+
+        while True:
+            try:
+                percent, message = progress_queue.get(timeout=self.poll_interval)
+            except queue.Empty:
+                if future.done():
+                    break
+                continue
+            progress(percent, message)
+
+        try:
+            return future.result()
+        except BrokenProcessPool:
+            # The worker died on this file (e.g. killed for running out of memory)
+            self._discard_process_pool(pool)
+            raise
+
+    def shutdown(self, wait=True):
+        """Stop the coordinator threads and worker processes."""
+        super().shutdown(wait=wait)
+        with self._lock:
+            if self._process_pool is not None:
+                self._process_pool.shutdown(wait=wait)
+                self._process_pool = None
+            if self._manager is not None:
+                self._manager.shutdown()
+                self._manager = None
+
+
+ingestion_queue = IngestionQueue()
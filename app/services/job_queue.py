@@ -0,0 +1,134 @@
+import asyncio
+import threading
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app, has_request_context, request
+
+
+class JobQueue:
+    """
+    Runs long-running work (e.g. Claude calls) on a worker pool instead of the request thread.
+
+    Blocking jobs run on a thread pool (``submit``). Coroutine jobs
+    (``submit_async``) share one event loop running on its own thread, so
+    jobs that mostly wait on the network do not need a thread each.
+    """
+
+    extension_name = 'job_queue'
+
+    def __init__(self):
+        self.max_workers = 4
+        self.eager = False
+        self._executor = None
+        self._loop = None
+        self._loop_thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Initialize the queue with the application configuration."""
+        self.max_workers = app.config.get('JOB_WORKERS', self.max_workers)
+        self.eager = app.config.get('JOBS_EAGER', self.eager)
+        app.extensions[self.extension_name] = self
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix='dynadash-job'
+                )
+            return self._executor
+
+    def _get_loop(self):
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(
+                    target=self._loop.run_forever,
+                    name='dynadash-job-loop',
+                    daemon=True
+                )
+                self._loop_thread.start()
+            return self._loop
+
+    def submit(self, fn, *args, **kwargs):
+        """
+        Run fn(*args, **kwargs) in the background.
+
+        The job runs inside an application context. When submitted from a request,
+        the request's base URL is kept so that url_for() works in the worker.
+        In eager mode (tests) the job runs inline and None is returned.
+
+        Returns:
+            concurrent.futures.Future or None
+        """
+        if self.eager:
+            if has_request_context():
+                fn(*args, **kwargs)
+            else:
+                with current_app.test_request_context():
+                    fn(*args, **kwargs)
+            return None
+
+        app = current_app._get_current_object()
+        base_url = request.url_root if has_request_context() else None
+        return self._get_executor().submit(self._run, app, base_url, fn, args, kwargs)
+
+    @staticmethod
+    def _run(app, base_url, fn, args, kwargs):
+        context = app.test_request_context(base_url=base_url) if base_url else app.app_context()
+        with context:
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                app.logger.error(f"Background job {getattr(fn, '__name__', fn)} failed: {str(e)}", exc_info=True)
+                raise
+
+    def submit_async(self, fn, *args, **kwargs):
+        """
+        Run the coroutine function fn(*args, **kwargs) on the queue's event loop.
+
+        Contexts are handled as in ``submit``; each job gets its own
+        application context (and so its own database session). In eager mode
+        the coroutine runs to completion inline and None is returned.
+
+        Returns:
+            concurrent.futures.Future or None
+        """
+        if self.eager:
+            if has_request_context():
+                asyncio.run(fn(*args, **kwargs))
+            else:
+                with current_app.test_request_context():
+                    asyncio.run(fn(*args, **kwargs))
+            return None
+
+        app = current_app._get_current_object()
+        base_url = request.url_root if has_request_context() else None
+        return asyncio.run_coroutine_threadsafe(self._run_async(app, base_url, fn, args, kwargs), self._get_loop())
+
+    @staticmethod
+    async def _run_async(app, base_url, fn, args, kwargs):
+        # The task starts with a copy of the submitter's context variables, so
+        # a new app context is pushed first; otherwise a job submitted from a
+        # request would share that request's g and database session
+        with app.app_context(), (app.test_request_context(base_url=base_url) if base_url else nullcontext()):
+            try:
+                return await fn(*args, **kwargs)
+            except Exception as e:
+                app.logger.error(f"Background job {getattr(fn, '__name__', fn)} failed: {str(e)}", exc_info=True)
+                raise
+
+    def shutdown(self, wait=True):
+        """Stop the worker pool and the event loop."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+            if self._loop is not None:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                if wait:
+                    self._loop_thread.join()
+                    self._loop.close()
+                self._loop = None
+                self._loop_thread = None
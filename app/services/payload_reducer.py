@@ -0,0 +1,383 @@
+import json
+import numpy as np
+import pandas as pd
+
+try:
+    import orjson
+except ImportError:  # optional: without it columns are encoded by pandas
+    orjson = None
+
+# Dashboards receive the dataset as a JSON array of row records inlined into
+# the page. Large datasets are reduced on the server so the page stays under
+# a row budget and a byte cap while the charts remain representative.
+
+PAYLOAD_MODES = ('auto', 'full', 'uniform', 'stratified', 'lttb', 'aggregate')
+PAYLOAD_FORMATS = ('columns', 'records')
+AGGREGATE_FUNCTIONS = ('mean', 'sum', 'min', 'max', 'median', 'count')
+STRATIFY_MAX_GROUPS = 50
+SIZE_ESTIMATE_ROWS = 200
+
+
+def normalize_options(options):
+    """
+    Validate per-visualisation payload options.
+
+    Recognised keys: ``mode`` (one of ``PAYLOAD_MODES``), ``max_rows``,
+    ``stratify_by`` (stratified), ``x`` and ``y`` (lttb), ``group_by`` and
+    ``aggregates`` (aggregate, a ``{column: function}`` mapping).
+
+    Returns:
+        A cleaned copy of the options
+
+    Raises:
+        ValueError: If an option is unknown or invalid
+    """
+    if options is None:
+        return {}
+    if not isinstance(options, dict):
+        raise ValueError("Data options must be an object.")
+
+    unknown = set(options) - {'mode', 'max_rows', 'stratify_by', 'x', 'y', 'group_by', 'aggregates'}
+    if unknown:
+        raise ValueError(f"Unknown data options: {', '.join(sorted(unknown))}")
+
+    cleaned = {}
+    mode = options.get('mode', 'auto')
+    if mode not in PAYLOAD_MODES:
+        raise ValueError(f"Invalid mode '{mode}'. Expected one of: {', '.join(PAYLOAD_MODES)}")
+    cleaned['mode'] = mode
+
+    if options.get('max_rows') is not None:
+        max_rows = options['max_rows']
+        if isinstance(max_rows, bool) or not isinstance(max_rows, int) or max_rows < 1:
+            raise ValueError("max_rows must be a positive integer.")
+        cleaned['max_rows'] = max_rows
+
+    for key in ('stratify_by', 'x'):
+        if options.get(key) is not None:
+            if not isinstance(options[key], str):
+                raise ValueError(f"{key} must be a column name.")
+            cleaned[key] = options[key]
+
+    for key in ('y', 'group_by'):
+        if options.get(key) is not None:
+            value = options[key]
+            value = [value] if isinstance(value, str) else value
+            if not isinstance(value, list) or not all(isinstance(col, str) for col in value):
+                raise ValueError(f"{key} must be a column name or a list of column names.")
+            cleaned[key] = value
+
+    if options.get('aggregates') is not None:
+        aggregates = options['aggregates']
+        if not isinstance(aggregates, dict) or not all(
+            isinstance(col, str) and func in AGGREGATE_FUNCTIONS for col, func in aggregates.items()
+        ):
+            raise ValueError(f"aggregates must map column names to one of: {', '.join(AGGREGATE_FUNCTIONS)}")
+        cleaned['aggregates'] = dict(aggregates)
+
+    return cleaned
+
+
+def frame_to_records_json(df):
+    """Serialise a frame as a JSON array of row records (NaN becomes null)."""
+    return df.to_json(orient='records', date_format='iso', double_precision=15)
+
+
+def _column_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'boolean'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'integer'
+    if pd.api.types.is_numeric_dtype(dtype):
+        return 'number'
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return 'datetime'
+    return 'string'
+
+
+def _column_json(series):
+    """One column as a JSON array, straight from its NumPy buffer where possible."""
+    dtype = series.dtype
+    if orjson is not None:
+        if isinstance(dtype, np.dtype) and dtype.kind in 'biuf':
+            return orjson.dumps(np.ascontiguousarray(series.to_numpy()), option=orjson.OPT_SERIALIZE_NUMPY).decode()
+        if pd.api.types.is_object_dtype(dtype):
+            return orjson.dumps(series.tolist(), default=str).decode()
+    if not isinstance(dtype, np.dtype) and (pd.api.types.is_integer_dtype(dtype) or pd.api.types.is_bool_dtype(dtype)):
+        # Nullable extension arrays: keep integers as integers, <NA> as null
+        values = series.astype(object).where(series.notna(), None).tolist()
+        return orjson.dumps(values).decode() if orjson is not None else json.dumps(values, separators=(',', ':'))
+    return series.to_json(orient='values', date_format='iso', double_precision=15)
+
+
+def frame_to_columns_json(df):
+    """
+    Serialise a frame column-wise: ``{"format", "length", "schema", "columns"}``.
+
+    ``columns`` holds one array per ``schema`` entry, so column names are sent
+    once instead of once per row. Numeric columns are encoded from their NumPy
+    buffers (with orjson when it is installed, else pandas' encoder).
+    """
+    schema = [{'name': str(col), 'type': _column_type(dtype)} for col, dtype in df.dtypes.items()]
+    schema_json = json.dumps(schema, separators=(',', ':'))
+    columns = ','.join(_column_json(df.iloc[:, i]) for i in range(len(df.columns)))
+    return f'{{"format":"columns","length":{len(df)},"schema":{schema_json},"columns":[{columns}]}}'
+
+
+def encode_frame(df, payload_format='records'):
+    """Serialise a frame in one of ``PAYLOAD_FORMATS``."""
+    if payload_format == 'columns':
+        return frame_to_columns_json(df)
+    if payload_format == 'records':
+        return frame_to_records_json(df)
+    raise ValueError(f"Invalid format '{payload_format}'. Expected one of: {', '.join(PAYLOAD_FORMATS)}")
+
+
+def _row_budget(df, max_rows, max_bytes):
+    """Rows that fit both the row budget and, by the size of a sample of rows, the byte cap."""
+    budget = max_rows
+    if max_bytes and len(df):
+        sample = df.iloc[:SIZE_ESTIMATE_ROWS]
+        bytes_per_row = max(len(frame_to_records_json(sample)) / len(sample), 1)
+        budget = min(budget, int(max_bytes / bytes_per_row))
+    return max(budget, 1)
+
+
+def _check_columns(df, columns):
+    missing = [col for col in columns if col not in df.columns]
+    if missing:
+        raise ValueError(f"Unknown columns: {', '.join(missing)}")
+
+
+def _low_cardinality_column(df):
+    """The text column with the fewest distinct values (at most ``STRATIFY_MAX_GROUPS``)."""
+    best, best_count = None, STRATIFY_MAX_GROUPS + 1
+    for col, dtype in df.dtypes.items():
+        if isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(dtype) or pd.api.types.is_bool_dtype(dtype):
+            count = df[col].nunique(dropna=False)
+            if 1 < count < best_count:
+                best, best_count = col, count
+    return best
+
+
+def uniform_sample(df, budget, seed=0):
+    """Simple random sample of ``budget`` rows, kept in their original order."""
+    if len(df) <= budget:
+        return df
+    return df.sample(budget, random_state=seed).sort_index()
+
+
+def stratified_sample(df, budget, column, seed=0):
+    """
+    Sample ``budget`` rows proportionally within each value of ``column``.
+
+    Every group keeps at least one row so rare categories still show up,
+    paid for by the largest groups so the result stays within ``budget``.
+    With more groups than ``budget`` that is impossible, and the sample is
+    uniform instead.
+    """
+    if len(df) <= budget:
+        return df
+    keys = df[column].astype(object).where(df[column].notna(), '__missing__')
+    counts = keys.value_counts()
+    if len(counts) > budget:
+        return uniform_sample(df, budget, seed)
+    allocation = np.maximum(1, np.floor(counts * budget / len(df))).astype(np.int64)
+    excess = int(allocation.sum()) - budget
+    for key in allocation.index:  # largest groups first
+        if excess <= 0:
+            break
+        cut = min(excess, int(allocation[key]) - 1)
+        allocation[key] -= cut
+        excess -= cut
+    rng = np.random.default_rng(seed)
+    rank = pd.Series(rng.random(len(df)), index=df.index).groupby(keys).rank(method='first')
+    return df[rank <= keys.map(allocation)]
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling.
+
+    ``x`` must be sorted. Returns the positions of ``threshold`` points that
+    keep the visual shape of the ``(x, y)`` line, including both ends.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(min(n, max(threshold, 0)))
+
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], max(edges[i + 1], edges[i] + 1)
+        if i + 2 < len(edges):
+            next_start, next_end = edges[i + 1], max(edges[i + 2], edges[i + 1] + 1)
+        else:
+            next_start, next_end = n - 1, n
+        avg_x = x[next_start:next_end].mean()
+        avg_y = y[next_start:next_end].mean()
+        # Twice the triangle area against the selected point and the next bucket's mean
+        areas = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.nanargmax(areas)) if np.isfinite(areas).any() else start
+        selected[i + 1] = a
+    return selected
+
+
+def _default_x(df):
+    for col, dtype in df.dtypes.items():
+        if pd.api.types.is_datetime64_any_dtype(dtype):
+            return col
+    for col in df.columns:
+        if str(col).endswith('_date'):
+            return col
+    return None
+
+
+def _datetime_float(series):
+    values = series.to_numpy(dtype='datetime64[ns]').astype(np.int64).astype(np.float64)
+    values[series.isna().to_numpy()] = np.nan
+    return values
+
+
+def _as_float(series):
+    """Numeric positions for plotting: numbers as-is, dates as epoch nanoseconds."""
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return _datetime_float(series)
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    parsed = pd.to_datetime(series, errors='coerce')
+    if parsed.notna().any():
+        return _datetime_float(parsed)
+    return np.arange(len(series), dtype=np.float64)
+
+
+def lttb_sample(df, budget, x=None, y=None):
+    """
+    Downsample a time series with LTTB, keeping all columns of the chosen rows.
+
+    Rows are ordered by ``x`` (default: the first datetime or ``*_date``
+    column, else row order). Each ``y`` column (default: numeric columns
+    other than outlier flags) gets an equal share of the budget and the
+    union of the selected rows is returned.
+    """
+    if len(df) <= budget:
+        return df
+    x = x or _default_x(df)
+    if x is not None:
+        _check_columns(df, [x])
+    if y is None:
+        y = [
+            col for col, dtype in df.dtypes.items()
+            if col != x and pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+            and not str(col).endswith('_outlier')
+        ]
+    _check_columns(df, y)
+    if not y:
+        return uniform_sample(df, budget)
+
+    ordered = df
+    x_values = np.arange(len(df), dtype=np.float64)
+    if x is not None:
+        x_values = _as_float(df[x])
+        order = np.argsort(x_values, kind='stable')
+        ordered, x_values = df.iloc[order], x_values[order]
+        keep = ~np.isnan(x_values)
+        ordered, x_values = ordered[keep], x_values[keep]
+
+    share = max(budget // len(y), 3)
+    positions = set()
+    for col in y:
+        y_values = _as_float(ordered[col])
+        y_values = np.where(np.isnan(y_values), np.nanmean(y_values) if np.isfinite(y_values).any() else 0.0, y_values)
+        positions.update(lttb_indices(x_values, y_values, share).tolist())
+    positions = sorted(positions)[:budget] if len(positions) > budget else sorted(positions)
+    return ordered.iloc[positions]
+
+
+def aggregate_frame(df, budget, group_by=None, aggregates=None):
+    """
+    Pre-aggregate rows into a group-by table with a ``count`` column.
+
+    ``group_by`` defaults to the lowest-cardinality text column and
+    ``aggregates`` to the mean of every numeric column. When there are more
+    groups than the budget, the largest groups are kept.
+    """
+    if group_by is None:
+        column = _low_cardinality_column(df)
+        if column is None:
+            raise ValueError("No column to group by; set group_by in the data options.")
+        group_by = [column]
+    _check_columns(df, group_by)
+
+    if aggregates is None:
+        aggregates = {
+            col: 'mean' for col, dtype in df.dtypes.items()
+            if col not in group_by and pd.api.types.is_numeric_dtype(dtype) and not pd.api.types.is_bool_dtype(dtype)
+        }
+    _check_columns(df, list(aggregates))
+
+    grouped = df.groupby(group_by, dropna=False, sort=False)
+    count_name = 'count' if 'count' not in aggregates and 'count' not in group_by else '_count'
+    table = grouped.agg(**{col: (col, func) for col, func in aggregates.items()}) if aggregates else None
+    sizes = grouped.size().rename(count_name)
+    table = sizes.to_frame() if table is None else table.join(sizes)
+    table = table.sort_values(count_name, ascending=False, kind='stable').head(budget)
+    return table.reset_index()
+
+
+def reduce_frame(df, options=None, max_rows=20000, max_bytes=None):
+    """
+    Reduce a dataset for rendering according to a visualisation's options.
+
+    ``mode`` ``auto`` (the default) sends the full dataset when it fits the
+    budget and a uniform sample otherwise; ``full`` only applies the byte
+    cap. The row budget is the smaller of ``max_rows`` (per-visualisation
+    ``max_rows`` can only lower it) and the rows that fit in ``max_bytes``.
+
+    Returns:
+        (reduced DataFrame, info dict with mode, total_rows, rows and reduced)
+    """
+    options = normalize_options(options)
+    mode = options.get('mode', 'auto')
+    row_limit = max(len(df), 1) if mode == 'full' else min(options.get('max_rows', max_rows), max_rows)
+    budget = _row_budget(df, row_limit, max_bytes)
+
+    if mode == 'aggregate':
+        reduced = aggregate_frame(df, budget, options.get('group_by'), options.get('aggregates'))
+    elif len(df) <= budget:
+        reduced = df
+    elif mode == 'stratified':
+        column = options.get('stratify_by') or _low_cardinality_column(df)
+        if column is None:
+            reduced = uniform_sample(df, budget)
+        else:
+            _check_columns(df, [column])
+            reduced = stratified_sample(df, budget, column)
+    elif mode == 'lttb':
+        reduced = lttb_sample(df, budget, options.get('x'), options.get('y'))
+    else:
+        reduced = uniform_sample(df, budget)
+
+    info = {
+        'mode': mode,
+        'total_rows': len(df),
+        'rows': len(reduced),
+        'reduced': mode == 'aggregate' or len(reduced) < len(df),
+    }
+    return reduced, info
+
+
+def dataset_payload_json(df, options, config, payload_format='records'):
+    """Reduce a dataset with the app's payload limits and serialise it for the page."""
+    max_mb = config.get('PAYLOAD_MAX_MB')
+    reduced, info = reduce_frame(
+        df,
+        options,
+        max_rows=config.get('PAYLOAD_MAX_ROWS', 20000),
+        max_bytes=int(max_mb * 1024 * 1024) if max_mb else None
+    )
+    return encode_frame(reduced, payload_format), info
@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+from flask import current_app
+from ..models import db
+from .cleaning import reservoir_add
+from .column_store import load_dataset_frame
+
+# Column profiles are computed once at ingestion time and stored on
+# ``Dataset.profile`` so prompt building does not re-scan the file. The shape
+# is what the Claude prompts expect: ``{column: {"name", "type", ...stats}}``.
+
+TOP_VALUES_MAX_DISTINCT = 10
+TOP_VALUES_COUNT = 5
+EXAMPLE_VALUES_COUNT = 3
+
+
+def _json_value(value):
+    """Plain JSON-serialisable version of a cell value."""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    return str(value)
+
+
+class _ColumnProfile:
+    """Running statistics for one column."""
+
+    def __init__(self, dtype):
+        self.dtype = dtype
+        if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_numeric_dtype(dtype):
+            self.kind = 'numeric'
+        elif pd.api.types.is_datetime64_any_dtype(dtype):
+            self.kind = 'datetime'
+        elif isinstance(dtype, pd.CategoricalDtype) or pd.api.types.is_object_dtype(dtype) or pd.api.types.is_string_dtype(dtype):
+            self.kind = 'text'
+        else:
+            self.kind = 'other'
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.reservoir = np.empty(0, dtype=np.float64)
+        self.seen = 0
+        self.counts = {}
+        self.examples = []
+
+    def merge_dtype(self, dtype):
+        if dtype == self.dtype:
+            return
+        if pd.api.types.is_numeric_dtype(dtype) and pd.api.types.is_numeric_dtype(self.dtype):
+            self.dtype = np.dtype(np.float64)
+        else:
+            self.dtype = np.dtype(object)
+
+
+class ProfileBuilder:
+    """
+    Build a dataset's column profile from one frame or a stream of chunks.
+
+    Numeric columns get min, max, mean and std (merged exactly across chunks)
+    and a median from a reservoir sample of ``sample_size`` values, so it is
+    exact for columns of at most that many values. Text columns keep merged
+    value counts capped at ``max_distinct`` distinct values.
+    """
+
+    def __init__(self, sample_size=100000, max_distinct=200000, seed=0):
+        self.sample_size = sample_size
+        self.max_distinct = max_distinct
+        self.rng = np.random.default_rng(seed)
+        self.columns = {}
+
+    def update(self, df):
+        """Add a frame (or the next chunk of one) to the profile."""
+        for col, dtype in df.dtypes.items():
+            column = self.columns.get(col)
+            if column is None:
+                column = self.columns[col] = _ColumnProfile(dtype)
+            else:
+                column.merge_dtype(dtype)
+
+            non_null = df[col].dropna()
+            if non_null.empty:
+                continue
+            if column.kind == 'numeric':
+                self._add_numeric(column, non_null.to_numpy(dtype=np.float64))
+            elif column.kind == 'datetime':
+                low, high = non_null.min(), non_null.max()
+                column.min = low if column.min is None else min(column.min, low)
+                column.max = high if column.max is None else max(column.max, high)
+            elif column.kind == 'text':
+                self._add_text(column, non_null)
+        return self
+
+    def _add_numeric(self, column, values):
+        # Chan et al. parallel update of the running mean and sum of squares
+        n, mean = len(values), float(values.mean())
+        m2 = float(((values - mean) ** 2).sum())
+        total = column.count + n
+        delta = mean - column.mean
+        column.m2 += m2 + delta * delta * column.count * n / total
+        column.mean += delta * n / total
+        column.count = total
+        low, high = float(values.min()), float(values.max())
+        column.min = low if column.min is None else min(column.min, low)
+        column.max = high if column.max is None else max(column.max, high)
+        column.reservoir, column.seen = reservoir_add(column.reservoir, column.seen, values, self.sample_size, self.rng)
+
+    def _add_text(self, column, non_null):
+        for value, count in non_null.value_counts(sort=False).items():
+            column.counts[value] = column.counts.get(value, 0) + int(count)
+        if len(column.examples) < EXAMPLE_VALUES_COUNT:
+            for value in non_null.unique():
+                if value not in column.examples:
+                    column.examples.append(value)
+                if len(column.examples) == EXAMPLE_VALUES_COUNT:
+                    break
+        if len(column.counts) > self.max_distinct:
+            # Keep the most frequent half; distinct counts are then a lower bound
+            top = sorted(column.counts.items(), key=lambda kv: kv[1], reverse=True)[:self.max_distinct // 2]
+            column.counts = dict(top)
+
+    def result(self):
+        """Return the profile as a JSON-serialisable dict keyed by column name."""
+        profile = {}
+        for col, column in self.columns.items():
+            name = str(col)
+            stats = {"type": str(column.dtype), "name": name}
+            if column.kind == 'numeric':
+                has_values = column.count > 0
+                stats.update({
+                    "min": column.min,
+                    "max": column.max,
+                    "mean": column.mean if has_values else None,
+                    "median": float(np.median(column.reservoir)) if has_values else None,
+                    "std": (column.m2 / (column.count - 1)) ** 0.5 if column.count > 1 else None
+                })
+            elif column.kind == 'datetime':
+                stats["type"] = "datetime"
+                stats.update({
+                    "min": column.min.isoformat() if column.min is not None else None,
+                    "max": column.max.isoformat() if column.max is not None else None
+                })
+            elif column.kind == 'text':
+                unique_values_count = len(column.counts)
+                stats["unique_values"] = unique_values_count
+                if 0 < unique_values_count < TOP_VALUES_MAX_DISTINCT:
+                    top = sorted(column.counts.items(), key=lambda kv: kv[1], reverse=True)[:TOP_VALUES_COUNT]
+                    stats["top_values"] = {str(value): count for value, count in top}
+                else:
+                    stats["example_values"] = [_json_value(value) for value in column.examples]
+            profile[name] = stats
+        return profile
+
+
+def profile_frame(df, sample_size=100000, max_distinct=200000):
+    """Profile an in-memory DataFrame."""
+    return ProfileBuilder(sample_size=sample_size, max_distinct=max_distinct).update(df).result()
+
+
+def get_dataset_profile(dataset):
+    """
+    Return the stored column profile of a dataset.
+
+    Datasets ingested before profiles were stored are profiled once from the
+    cleaned file and the result is saved for later requests.
+    """
+    if dataset.profile is not None:
+        return dataset.profile
+
+    current_app.logger.info(f"Backfilling column profile for dataset {dataset.id}")
+    dataset.profile = profile_frame(
+        load_dataset_frame(dataset),
+        sample_size=current_app.config.get('INGEST_QUANTILE_SAMPLE', 100000),
+        max_distinct=current_app.config.get('INGEST_MODE_MAX_DISTINCT', 200000)
+    )
+    db.session.commit()
+    return dataset.profile
@@ -0,0 +1,328 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+
+PAUSED = 'paused_until'
+
+
+class MemoryBucketStore:
+    """
+    Token buckets for one process.
+
+    Each bucket holds up to its per-minute limit and refills continuously at
+    limit/60 per second, so a full bucket allows a burst of one minute's
+    allowance and a steady stream never exceeds the limit. Buckets may go
+    negative when a request used more than it reserved; later requests then
+    wait for the debt to refill.
+
+    Args:
+        limits: Mapping of bucket name to its per-minute limit (0 = unlimited)
+    """
+
+    def __init__(self, limits):
+        self.limits = {name: limit for name, limit in limits.items() if limit}
+        self._state = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def _state_for_update(self):
+        with self._lock:
+            yield self._state
+
+    def _levels(self, state, now):
+        levels = {}
+        for name, limit in self.limits.items():
+            level, updated = state.get(name, (limit, now))
+            levels[name] = min(limit, level + (now - updated) * limit / 60)
+        return levels
+
+    def clamp(self, amounts):
+        """``amounts`` limited to what each bucket can hold; a larger request waits for a full bucket."""
+        return {name: min(amount, self.limits[name]) if name in self.limits else amount for name, amount in amounts.items()}
+
+    def take(self, amounts):
+        """
+        Take ``amounts`` from the buckets if all of them have enough.
+
+        Returns:
+            0 when taken, otherwise the seconds until they will have
+        """
+        with self._state_for_update() as state:
+            now = time.time()
+            paused_until = state.get(PAUSED, (0, now))[0]
+            if paused_until > now:
+                return paused_until - now
+            levels = self._levels(state, now)
+            wait = 0
+            for name, limit in self.limits.items():
+                wait = max(wait, (amounts.get(name, 0) - levels[name]) * 60 / limit)
+            if wait > 0:
+                return wait
+            for name in self.limits:
+                state[name] = (levels[name] - amounts.get(name, 0), now)
+            return 0
+
+    def give_back(self, amounts):
+        """Return unused reservations to the buckets (negative amounts take more)."""
+        with self._state_for_update() as state:
+            now = time.time()
+            levels = self._levels(state, now)
+            for name in self.limits:
+                if amounts.get(name):
+                    state[name] = (min(self.limits[name], levels[name] + amounts[name]), now)
+
+    def pause(self, seconds):
+        """Take nothing from the buckets for ``seconds`` (e.g. after a 429)."""
+        with self._state_for_update() as state:
+            now = time.time()
+            state[PAUSED] = (max(state.get(PAUSED, (0, now))[0], now + seconds), now)
+
+    def levels(self):
+        """Current content of each bucket."""
+        with self._state_for_update() as state:
+            return self._levels(state, time.time())
+
+
+class SQLiteBucketStore(MemoryBucketStore):
+    """
+    Token buckets kept in a SQLite file, shared by every worker process on the host.
+
+    Each update reads and writes the buckets in one ``BEGIN IMMEDIATE``
+    transaction, so processes never take the same tokens twice.
+    """
+
+    def __init__(self, limits, path):
+        super().__init__(limits)
+        self.path = path
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS rate_bucket (name TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)'
+        )
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    @contextmanager
+    def _state_for_update(self):
+        conn = self._connection()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            state = {name: (level, updated) for name, level, updated in conn.execute('SELECT name, level, updated FROM rate_bucket')}
+            yield state
+            conn.executemany(
+                'INSERT OR REPLACE INTO rate_bucket (name, level, updated) VALUES (?, ?, ?)',
+                [(name, level, updated) for name, (level, updated) in state.items()]
+            )
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+
+
+class _Ticket:
+    def __init__(self, user_key, amounts):
+        self.user_key = user_key
+        self.amounts = amounts
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+        self.granted = False
+
+    def grant(self):
+        self.granted = True
+        self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(None)
+
+
+class Permit:
+    """A granted request slot; ``settle`` with the actual usage once known, inside the ``async with`` block."""
+
+    def __init__(self, governor, amounts):
+        self.governor = governor
+        self.amounts = amounts
+        self.unused = {}
+
+    def settle(self, input_tokens, output_tokens):
+        """Record the usage; what was reserved but not used (or used beyond it) is returned as the slot is released."""
+        self.unused = {
+            'input_tokens': self.amounts.get('input_tokens', 0) - input_tokens,
+            'output_tokens': self.amounts.get('output_tokens', 0) - output_tokens
+        }
+        self.amounts = dict(self.amounts, input_tokens=input_tokens, output_tokens=output_tokens)
+
+
+class RateGovernor:
+    """
+    Keeps Claude API calls within the account's rate limits.
+
+    Calls wait for a slot instead of being sent and rejected with 429s:
+    token buckets track requests, input tokens and output tokens per minute
+    (``ANTHROPIC_RPM_LIMIT``, ``ANTHROPIC_INPUT_TPM_LIMIT``,
+    ``ANTHROPIC_OUTPUT_TPM_LIMIT``) and ``ANTHROPIC_MAX_CONCURRENT`` bounds
+    the calls in flight. Waiting calls are queued per user and served round
+    robin, so one user's burst does not hold up everyone else. With
+    ``ANTHROPIC_RATE_STATE_PATH`` the buckets live in a SQLite file shared
+    by all worker processes; queues and the concurrency bound are per process.
+
+    Bucket updates may wait on the SQLite file's lock, so ``slot`` takes the
+    governor's lock and touches the store only in worker threads, never on
+    the event loop it is awaited on.
+    """
+
+    extension_name = 'rate_governor'
+    MAX_WAIT = 1.0  # seconds between re-checks while queued
+
+    def __init__(self):
+        self.max_concurrent = 0
+        self._store = None
+        self._queues = OrderedDict()
+        self._in_flight = 0
+        self._paused_until = 0  # time.monotonic() deadline set by pause
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Initialize the governor with the application configuration."""
+        limits = {
+            'requests': app.config.get('ANTHROPIC_RPM_LIMIT', 0),
+            'input_tokens': app.config.get('ANTHROPIC_INPUT_TPM_LIMIT', 0),
+            'output_tokens': app.config.get('ANTHROPIC_OUTPUT_TPM_LIMIT', 0)
+        }
+        self.max_concurrent = app.config.get('ANTHROPIC_MAX_CONCURRENT', 0)
+        path = app.config.get('ANTHROPIC_RATE_STATE_PATH')
+        if not any(limits.values()):
+            self._store = None
+        elif path:
+            self._store = SQLiteBucketStore(limits, path)
+        else:
+            self._store = MemoryBucketStore(limits)
+        app.extensions[self.extension_name] = self
+
+    @property
+    def enabled(self):
+        return self._store is not None or bool(self.max_concurrent)
+
+    def _dispatch(self):
+        """
+        Grant queued tickets, one user at a time in turn. Called with the lock held.
+
+        Returns:
+            Seconds until the next ticket can be granted, or None if nothing
+            is waiting on the buckets
+        """
+        while self._queues:
+            if self.max_concurrent and self._in_flight >= self.max_concurrent:
+                return None
+            paused = self._paused_until - time.monotonic()
+            if paused > 0:
+                return paused
+            user_key, queue = next(iter(self._queues.items()))
+            ticket = queue[0]
+            wait = self._store.take(ticket.amounts) if self._store is not None else 0
+            if wait > 0:
+                return wait
+            queue.popleft()
+            if queue:
+                self._queues.move_to_end(user_key)
+            else:
+                del self._queues[user_key]
+            self._in_flight += 1
+            ticket.grant()
+        return None
+
+    def _enqueue(self, ticket):
+        with self._lock:
+            self._queues.setdefault(ticket.user_key, deque()).append(ticket)
+
+    def _try_dispatch(self):
+        with self._lock:
+            return self._dispatch()
+
+    def _withdraw(self, ticket):
+        with self._lock:
+            queue = self._queues.get(ticket.user_key)
+            if queue is not None and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[ticket.user_key]
+
+    def _release(self, permit=None):
+        if permit is not None and permit.unused and self._store is not None:
+            self._store.give_back(permit.unused)
+        with self._lock:
+            self._in_flight -= 1
+            self._dispatch()
+
+    @asynccontextmanager
+    async def slot(self, user_key, input_tokens=0, output_tokens=0):
+        """
+        Wait for capacity for one request, then hold it for the ``async with`` block.
+
+        ``input_tokens``/``output_tokens`` are reserved up front (like the
+        API, which counts ``max_tokens`` against the output limit until the
+        response is done); call ``Permit.settle`` with the real usage.
+        """
+        amounts = {'requests': 1, 'input_tokens': input_tokens, 'output_tokens': output_tokens}
+        if self._store is not None:
+            amounts = self._store.clamp(amounts)
+        if not self.enabled:
+            yield Permit(self, amounts)
+            return
+
+        ticket = _Ticket(user_key, amounts)
+        await asyncio.to_thread(self._enqueue, ticket)
+        try:
+            while not ticket.granted:
+                wait = await asyncio.to_thread(self._try_dispatch)
+                if ticket.granted:
+                    break
+                try:
+                    await asyncio.wait_for(asyncio.shield(ticket.future), min(wait or self.MAX_WAIT, self.MAX_WAIT))
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            await asyncio.to_thread(self._withdraw, ticket)
+            if ticket.granted:
+                await asyncio.to_thread(self._release)
+            raise
+
+        permit = Permit(self, amounts)
+        try:
+            yield permit
+        finally:
+            await asyncio.to_thread(self._release, permit)
+
+    def pause(self, seconds):
+        """
+        Hold all calls for ``seconds``, e.g. when the API answered 429 with retry-after.
+
+        The pause applies in this process even with only a concurrency bound;
+        a shared bucket store passes it on to the other workers.
+        """
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        if self._store is not None:
+            self._store.pause(seconds)
+
+    def queue_depth(self, user_key=None):
+        """Calls waiting for a slot and calls in flight, optionally with one user's waiting calls."""
+        with self._lock:
+            depth = {
+                'queued': sum(len(queue) for queue in self._queues.values()),
+                'in_flight': self._in_flight
+            }
+            if user_key is not None:
+                depth['queued_for_user'] = len(self._queues.get(user_key, ()))
+            return depth
@@ -0,0 +1,117 @@
+import re
+import zlib
+import hashlib
+from flask import current_app, has_app_context
+from ..models import DashboardAsset
+from .dashboard_template import DASHBOARD_ASSETS
+
+try:
+    import zstandard
+except ImportError:  # optional: without it templates are stored zlib-compressed
+    zstandard = None
+
+# Dashboard templates (Visualisation.spec) are stored compressed, and the
+# boilerplate prepare_dashboard_template_html injects into every one of them
+# is stored once as a DashboardAsset and referenced from the template by a
+# marker comment. Asset versions are hashes of their content, so a template
+# always expands to exactly the text it was saved with. Expanded asset
+# contents are cached per process; they never change for a given version.
+
+ZSTD_LEVEL = 10
+ZLIB_LEVEL = 9
+ASSET_MARKER = '<!--dynadash-asset:{name}@{version}-->'
+ASSET_MARKER_RE = re.compile(r'<!--dynadash-asset:([\w-]+)@([0-9a-f]+)-->')
+
+_asset_contents = {}
+
+
+def asset_version(content):
+    """Version of an asset: the start of its content's SHA-256."""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+
+def spec_codec():
+    """Codec for new templates: ``SPEC_COMPRESSION`` (zstd or zlib), zlib if zstandard is not installed."""
+    codec = current_app.config.get('SPEC_COMPRESSION', 'zstd') if has_app_context() else 'zlib'
+    return 'zstd' if codec == 'zstd' and zstandard is not None else 'zlib'
+
+
+def compress(text, codec):
+    data = text.encode('utf-8')
+    if codec == 'zstd':
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if codec == 'zlib':
+        return zlib.compress(data, ZLIB_LEVEL)
+    raise ValueError(f'Unknown template codec: {codec}')
+
+
+def decompress(blob, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('This dashboard template is zstd-compressed; install the zstandard package to read it')
+        return zstandard.ZstdDecompressor().decompress(blob).decode('utf-8')
+    if codec == 'zlib':
+        return zlib.decompress(blob).decode('utf-8')
+    raise ValueError(f'Unknown template codec: {codec}')
+
+
+def _asset_content(name, version):
+    key = (name, version)
+    if key not in _asset_contents:
+        asset = DashboardAsset.query.filter_by(name=name, version=version).first()
+        if asset is None:
+            return None
+        _asset_contents[key] = asset.content
+    return _asset_contents[key]
+
+
+def extract_assets(html):
+    """
+    ``html`` with the known boilerplate replaced by asset markers.
+
+    Returns:
+        The reduced text and a list of the ``(name, version, content)`` assets it references
+    """
+    used = []
+    for name, content in DASHBOARD_ASSETS.items():
+        if content in html:
+            version = asset_version(content)
+            html = html.replace(content, ASSET_MARKER.format(name=name, version=version))
+            used.append((name, version, content))
+    return html, used
+
+
+def expand_assets(text):
+    """Replace the asset markers in a stored template by the assets' content."""
+    def expand(match):
+        content = _asset_content(match.group(1), match.group(2))
+        if content is None:
+            current_app.logger.error(f"Dashboard asset {match.group(1)}@{match.group(2)} is missing")
+            return ''
+        return content
+    return ASSET_MARKER_RE.sub(expand, text)
+
+
+def pack_spec(html):
+    """
+    Storage form of a dashboard template; touches no database.
+
+    Returns:
+        ``(blob, codec, assets)``: the values of Visualisation.spec_blob and
+        spec_codec, and the ``(name, version, content)`` assets the blob
+        references, which must be stored with it (models.store_dashboard_assets)
+    """
+    if html is None:
+        return None, None, []
+    text, used = extract_assets(html)
+    for name, version, content in used:
+        _asset_contents[(name, version)] = content
+    codec = spec_codec()
+    return compress(text, codec), codec, used
+
+
+def unpack_spec(blob, codec):
+    """The dashboard template stored as ``(blob, codec)``."""
+    if blob is None:
+        return None
+    return expand_assets(decompress(blob, codec))
@@ -0,0 +1,145 @@
+import json
+import hashlib
+from datetime import datetime
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+from ..models import db, TemplateCacheEntry
+from ..caching import cache
+
+# Generated dashboard templates are stored under a hash of the request that
+# produced them (model, sampling settings, system prompt and the prompt built
+# from the dataset profile, title and description), so generating again for
+# an unchanged schema is answered without calling Claude. Entries are evicted
+# least recently used first once TEMPLATE_CACHE_MAX_ENTRIES or
+# TEMPLATE_CACHE_MAX_MB is exceeded. Hit/miss counters live in the response
+# cache so all workers share them when it is a shared backend.
+
+STATS_KEY_PREFIX = 'template-cache/'
+
+
+def normalize_prompt(text):
+    """Prompt text with indentation and blank lines removed, so formatting changes keep the same key."""
+    lines = (line.strip() for line in text.strip().splitlines())
+    return '\n'.join(line for line in lines if line)
+
+
+def _normalize_content(content):
+    if isinstance(content, str):
+        return normalize_prompt(content)
+    # Content blocks: only the text matters, not e.g. cache_control markers
+    return [normalize_prompt(block['text']) if block.get('type') == 'text' else block for block in content]
+
+
+def template_cache_key(params):
+    """Hex SHA-256 of the normalized Messages API request ``params``."""
+    normalized = {
+        'model': params['model'],
+        'max_tokens': params.get('max_tokens'),
+        'temperature': params.get('temperature'),
+        'system': _normalize_content(params.get('system', '')),
+        'messages': [
+            {'role': message['role'], 'content': _normalize_content(message['content'])}
+            for message in params['messages']
+        ]
+    }
+    payload = json.dumps(normalized, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def template_cache_enabled():
+    return current_app.config.get('TEMPLATE_CACHE_ENABLED', True)
+
+
+def _count(name):
+    try:
+        cache.cache.inc(STATS_KEY_PREFIX + name)  # backend call: atomic where the backend supports it
+    except Exception as e:  # metrics must never break generation
+        current_app.logger.warning(f"Could not update template cache {name} counter: {str(e)}")
+
+
+def get_cached_template(key):
+    """Return the cached template for ``key`` (recording the use), or None."""
+    entry = TemplateCacheEntry.query.filter_by(key=key).first()
+    if entry is None:
+        _count('misses')
+        return None
+    entry.hits += 1
+    entry.last_used_at = datetime.utcnow()
+    db.session.commit()
+    _count('hits')
+    return entry.template
+
+
+def store_template(key, model_name, template):
+    """Save a generated template under ``key``, replacing any previous one, then evict."""
+    entry = TemplateCacheEntry.query.filter_by(key=key).first()
+    if entry is None:
+        entry = TemplateCacheEntry(key=key, hits=0)
+        db.session.add(entry)
+    entry.model_name = model_name
+    entry.template = template
+    entry.size_bytes = len(template.encode('utf-8'))
+    entry.last_used_at = datetime.utcnow()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # The same template was stored concurrently by another job
+        db.session.rollback()
+        return
+    evict()
+
+
+def evict(max_entries=None, max_bytes=None):
+    """
+    Remove least recently used templates beyond the count and size limits.
+
+    Returns:
+        Number of entries removed
+    """
+    if max_entries is None:
+        max_entries = current_app.config.get('TEMPLATE_CACHE_MAX_ENTRIES', 500)
+    if max_bytes is None:
+        max_bytes = int(current_app.config.get('TEMPLATE_CACHE_MAX_MB', 100) * 1024 * 1024)
+
+    rows = db.session.query(TemplateCacheEntry.id, TemplateCacheEntry.size_bytes).order_by(
+        TemplateCacheEntry.last_used_at.desc(), TemplateCacheEntry.id.desc()
+    )
+    kept, total, stale = 0, 0, []
+    for entry_id, size in rows:
+        if kept < max_entries and total + size <= max_bytes:
+            kept += 1
+            total += size
+        else:
+            stale.append(entry_id)
+    if stale:
+        TemplateCacheEntry.query.filter(TemplateCacheEntry.id.in_(stale)).delete(synchronize_session=False)
+        db.session.commit()
+        current_app.logger.info(f"Evicted {len(stale)} cached dashboard templates")
+    return len(stale)
+
+
+def clear_templates():
+    """Remove all cached templates and reset the counters. Returns the number removed."""
+    removed = TemplateCacheEntry.query.delete()
+    db.session.commit()
+    cache.delete_many(STATS_KEY_PREFIX + 'hits', STATS_KEY_PREFIX + 'misses')
+    return removed
+
+
+def template_cache_stats():
+    """Entry count, total size and hit/miss counts of the template cache."""
+    entries, size_bytes, stored_hits = db.session.query(
+        db.func.count(TemplateCacheEntry.id),
+        db.func.coalesce(db.func.sum(TemplateCacheEntry.size_bytes), 0),
+        db.func.coalesce(db.func.sum(TemplateCacheEntry.hits), 0)
+    ).one()
+    hits = cache.get(STATS_KEY_PREFIX + 'hits') or 0
+    misses = cache.get(STATS_KEY_PREFIX + 'misses') or 0
+    return {
+        'entries': entries,
+        'size_bytes': size_bytes,
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / (hits + misses) if hits + misses else None,
+        'hits_on_stored_entries': stored_hits
+    }
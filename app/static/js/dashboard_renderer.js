@@ -6,19 +6,68 @@ document.addEventListener("DOMContentLoaded", function () {
     const loadingIndicator = document.getElementById('dashboard-loading');
     const dashboardError = document.getElementById('dashboard-error');
 
-    // Data and template are now expected to be on the window object
-    // They are injected by app/templates/visual/view.html's head_scripts block
+    // The template is injected by app/templates/visual/view.html's head_scripts block;
+    // the data is fetched from window.dynadashDatasetUrl after the page renders
     const dashboardTemplateHtml = window.dynadashDashboardTemplateHtml; 
-    const actualDatasetData = window.dynadashDatasetJson; 
+    const datasetUrl = window.dynadashDatasetUrl;
+    let actualDatasetData = null;
+    let datasetInfo = null;
+
+    function fetchDataset() {
+        if (!datasetUrl) return Promise.resolve({ info: null, data: [] });
+        // The browser revalidates with If-None-Match, so unchanged data comes back as a 304
+        return fetch(datasetUrl, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+            .then(response => {
+                if (!response.ok) {
+                    return response.json().catch(() => ({})).then(body => {
+                        throw new Error(body.error || `Data request failed (${response.status})`);
+                    });
+                }
+                return response.json();
+            });
+    }
+
+    function showDatasetInfo(info) {
+        const item = document.getElementById('dataset-payload-info');
+        const label = document.getElementById('dataset-payload-rows');
+        if (!item || !label || !info || !info.reduced) return;
+        label.textContent = `${info.rows.toLocaleString()} of ${info.total_rows.toLocaleString()} rows (${info.mode})`;
+        item.style.display = '';
+    }
 
     function buildFullHtml(template, data) {
         if (typeof template !== 'string' || !template) {
             console.error("Dashboard template is missing or not a string.");
             return "<html><body>Error: Dashboard template missing.</body></html>";
         }
-        // Ensure data is an array, default to empty if undefined/null
+        // Ensure data is present, default to empty if undefined/null
         const dataToInject = (typeof data !== 'undefined' && data !== null) ? data : [];
-        const dataScript = `<script>window.dynadashData = ${JSON.stringify(dataToInject)};<\/script>`;
+        // Column-oriented payloads are embedded as-is and expanded inside the frame:
+        // window.dynadashColumns maps names to arrays for charts that take columns,
+        // window.dynadashData holds the row objects the templates expect
+        const payloadJson = JSON.stringify(dataToInject).replace(/</g, '\\u003c');
+        const dataScript = `<script>
+            (function () {
+                var payload = ${payloadJson};
+                window.dynadashDataInfo = ${JSON.stringify(datasetInfo)};
+                if (payload && payload.format === 'columns') {
+                    var names = payload.schema.map(function (field) { return field.name; });
+                    var columns = {};
+                    names.forEach(function (name, j) { columns[name] = payload.columns[j]; });
+                    var rows = new Array(payload.length);
+                    for (var i = 0; i < payload.length; i++) {
+                        var row = {};
+                        for (var j = 0; j < names.length; j++) row[names[j]] = payload.columns[j][i];
+                        rows[i] = row;
+                    }
+                    window.dynadashSchema = payload.schema;
+                    window.dynadashColumns = columns;
+                    window.dynadashData = rows;
+                } else {
+                    window.dynadashData = payload;
+                }
+            })();
+        <\/script>`;
         const chartConfigScript = `
             <script>
                 if (window.Chart) {
@@ -66,7 +115,20 @@ document.addEventListener("DOMContentLoaded", function () {
         dashboardFrame.style.display = 'none';
         if(fullscreenFrame) fullscreenFrame.setAttribute('srcdoc', '');
 
+        fetchDataset()
+            .then(payload => {
+                actualDatasetData = payload.data;
+                datasetInfo = payload.info;
+                showDatasetInfo(datasetInfo);
+                renderDashboard();
+            })
+            .catch(err => {
+                console.error("Error fetching dashboard data:", err);
+                showDashboardError("Could not load the dashboard data: " + err.message);
+            });
+    }
 
+    function renderDashboard() {
         try {
             const fullHtmlContent = buildFullHtml(dashboardTemplateHtml, actualDatasetData);
             
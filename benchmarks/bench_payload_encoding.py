@@ -0,0 +1,82 @@
+"""
+Benchmark dashboard payload encodings.
+
+Usage:
+    python benchmarks/bench_payload_encoding.py [--rows 200000] [--numeric 8] [--text 4] [--repeat 3]
+
+Compares the previous encoding (df.to_dict(orient='records') + json.dumps)
+with the row-record and column-oriented encoders in services/payload_reducer,
+reporting time and payload size.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app.services import payload_reducer  # noqa: E402
+from app.services.payload_reducer import frame_to_records_json, frame_to_columns_json  # noqa: E402
+
+
+def legacy_records(df):
+    return json.dumps(df.to_dict(orient='records'))
+
+
+def make_frame(rows, numeric, text, seed=0):
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(numeric):
+        data[f'measurement_{i}'] = rng.normal(size=rows)
+        data[f'measurement_{i}_outlier'] = rng.random(rows) < 0.01
+    labels = np.array(['north', 'south', 'east', 'west'], dtype=object)
+    for i in range(text):
+        data[f'region_{i}'] = labels[rng.integers(0, len(labels), rows)]
+    data['order_date'] = pd.date_range('2020-01-01', periods=rows, freq='min').strftime('%Y-%m-%d')
+    return pd.DataFrame(data)
+
+
+def best_of(fn, df, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = fn(df)
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(payload)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--numeric', type=int, default=8)
+    parser.add_argument('--text', type=int, default=4)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    df = make_frame(args.rows, args.numeric, args.text)
+    encoders = [
+        ('legacy records (json.dumps)', legacy_records),
+        ('records (pandas)', frame_to_records_json),
+        ('columns', frame_to_columns_json),
+    ]
+    if payload_reducer.orjson is not None:
+        def columns_without_orjson(frame):
+            encoder, payload_reducer.orjson = payload_reducer.orjson, None
+            try:
+                return frame_to_columns_json(frame)
+            finally:
+                payload_reducer.orjson = encoder
+        encoders.append(('columns (no orjson)', columns_without_orjson))
+
+    print(f"{args.rows} rows x {len(df.columns)} columns")
+    baseline_time, baseline_size = best_of(legacy_records, df, args.repeat)
+    for name, fn in encoders:
+        seconds, size = best_of(fn, df, args.repeat)
+        print(f"  {name:28s} {seconds:7.3f}s ({baseline_time / seconds:5.1f}x)  {size / 1e6:7.1f} MB ({size / baseline_size:4.0%})")
+
+
+if __name__ == '__main__':
+    main()
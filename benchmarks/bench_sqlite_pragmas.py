@@ -0,0 +1,127 @@
+"""
+Benchmark SQLite connection profiles under concurrent writes.
+
+Usage:
+    python benchmarks/bench_sqlite_pragmas.py [--threads 8] [--ops 200] [--readers 2]
+
+Each writer thread mimics upload and share traffic: it inserts a dataset
+row, commits, shares it with another user and commits again, while reader
+threads poll the dataset listing as the Socket.IO/HTTP side does. The run is
+repeated on a fresh database file for each profile in models.SQLITE_PROFILES
+and reports committed writes per second, read queries per second and the
+number of "database is locked" failures.
+"""
+import os
+import sys
+import time
+import shutil
+import argparse
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy.exc import OperationalError  # noqa: E402
+from config import config, TestingConfig  # noqa: E402
+from app import create_app, db  # noqa: E402
+from app.models import User, Dataset, Share, SQLITE_PROFILES  # noqa: E402
+
+
+def make_app(path, profile):
+    class BenchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f'sqlite:///{path}'
+        SQLITE_PROFILE = profile
+        # pysqlite's own 5 s lock wait applies to every profile; only the pragmas differ
+        SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 5}}
+
+    config['bench'] = BenchConfig
+    app = create_app('bench')
+    with app.app_context():
+        db.create_all()
+        db.session.add_all([
+            User(name=f'User {i}', email=f'user{i}@example.com', password='password') for i in range(2)
+        ])
+        db.session.commit()
+    return app
+
+
+def writer(app, worker, ops, counts, lock):
+    done, locked = 0, 0
+    with app.app_context():
+        for i in range(ops):
+            try:
+                dataset = Dataset(
+                    user_id=1, filename=f'w{worker}_{i}.csv', original_filename=f'w{worker}_{i}.csv',
+                    file_path=f'/tmp/w{worker}_{i}.csv', file_type='csv', n_rows=10, n_columns=2
+                )
+                db.session.add(dataset)
+                db.session.commit()
+                db.session.add(Share(owner_id=1, target_id=2, object_type='dataset', object_id=dataset.id))
+                db.session.commit()
+                done += 2
+            except OperationalError:
+                db.session.rollback()
+                locked += 1
+        db.session.remove()
+    with lock:
+        counts['writes'] += done
+        counts['locked'] += locked
+
+
+def reader(app, stop, counts, lock):
+    reads = 0
+    with app.app_context():
+        while not stop.is_set():
+            try:
+                Dataset.query.filter_by(user_id=1).order_by(Dataset.id.desc()).limit(20).all()
+                reads += 1
+            except OperationalError:
+                db.session.rollback()
+                with lock:
+                    counts['locked'] += 1
+            db.session.rollback()  # end the read transaction, as a finished request does
+        db.session.remove()
+    with lock:
+        counts['reads'] += reads
+
+
+def run(profile, threads, ops, readers):
+    tmp_dir = tempfile.mkdtemp()
+    try:
+        app = make_app(os.path.join(tmp_dir, 'bench.db'), profile)
+        counts, lock, stop = {'writes': 0, 'reads': 0, 'locked': 0}, threading.Lock(), threading.Event()
+        writers = [threading.Thread(target=writer, args=(app, w, ops, counts, lock)) for w in range(threads)]
+        polling = [threading.Thread(target=reader, args=(app, stop, counts, lock)) for _ in range(readers)]
+        start = time.perf_counter()
+        for thread in polling + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for thread in polling:
+            thread.join()
+        with app.app_context():
+            db.engine.dispose()
+        return elapsed, counts
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--ops', type=int, default=200, help='uploads (each followed by a share) per writer thread')
+    parser.add_argument('--readers', type=int, default=2)
+    args = parser.parse_args()
+
+    print(f"{args.threads} writers x {args.ops} uploads+shares, {args.readers} readers")
+    print(f"{'profile':<12} {'seconds':>8} {'writes/s':>10} {'reads/s':>10} {'locked':>7}")
+    for profile in SQLITE_PROFILES:
+        elapsed, counts = run(profile, args.threads, args.ops, args.readers)
+        print(f"{profile:<12} {elapsed:>8.2f} {counts['writes'] / elapsed:>10.0f} "
+              f"{counts['reads'] / elapsed:>10.0f} {counts['locked']:>7}")
+
+
+if __name__ == '__main__':
+    main()
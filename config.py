@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -12,18 +13,96 @@ class Config:
     # SQLAlchemy settings
     SQLALCHEMY_DATABASE_URI = os.getenv('DYNA_SQLITE_PATH', 'sqlite:///dynadash.db')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # SQLite connection tuning (see SQLITE_PROFILES in models): 'performance'
+    # (WAL, synchronous=NORMAL, busy timeout, mmap, larger page cache) or
+    # 'default' for SQLite's own settings; SQLITE_PRAGMAS overrides single pragmas
+    SQLITE_PROFILE = os.getenv('DYNA_SQLITE_PROFILE', 'performance')
+    SQLITE_PRAGMAS = {}
     
     # File upload settings
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
-    MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max file size
-    
+    # Large CSVs are cleaned in bounded-memory chunks, so the limit can be raised
+    MAX_CONTENT_LENGTH = int(os.getenv('DYNA_MAX_UPLOAD_MB', 50)) * 1024 * 1024  # 50MB max file size by default
+
+    # Columnar sidecar (<file>.cols/) read instead of re-parsing CSV/JSON text
+    COLUMN_STORE_ENABLED = os.getenv('DYNA_COLUMN_STORE', 'true').lower() == 'true'
+
+    # Chunked CSV ingestion: files at or above the threshold are cleaned in
+    # INGEST_CHUNK_ROWS-row blocks instead of being loaded whole
+    INGEST_CHUNKED_THRESHOLD = int(os.getenv('DYNA_INGEST_CHUNKED_THRESHOLD_MB', 20)) * 1024 * 1024
+    INGEST_CHUNK_ROWS = 50000
+    INGEST_QUANTILE_SAMPLE = 100000  # reservoir size per numeric column (exact below this)
+    INGEST_MODE_MAX_DISTINCT = 200000  # distinct values tracked per text column
+
+    # Dashboard data payloads: datasets are reduced (see services/payload_reducer)
+    # to at most PAYLOAD_MAX_ROWS rows and roughly PAYLOAD_MAX_MB of JSON
+    PAYLOAD_MAX_ROWS = int(os.getenv('DYNA_PAYLOAD_MAX_ROWS', 20000))
+    PAYLOAD_MAX_MB = float(os.getenv('DYNA_PAYLOAD_MAX_MB', 5))
+    # Compression of cacheable responses (brotli is used when the package is installed)
+    GZIP_LEVEL = 6
+    BROTLI_QUALITY = 5
+    # Per-user API response cache (see app/caching); entries are invalidated
+    # explicitly when data changes, so the timeout only bounds memory use
+    API_CACHE_TIMEOUT = int(os.getenv('DYNA_API_CACHE_TIMEOUT', 3600))
+    # Cache backend: simple (per process), filesystem, sqlite or redis. Use a
+    # shared one when running several workers so invalidation reaches all of them
+    CACHE_TYPE = os.getenv('DYNA_CACHE_TYPE', 'simple')
+    CACHE_DEFAULT_TIMEOUT = 300
+    CACHE_THRESHOLD = int(os.getenv('DYNA_CACHE_THRESHOLD', 5000))
+    CACHE_KEY_PREFIX = 'dynadash/'
+    CACHE_DIR = os.getenv('DYNA_CACHE_DIR')  # filesystem; defaults to instance/cache
+    CACHE_SQLITE_PATH = os.getenv('DYNA_CACHE_SQLITE_PATH')  # sqlite; defaults to instance/cache.sqlite3
+    CACHE_REDIS_URL = os.getenv('DYNA_CACHE_REDIS_URL', 'redis://localhost:6379/0')  # redis (needs the redis package)
+    # Stored dashboard templates are compressed with zstd (needs the zstandard
+    # package, zlib otherwise) or zlib, see services/spec_storage
+    SPEC_COMPRESSION = os.getenv('DYNA_SPEC_COMPRESSION', 'zstd')
+    # Listing APIs are keyset-paginated (see app/pagination): ?limit= rows per
+    # page, defaulting to PAGE_SIZE and capped at PAGE_SIZE_MAX
+    PAGE_SIZE = int(os.getenv('DYNA_PAGE_SIZE', 50))
+    PAGE_SIZE_MAX = int(os.getenv('DYNA_PAGE_SIZE_MAX', 100))
+
     # Anthropic Claude API settings
     ANTHROPIC_API_KEY = os.getenv('ANTHROPIC_API_KEY')
     print("Loaded key:", ANTHROPIC_API_KEY)
+    # Claude requests share one HTTP connection pool on the job queue's event
+    # loop; transient errors back off exponentially (with jitter) from
+    # ANTHROPIC_RETRY_DELAY up to ANTHROPIC_RETRY_MAX_DELAY seconds unless
+    # the API sends retry-after
+    ANTHROPIC_MAX_CONNECTIONS = int(os.getenv('DYNA_ANTHROPIC_MAX_CONNECTIONS', 20))
+    ANTHROPIC_MAX_RETRIES = int(os.getenv('DYNA_ANTHROPIC_MAX_RETRIES', 3))
+    ANTHROPIC_RETRY_DELAY = 5
+    ANTHROPIC_RETRY_MAX_DELAY = 60
+    # Rate governor (see services/rate_governor): calls wait for capacity
+    # instead of hitting 429s. Set the limits to the account's tier; 0 turns
+    # a limit off (the defaults only bound concurrency). With
+    # ANTHROPIC_RATE_STATE_PATH the budgets are shared by all worker
+    # processes on the host.
+    ANTHROPIC_RPM_LIMIT = int(os.getenv('DYNA_ANTHROPIC_RPM_LIMIT', 0))
+    ANTHROPIC_INPUT_TPM_LIMIT = int(os.getenv('DYNA_ANTHROPIC_INPUT_TPM_LIMIT', 0))
+    ANTHROPIC_OUTPUT_TPM_LIMIT = int(os.getenv('DYNA_ANTHROPIC_OUTPUT_TPM_LIMIT', 0))
+    ANTHROPIC_MAX_CONCURRENT = int(os.getenv('DYNA_ANTHROPIC_MAX_CONCURRENT', 8))
+    ANTHROPIC_RATE_STATE_PATH = os.getenv('DYNA_ANTHROPIC_RATE_STATE_PATH')
+    ANTHROPIC_BASE_URL = os.getenv('ANTHROPIC_BASE_URL')  # e.g. a proxy or a local fake for tests
+    # Stream dashboard generation: token progress and early abort of malformed output
+    ANTHROPIC_STREAM = os.getenv('DYNA_ANTHROPIC_STREAM', 'true').lower() == 'true'
+    ANTHROPIC_EXPECTED_DASHBOARD_TOKENS = 8000  # typical dashboard size, for progress
+    # Mark the fixed dashboard instructions as a prompt cache prefix, so
+    # repeated generations within the cache lifetime read them at reduced cost
+    ANTHROPIC_PROMPT_CACHING = os.getenv('DYNA_ANTHROPIC_PROMPT_CACHING', 'true').lower() == 'true'
+    # Generated templates are reused for identical prompts and model settings
+    # (see services/template_cache), least recently used evicted first
+    TEMPLATE_CACHE_ENABLED = os.getenv('DYNA_TEMPLATE_CACHE', 'true').lower() == 'true'
+    TEMPLATE_CACHE_MAX_ENTRIES = int(os.getenv('DYNA_TEMPLATE_CACHE_MAX_ENTRIES', 500))
+    TEMPLATE_CACHE_MAX_MB = float(os.getenv('DYNA_TEMPLATE_CACHE_MAX_MB', 100))
     
     # Socket.IO settings
     SOCKETIO_ASYNC_MODE = 'threading'
     
+    # Background jobs (dashboard generation runs off the request thread)
+    JOB_WORKERS = int(os.getenv('DYNA_JOB_WORKERS', 4))
+    INGEST_WORKERS = int(os.getenv('DYNA_INGEST_WORKERS', 2))  # upload cleaning processes
+    JOBS_EAGER = False  # run jobs inline in the submitting request
+    
     @staticmethod
     def init_app(app):
         """Initialize application with this configuration."""
@@ -49,9 +128,11 @@ class TestingConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     WTF_CSRF_ENABLED = False
+    JOBS_EAGER = True
+    CACHE_TYPE = 'simple'
     
-    # Use a temporary folder for uploads during testing
-    UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests', 'uploads')
+    # Uploads made by tests go to a temporary folder, never into the source tree
+    UPLOAD_FOLDER = os.path.join(tempfile.gettempdir(), 'dynadash-test-uploads')
 
 class ProductionConfig(Config):
     """Production configuration."""
@@ -0,0 +1,240 @@
+"""compress visualisation spec
+
+Revision ID: b7f3c9a1d256
+Revises: e1c5a7b3d920
+Create Date: 2026-10-18 18:42:07.513920
+
+"""
+from alembic import op
+import re
+import zlib
+import hashlib
+import sqlalchemy as sa
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7f3c9a1d256'
+down_revision = 'e1c5a7b3d920'
+branch_labels = None
+depends_on = None
+
+
+# Frozen copies of services/spec_storage and the boilerplate as of this
+# revision, so later changes to the application cannot change what it does
+ASSET_MARKER = '<!--dynadash-asset:{name}@{version}-->'
+ASSET_MARKER_RE = re.compile(r'<!--dynadash-asset:([\w-]+)@([0-9a-f]+)-->')
+
+RESPONSIVE_CSS = """
+<style>
+    html, body { width: 100% !important; height: 100% !important; margin: 0 !important; padding: 0 !important; overflow-x: hidden !important; box-sizing: border-box !important; }
+    *, *:before, *:after { box-sizing: inherit !important; }
+    #dashboard-content, #root, #app, main, .main, .dashboard, .dashboard-main,
+    .container, .container-fluid, .row, .grid, div[class*="container"], section, article, .card, .panel, .box {
+        width: 100% !important; max-width: 100% !important; margin-left: auto !important; margin-right: auto !important;
+    }
+    canvas, svg, .chart, div[class*="chart"] { width: 100% !important; max-width: 100% !important; height: auto !important; }
+    img, table { max-width: 100% !important; height: auto !important; }
+</style>
+"""
+
+ERROR_HANDLING_SCRIPT = """
+<script>
+    window.addEventListener('error', function(event) {
+        console.error('Dashboard error:', event.message, 'at', event.filename, ':', event.lineno);
+        var errorDisplay = document.getElementById('dynadashInternalErrorDisplay');
+        if (!errorDisplay && document.body) {
+            errorDisplay = document.createElement('div');
+            errorDisplay.id = 'dynadashInternalErrorDisplay';
+            errorDisplay.style.cssText = 'position:fixed;top:5px;left:5px;right:5px;padding:10px;background:rgba(220,50,50,0.9);color:white;border-radius:4px;z-index:20000;font-family:sans-serif;font-size:14px;';
+            document.body.insertBefore(errorDisplay, document.body.firstChild);
+        }
+        if(errorDisplay) errorDisplay.textContent = 'Dashboard Error: ' + event.message + ' (in ' + (event.filename || 'inline script') + ':' + event.lineno + ')';
+    });
+    document.addEventListener('DOMContentLoaded', function() {
+        if (typeof window.dynadashData === 'undefined' || window.dynadashData === null || (Array.isArray(window.dynadashData) && window.dynadashData.length === 0)) {
+            console.warn('window.dynadashData is not defined or is empty. Dashboard might not render correctly.');
+            var dataWarningDiv = document.getElementById('dynadashDataWarningDisplay');
+            if(!dataWarningDiv && document.body) {
+                dataWarningDiv = document.createElement('div');
+                dataWarningDiv.id = 'dynadashDataWarningDisplay';
+                dataWarningDiv.style.cssText = 'padding:10px;background:rgba(255,220,50,0.8);color:black;text-align:center;font-family:sans-serif;font-size:14px;';
+                dataWarningDiv.textContent = 'Notice: Data for this dashboard (window.dynadashData) was not loaded or is empty. Visualizations may not appear as expected.';
+                document.body.insertBefore(dataWarningDiv, document.body.firstChild);
+            }
+        }
+        setTimeout(function() {
+            if (typeof Chart !== 'undefined' && typeof window.dynadashData !== 'undefined') {
+                var canvases = document.querySelectorAll('canvas');
+                canvases.forEach(function(canvas) {
+                    try {
+                        var chartInstance = Chart.getChart(canvas); 
+                        if (chartInstance) { chartInstance.update('none'); } 
+                    } catch(e) { console.warn('Could not update chart on canvas ' + (canvas.id || '(no id)') + ':', e); }
+                });
+            }
+        }, 1200);
+    });
+</script>
+"""
+
+# The indented copy ClaudeClient._sanitize_dashboard_html used to add instead
+LEGACY_ERROR_HANDLING_SCRIPT = """
+            <script>
+            window.addEventListener('error', function(event) {
+                console.error('Dashboard error:', event.message, 'at', event.filename, ':', event.lineno);
+                var errorDisplay = document.getElementById('dynadashInternalErrorDisplay');
+                if (!errorDisplay && document.body) {
+                    errorDisplay = document.createElement('div');
+                    errorDisplay.id = 'dynadashInternalErrorDisplay';
+                    errorDisplay.style.cssText = 'position:fixed;top:5px;left:5px;right:5px;padding:10px;background:rgba(220,50,50,0.9);color:white;border-radius:4px;z-index:20000;font-family:sans-serif;font-size:14px;';
+                    document.body.insertBefore(errorDisplay, document.body.firstChild);
+                }
+                if(errorDisplay) errorDisplay.textContent = 'Dashboard Error: ' + event.message + ' (in ' + (event.filename || 'inline script') + ':' + event.lineno + ')';
+            });
+            document.addEventListener('DOMContentLoaded', function() {
+                if (typeof window.dynadashData === 'undefined' || window.dynadashData === null || (Array.isArray(window.dynadashData) && window.dynadashData.length === 0)) {
+                    console.warn('window.dynadashData is not defined or is empty. Dashboard might not render correctly.');
+                    var dataWarningDiv = document.getElementById('dynadashDataWarningDisplay');
+                    if(!dataWarningDiv && document.body) {
+                        dataWarningDiv = document.createElement('div');
+                        dataWarningDiv.id = 'dynadashDataWarningDisplay';
+                        dataWarningDiv.style.cssText = 'padding:10px;background:rgba(255,220,50,0.8);color:black;text-align:center;font-family:sans-serif;font-size:14px;';
+                        dataWarningDiv.textContent = 'Notice: Data for this dashboard (window.dynadashData) was not loaded or is empty. Visualizations may not appear as expected.';
+                        document.body.insertBefore(dataWarningDiv, document.body.firstChild);
+                    }
+                }
+                setTimeout(function() {
+                    if (typeof Chart !== 'undefined' && typeof window.dynadashData !== 'undefined') {
+                        var canvases = document.querySelectorAll('canvas');
+                        canvases.forEach(function(canvas) {
+                            try {
+                                var chartInstance = Chart.getChart(canvas); 
+                                if (chartInstance) { chartInstance.update('none'); } 
+                            } catch(e) { console.warn('Could not update chart on canvas ' + (canvas.id || '(no id)') + ':', e); }
+                        });
+                    }
+                }, 1200);
+            });
+            </script>
+            """
+
+ASSETS = [
+    ('error-handler', ERROR_HANDLING_SCRIPT),
+    ('error-handler', LEGACY_ERROR_HANDLING_SCRIPT),
+    ('responsive-css', RESPONSIVE_CSS)
+]
+
+
+def asset_version(content):
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()[:16]
+
+
+def extract_assets(html):
+    used = []
+    for name, content in ASSETS:
+        if content in html:
+            version = asset_version(content)
+            html = html.replace(content, ASSET_MARKER.format(name=name, version=version))
+            used.append((name, version, content))
+    return html, used
+
+
+def decompress(blob, codec):
+    if codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError('Install the zstandard package to downgrade zstd-compressed templates')
+        return zstandard.ZstdDecompressor().decompress(blob).decode('utf-8')
+    return zlib.decompress(blob).decode('utf-8')
+
+
+visualisation = sa.table(
+    'visualisation',
+    sa.column('id', sa.Integer),
+    sa.column('spec', sa.Text),
+    sa.column('spec_blob', sa.LargeBinary),
+    sa.column('spec_codec', sa.String)
+)
+dashboard_asset = sa.table(
+    'dashboard_asset',
+    sa.column('name', sa.String),
+    sa.column('version', sa.String),
+    sa.column('content', sa.Text)
+)
+
+
+def upgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('dashboard_asset',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.String(length=16), nullable=False),
+    sa.Column('content', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('name', 'version', name='uq_dashboard_asset_name_version')
+    )
+    with op.batch_alter_table('visualisation', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('spec_blob', sa.LargeBinary(), nullable=True))
+        batch_op.add_column(sa.Column('spec_codec', sa.String(length=8), nullable=True))
+
+    # ### end Alembic commands ###
+
+    # Existing templates are stored zlib-compressed (always available), with
+    # their boilerplate moved to dashboard_asset
+    conn = op.get_bind()
+    stored_assets = set()
+    for row in conn.execute(sa.select(visualisation.c.id, visualisation.c.spec)).fetchall():
+        text, used = extract_assets(row.spec or '')
+        for name, version, content in used:
+            if (name, version) not in stored_assets:
+                conn.execute(dashboard_asset.insert().values(name=name, version=version, content=content))
+                stored_assets.add((name, version))
+        conn.execute(visualisation.update().where(visualisation.c.id == row.id).values(
+            spec_blob=zlib.compress(text.encode('utf-8'), 9), spec_codec='zlib'
+        ))
+
+    # Batch mode recreates visualisation, and dropping the old table with
+    # SQLite foreign keys on clears every generation_job.visualisation_id.
+    # The pragma is ignored inside a transaction, hence the autocommit blocks.
+    with op.get_context().autocommit_block():
+        op.execute('PRAGMA foreign_keys=OFF')
+    with op.batch_alter_table('visualisation', schema=None) as batch_op:
+        batch_op.alter_column('spec_blob', existing_type=sa.LargeBinary(), nullable=False)
+        batch_op.alter_column('spec_codec', existing_type=sa.String(length=8), nullable=False)
+        batch_op.drop_column('spec')
+    with op.get_context().autocommit_block():
+        op.execute('PRAGMA foreign_keys=ON')
+
+
+def downgrade():
+    with op.batch_alter_table('visualisation', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('spec', sa.Text(), nullable=True))
+
+    conn = op.get_bind()
+    assets = {
+        (row.name, row.version): row.content
+        for row in conn.execute(sa.select(dashboard_asset.c.name, dashboard_asset.c.version, dashboard_asset.c.content))
+    }
+    rows = conn.execute(sa.select(visualisation.c.id, visualisation.c.spec_blob, visualisation.c.spec_codec)).fetchall()
+    for row in rows:
+        text = decompress(row.spec_blob, row.spec_codec)
+        html = ASSET_MARKER_RE.sub(lambda match: assets.get((match.group(1), match.group(2)), ''), text)
+        conn.execute(visualisation.update().where(visualisation.c.id == row.id).values(spec=html))
+
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.get_context().autocommit_block():
+        op.execute('PRAGMA foreign_keys=OFF')
+    with op.batch_alter_table('visualisation', schema=None) as batch_op:
+        batch_op.alter_column('spec', existing_type=sa.Text(), nullable=False)
+        batch_op.drop_column('spec_codec')
+        batch_op.drop_column('spec_blob')
+    with op.get_context().autocommit_block():
+        op.execute('PRAGMA foreign_keys=ON')
+
+    op.drop_table('dashboard_asset')
+    # ### end Alembic commands ###
@@ -1,6 +1,8 @@
 import unittest
 import json
 import io
+import shutil
+import tempfile
 from app import create_app, db
 from app.models import User, Dataset, Visualisation, Share
 
@@ -13,6 +15,8 @@ class APITestCase(unittest.TestCase):
         self.app_context = self.app.app_context()
         self.app_context.push()
         db.create_all()
+        self.test_upload_dir = tempfile.mkdtemp()
+        self.app.config['UPLOAD_FOLDER'] = self.test_upload_dir
         
         # Create a test client
         self.client = self.app.test_client()
@@ -35,6 +39,7 @@ class APITestCase(unittest.TestCase):
         db.session.remove()
         db.drop_all()
         self.app_context.pop()
+        shutil.rmtree(self.test_upload_dir, ignore_errors=True)
     
     def test_get_datasets(self):
         """Test the GET /api/v1/datasets endpoint."""
@@ -0,0 +1,126 @@
+import json
+import unittest
+from app import create_app, db
+from app.models import User, Dataset, Visualisation, Share
+
+class ApiCacheTestCase(unittest.TestCase):
+    """Test cases for the per-user API response cache."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+        self.client.testing = True
+
+        self.user = User(name='Test User', email='test@example.com', password='password')
+        self.other_user = User(name='Other User', email='other@example.com', password='password')
+        db.session.add_all([self.user, self.other_user])
+        db.session.commit()
+
+        self.dataset = Dataset(
+            user_id=self.user.id, filename='data.csv', original_filename='data.csv',
+            file_path='/nonexistent/data.csv', file_type='csv', n_rows=2, n_columns=2
+        )
+        db.session.add(self.dataset)
+        db.session.commit()
+        self.visualisation = Visualisation(dataset_id=self.dataset.id, title='Dash', spec='<html></html>')
+        db.session.add(self.visualisation)
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _login(self, email='test@example.com'):
+        self.client.post('/auth/api/v1/logout')
+        response = self.client.post('/auth/api/v1/login', json={'email': email, 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+
+    def _get(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return json.loads(response.data)
+
+    def test_listings_are_cached_per_user(self):
+        """Users never receive each other's cached listings."""
+        self._login()
+        self.assertEqual(len(self._get('/data/api/v1/datasets')['datasets']), 1)
+        self.assertEqual(len(self._get('/visual/api/v1/visualisations')['visualisations']), 1)
+
+        self._login('other@example.com')
+        self.assertEqual(self._get('/data/api/v1/datasets')['datasets'], [])
+        self.assertEqual(self._get('/visual/api/v1/visualisations')['visualisations'], [])
+
+    def test_responses_are_served_from_cache(self):
+        """Changes made without an invalidation hook are not seen until the entry expires."""
+        self._login()
+        self._get('/data/api/v1/datasets')
+        self.dataset.original_filename = 'renamed.csv'
+        db.session.commit()
+        self.assertEqual(self._get('/data/api/v1/datasets')['datasets'][0]['filename'], 'data.csv')
+
+    def test_share_and_unshare_invalidate_target(self):
+        """Sharing and unsharing update the target's shared listings."""
+        self._login('other@example.com')
+        self.assertEqual(self._get('/data/api/v1/shared-datasets')['datasets'], [])
+        self.assertEqual(self._get('/visual/api/v1/shared-visualisations')['visualisations'], [])
+        self.assertEqual(self.client.get(f'/visual/api/v1/visualisations/{self.visualisation.id}').status_code, 403)
+
+        self._login()
+        self.client.post(f'/data/share/{self.dataset.id}', data={'user_id': self.other_user.id})
+        self.client.post(f'/visual/share/{self.visualisation.id}', data={'user_id': self.other_user.id})
+        self.assertEqual(Share.query.count(), 2)
+
+        self._login('other@example.com')
+        self.assertEqual(len(self._get('/data/api/v1/shared-datasets')['datasets']), 1)
+        self.assertEqual(len(self._get('/visual/api/v1/shared-visualisations')['visualisations']), 1)
+        self.assertEqual(self._get(f'/visual/api/v1/visualisations/{self.visualisation.id}')['title'], 'Dash')
+
+        self._login()
+        self.client.post(f'/data/unshare/{self.dataset.id}/{self.other_user.id}')
+        self.client.post(f'/visual/unshare/{self.visualisation.id}/{self.other_user.id}')
+
+        self._login('other@example.com')
+        self.assertEqual(self._get('/data/api/v1/shared-datasets')['datasets'], [])
+        self.assertEqual(self._get('/visual/api/v1/shared-visualisations')['visualisations'], [])
+        self.assertEqual(self.client.get(f'/visual/api/v1/visualisations/{self.visualisation.id}').status_code, 403)
+
+    def test_toggle_public_invalidates_dashboards(self):
+        """Making a dataset public updates listings and opens its dashboards to other users."""
+        self._login('other@example.com')
+        self.assertEqual(self.client.get(f'/visual/api/v1/visualisations/{self.visualisation.id}').status_code, 403)
+
+        self._login()
+        self.assertFalse(self._get('/data/api/v1/datasets')['datasets'][0]['is_public'])
+        self.client.post(f'/data/toggle-public/{self.dataset.id}')
+        self.assertTrue(self._get('/data/api/v1/datasets')['datasets'][0]['is_public'])
+
+        self._login('other@example.com')
+        self.assertEqual(self._get(f'/visual/api/v1/visualisations/{self.visualisation.id}')['title'], 'Dash')
+
+    def test_delete_invalidates_listings(self):
+        """Deleted datasets and dashboards disappear from cached listings."""
+        self._login()
+        self.assertEqual(len(self._get('/visual/api/v1/visualisations')['visualisations']), 1)
+        self.client.post(f'/visual/delete/{self.visualisation.id}')
+        self.assertEqual(self._get('/visual/api/v1/visualisations')['visualisations'], [])
+
+        self.assertEqual(len(self._get('/data/api/v1/datasets')['datasets']), 1)
+        self.client.post(f'/data/delete/{self.dataset.id}')
+        self.assertEqual(self._get('/data/api/v1/datasets')['datasets'], [])
+
+    def test_data_options_invalidate_dashboard(self):
+        """Updating a dashboard's data options is visible through the API at once."""
+        self._login()
+        self.assertIsNone(self._get(f'/visual/api/v1/visualisations/{self.visualisation.id}')['data_options'])
+        response = self.client.put(f'/visual/api/v1/visualisations/{self.visualisation.id}/data-options', json={'mode': 'uniform'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._get(f'/visual/api/v1/visualisations/{self.visualisation.id}')['data_options']['mode'], 'uniform')
+
+if __name__ == '__main__':
+    unittest.main()
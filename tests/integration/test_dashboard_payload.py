@@ -0,0 +1,165 @@
+import os
+import gzip
+import json
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from app import create_app, db
+from app.models import User, Dataset, Visualisation
+from app.caching import cache
+from app.services.cleaning import clean_frame
+from app.services.column_store import load_dataset_frame
+from app.services.profiling import profile_frame
+
+class DashboardPayloadTestCase(unittest.TestCase):
+    """Test cases for reduced dashboard data payloads."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app('testing')
+        self.app.config['PAYLOAD_MAX_ROWS'] = 500
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+        self.client.testing = True
+        self.test_upload_dir = tempfile.mkdtemp()
+
+        self.user = User(name='Test User', email='test@example.com', password='password')
+        self.other_user = User(name='Other User', email='other@example.com', password='password')
+        db.session.add_all([self.user, self.other_user])
+        db.session.commit()
+
+        rng = np.random.default_rng(0)
+        df = clean_frame(pd.DataFrame({
+            'value': rng.normal(size=2000),
+            'region': rng.choice(['north', 'south'], 2000),
+        }))
+        file_path = os.path.join(self.test_upload_dir, 'data.csv')
+        df.to_csv(file_path, index=False)
+        self.dataset = Dataset(
+            user_id=self.user.id, filename='data.csv', original_filename='data.csv', file_path=file_path,
+            file_type='csv', n_rows=len(df), n_columns=len(df.columns), profile=profile_frame(df)
+        )
+        db.session.add(self.dataset)
+        db.session.commit()
+        self.visualisation = Visualisation(dataset_id=self.dataset.id, title='Dash', spec='<html><body></body></html>')
+        db.session.add(self.visualisation)
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.test_upload_dir, ignore_errors=True)
+
+    def _login(self, email='test@example.com'):
+        response = self.client.post('/auth/api/v1/login', json={'email': email, 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_view_does_not_inline_data(self):
+        """The dashboard page only points at the data endpoint."""
+        self._login()
+        response = self.client.get(f'/visual/view/{self.visualisation.id}')
+        self.assertEqual(response.status_code, 200)
+        page = response.data.decode()
+        self.assertNotIn('dynadashDatasetJson', page)
+        self.assertIn(f'/visual/api/v1/visualisations/{self.visualisation.id}/data', page)
+
+        # The page shell is revalidated independently of the data
+        again = self.client.get(f'/visual/view/{self.visualisation.id}', headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(again.status_code, 304)
+
+    def test_data_endpoint_returns_reduced_payload(self):
+        """The data endpoint carries at most PAYLOAD_MAX_ROWS rows and describes the reduction."""
+        self._login()
+        response = self.client.get(f'/visual/api/v1/visualisations/{self.visualisation.id}/data')
+        self.assertEqual(response.status_code, 200)
+        payload = json.loads(response.data)
+        self.assertEqual(payload['data']['format'], 'columns')
+        self.assertEqual(payload['data']['length'], 500)
+        self.assertEqual([field['name'] for field in payload['data']['schema']], ['value', 'region', 'value_outlier'])
+        self.assertEqual(len(payload['data']['columns'][1]), 500)
+        self.assertEqual(payload['info'], {'mode': 'auto', 'total_rows': 2000, 'rows': 500, 'reduced': True})
+        self.assertEqual(response.headers['Cache-Control'], 'private, no-cache')
+
+        records = json.loads(self.client.get(f'/visual/api/v1/visualisations/{self.visualisation.id}/data?format=records').data)
+        self.assertEqual(len(records['data']), 500)
+        self.assertEqual(set(records['data'][0]), {'value', 'region', 'value_outlier'})
+        self.assertEqual(self.client.get(f'/visual/api/v1/visualisations/{self.visualisation.id}/data?format=xml').status_code, 400)
+
+    def test_data_endpoint_conditional_and_compressed(self):
+        """Unchanged data is a 304; gzip is used when accepted; option changes change the ETag."""
+        self._login()
+        url = f'/visual/api/v1/visualisations/{self.visualisation.id}/data'
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(json.loads(gzip.decompress(response.data))['data']['length'], 500)
+
+        etag = response.headers['ETag']
+        self.assertEqual(self.client.get(url, headers={'If-None-Match': etag}).status_code, 304)
+        self.assertNotIn('Last-Modified', response.headers)
+
+        self.client.put(f'{url}-options', json={'mode': 'uniform', 'max_rows': 10})
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data)['data']['length'], 10)
+        # A client revalidating by date alone must not keep the data of the old options
+        response = self.client.get(url, headers={'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_data_endpoint_permissions(self):
+        """Other users cannot fetch private dashboard data."""
+        self._login('other@example.com')
+        response = self.client.get(f'/visual/api/v1/visualisations/{self.visualisation.id}/data')
+        self.assertEqual(response.status_code, 403)
+
+    def test_payload_is_built_once_for_all_users(self):
+        """Dashboard data is cached by dataset and options, not per user, and rebuilt when the options change."""
+        self.dataset.is_public = True
+        db.session.commit()
+        url = f'/visual/api/v1/visualisations/{self.visualisation.id}'
+        with patch('app.blueprints.visual.routes.load_dataset_frame', wraps=load_dataset_frame) as load:
+            self._login()
+            self.assertEqual(len(json.loads(self.client.get(url).data)['actual_dataset']), 500)
+            self.client.post('/auth/api/v1/logout')
+            self._login('other@example.com')
+            self.assertEqual(len(json.loads(self.client.get(url).data)['actual_dataset']), 500)
+            self.assertEqual(load.call_count, 1)
+
+            self.client.post('/auth/api/v1/logout')
+            self._login()
+            self.client.put(f'{url}/data-options', json={'mode': 'uniform', 'max_rows': 10})
+            self.assertEqual(len(json.loads(self.client.get(url).data)['actual_dataset']), 10)
+            self.assertEqual(load.call_count, 2)
+        self.assertFalse([key for key in cache.cache._cache if 'api/' in key])
+
+    def test_data_options_endpoint(self):
+        """Owners can set per-visualisation options; bad options and other users are rejected."""
+        self._login()
+        url = f'/visual/api/v1/visualisations/{self.visualisation.id}/data-options'
+        response = self.client.put(url, json={'mode': 'aggregate', 'group_by': 'region'})
+        self.assertEqual(response.status_code, 200)
+
+        data = json.loads(self.client.get(f'/visual/api/v1/visualisations/{self.visualisation.id}').data)
+        self.assertEqual(data['dataset_payload']['mode'], 'aggregate')
+        self.assertEqual(sorted(row['region'] for row in data['actual_dataset']), ['north', 'south'])
+
+        data = json.loads(self.client.get(f'/visual/api/v1/visualisations/{self.visualisation.id}?format=columns').data)
+        self.assertEqual(data['actual_dataset']['schema'][0], {'name': 'region', 'type': 'string'})
+        self.assertEqual(sorted(data['actual_dataset']['columns'][0]), ['north', 'south'])
+
+        self.assertEqual(self.client.put(url, json={'mode': 'stratified', 'stratify_by': 'nope'}).status_code, 400)
+        self.assertEqual(self.client.put(url, json={'mode': 'magic'}).status_code, 400)
+
+        self.client.get('/auth/logout')
+        self._login('other@example.com')
+        self.assertEqual(self.client.put(url, json={'mode': 'uniform'}).status_code, 403)
+
+if __name__ == '__main__':
+    unittest.main()
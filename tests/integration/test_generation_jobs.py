@@ -0,0 +1,140 @@
+import unittest
+import json
+from unittest.mock import patch, AsyncMock, ANY
+from app import create_app, db
+from app.models import User, Dataset, Visualisation, GenerationJob
+from app.services import claude_service, job_queue
+
+class GenerationJobsTestCase(unittest.TestCase):
+    """Test cases for background dashboard generation jobs."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+        self.client.testing = True
+
+        self.user = User(name='Test User', email='test@example.com', password='password')
+        self.other_user = User(name='Other User', email='other@example.com', password='password')
+        db.session.add_all([self.user, self.other_user])
+        db.session.commit()
+
+        self.dataset = Dataset(
+            user_id=self.user.id,
+            filename='test_dataset.csv',
+            original_filename='test_dataset.csv',
+            file_path='/path/to/test_dataset.csv',
+            file_type='csv',
+            n_rows=100,
+            n_columns=5,
+            is_public=False
+        )
+        db.session.add(self.dataset)
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        job_queue.eager = True
+
+    def _login(self, email='test@example.com'):
+        response = self.client.post('/auth/api/v1/login', json={'email': email, 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+
+    def _post_generate(self):
+        return self.client.post(
+            f'/visual/generate/{self.dataset.id}',
+            data={'title': 'Sales Dashboard', 'description': 'Monthly sales'},
+            headers={'X-Requested-With': 'XMLHttpRequest'}
+        )
+
+    @patch.object(claude_service, 'agenerate_dashboard', new_callable=AsyncMock, return_value='<html><head></head><body>ok</body></html>')
+    def test_generate_returns_job_and_saves_visualisation(self, mock_generate):
+        """POST returns 202 with a job; the finished job links the new visualisation."""
+        self._login()
+        response = self._post_generate()
+        self.assertEqual(response.status_code, 202)
+        data = json.loads(response.data)
+        self.assertEqual(data['status'], 'succeeded')
+        mock_generate.assert_called_once_with(self.dataset.id, 'Sales Dashboard', 'Monthly sales', progress=ANY, use_cache=True, record_usage=ANY, user_id=self.user.id)
+
+        visualisation = db.session.get(Visualisation, data['visualisation_id'])
+        self.assertIsNotNone(visualisation)
+        self.assertIn('ok', visualisation.spec)
+
+        status = self.client.get(data['status_url'])
+        self.assertEqual(status.status_code, 200)
+        status_data = json.loads(status.data)
+        self.assertEqual(status_data['progress'], 100)
+        self.assertEqual(status_data['redirect_url'], f'/visual/view/{visualisation.id}')
+
+    @patch.object(claude_service, 'agenerate_dashboard', new_callable=AsyncMock, side_effect=RuntimeError('boom'))
+    def test_failed_job_records_error(self, mock_generate):
+        """Errors during generation mark the job as failed instead of raising."""
+        self._login()
+        response = self._post_generate()
+        self.assertEqual(response.status_code, 202)
+        data = json.loads(response.data)
+        self.assertEqual(data['status'], 'failed')
+        self.assertIn('boom', data['error'])
+        self.assertEqual(Visualisation.query.count(), 0)
+
+    def test_job_status_is_private(self):
+        """Users cannot read other users' jobs."""
+        job = GenerationJob(user_id=self.user.id, dataset_id=self.dataset.id, title='t', status='queued', progress=0)
+        db.session.add(job)
+        db.session.commit()
+
+        self._login('other@example.com')
+        response = self.client.get(f'/visual/api/v1/jobs/{job.id}')
+        self.assertEqual(response.status_code, 404)
+
+    def test_api_queue_depth(self):
+        """The queue endpoint reports Claude calls waiting for rate-limit capacity."""
+        self._login()
+        response = self.client.get('/visual/api/v1/jobs/queue')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.data), {'queued': 0, 'in_flight': 0, 'queued_for_user': 0})
+
+    def test_queue_runs_jobs_in_background_with_app_context(self):
+        """Non-eager submission runs on the worker pool with url_for available."""
+        from flask import url_for, current_app
+        job_queue.eager = False
+
+        def work(x):
+            return current_app.name, url_for('visual.index'), x * 2
+
+        with self.app.test_request_context('/'):
+            future = job_queue.submit(work, 21)
+        name, index_url, value = future.result(timeout=10)
+        self.assertEqual(name, self.app.name)
+        self.assertEqual(index_url, '/visual/index')
+        self.assertEqual(value, 42)
+
+    def test_async_jobs_share_the_event_loop(self):
+        """Coroutine jobs run concurrently on one loop thread, each with its own app context."""
+        import asyncio
+        import threading
+        from flask import url_for, g
+        job_queue.eager = False
+
+        async def work(x):
+            g.value = x
+            await asyncio.sleep(0.2)
+            return threading.current_thread().name, url_for('visual.index'), g.value
+
+        with self.app.test_request_context('/'):
+            futures = [job_queue.submit_async(work, x) for x in range(5)]
+        results = [future.result(timeout=10) for future in futures]
+        self.assertEqual({name for name, _, _ in results}, {'dynadash-job-loop'})
+        self.assertEqual([value for _, _, value in results], list(range(5)))
+        self.assertEqual(results[0][1], '/visual/index')
+        job_queue.shutdown()
+
+if __name__ == '__main__':
+    unittest.main()
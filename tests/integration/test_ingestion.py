@@ -0,0 +1,159 @@
+import os
+import io
+import json
+import time
+import shutil
+import tempfile
+import multiprocessing
+import unittest
+from unittest.mock import patch
+from concurrent.futures.process import BrokenProcessPool
+from sqlalchemy import delete
+from werkzeug.datastructures import FileStorage
+from app import create_app, db
+from app.models import User, Dataset
+from app.services import DataProcessor, ingestion_queue
+from app.services.ingestion import ingest_file, ingest_options
+
+class IngestionTestCase(unittest.TestCase):
+    """Test cases for background dataset ingestion."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.test_upload_dir = tempfile.mkdtemp()
+        self.app.config['UPLOAD_FOLDER'] = self.test_upload_dir
+        self.client = self.app.test_client()
+        self.client.testing = True
+
+        self.user = User(name='Test User', email='test@example.com', password='password')
+        db.session.add(self.user)
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up the test environment."""
+        ingestion_queue.shutdown()
+        ingestion_queue.eager = True
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.test_upload_dir, ignore_errors=True)
+
+    def _login(self):
+        response = self.client.post('/auth/api/v1/login', json={'email': 'test@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+
+    def test_ingest_file_reports_progress(self):
+        """The pure ingestion function cleans the file and reports progress."""
+        path = os.path.join(self.test_upload_dir, 'data.csv')
+        with open(path, 'w') as f:
+            f.write('a,b\n1,x\n,y\n3,\n')
+
+        updates = []
+        result = ingest_file(path, 'csv', ingest_options(self.app.config), progress=lambda p, m: updates.append(p))
+        self.assertEqual(result['n_rows'], 3)
+        self.assertEqual(result['n_columns'], 3)
+        self.assertEqual(updates, [10, 30, 60])
+        self.assertEqual(list(result['profile']), ['a', 'b', 'a_outlier'])
+
+    def test_api_upload_sets_status(self):
+        """Uploads record the dataset status and expose it through the status API."""
+        self._login()
+        response = self.client.post('/data/api/v1/upload', data={
+            'file': (io.BytesIO(b'a,b\n1,x\n2,y\n'), 'sample.csv')
+        }, content_type='multipart/form-data')
+        self.assertEqual(response.status_code, 200)
+        data = json.loads(response.data)
+        self.assertEqual(data['status'], 'ready')
+
+        status = json.loads(self.client.get(data['status_url']).data)
+        self.assertEqual(status['status'], 'ready')
+        self.assertEqual(status['n_rows'], 2)
+
+    def test_failed_ingestion_marks_dataset_failed(self):
+        """Unparseable files leave a failed dataset and no file on disk."""
+        dataset = DataProcessor().process(
+            FileStorage(stream=io.BytesIO(b'{not json'), filename='broken.json'),
+            user_id=self.user.id
+        )
+        self.assertEqual(dataset.status, 'failed')
+        self.assertTrue(dataset.error_message)
+        self.assertFalse(os.path.exists(dataset.file_path))
+
+    def test_process_pool_ingestion(self):
+        """Non-eager ingestion runs in a worker process and finishes as ready."""
+        ingestion_queue.eager = False
+        with self.app.test_request_context('/'):
+            dataset = DataProcessor().process(
+                FileStorage(stream=io.BytesIO(b'a,b\n1,x\n2,y\n3,z\n'), filename='sample.csv'),
+                user_id=self.user.id
+            )
+        self.assertIn(dataset.status, ('pending', 'processing', 'ready'))
+
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            db.session.expire_all()
+            dataset = db.session.get(Dataset, dataset.id)
+            if dataset.status in ('ready', 'failed'):
+                break
+            time.sleep(0.2)
+
+        self.assertEqual(dataset.status, 'ready', dataset.error_message)
+        self.assertEqual(dataset.n_rows, 3)
+        self.assertEqual(dataset.n_columns, 3)
+        self.assertEqual(dataset.profile['b']['unique_values'], 3)
+
+    def test_dataset_deleted_during_ingestion(self):
+        """A dataset deleted while it is being ingested is cleaned up without errors."""
+        path = os.path.join(self.test_upload_dir, 'data.csv')
+        with open(path, 'w') as f:
+            f.write('a,b\n1,x\n2,y\n')
+        dataset = Dataset(
+            user_id=self.user.id, filename='data.csv', original_filename='data.csv', file_path=path,
+            file_type='csv', n_rows=0, n_columns=0, status='pending'
+        )
+        db.session.add(dataset)
+        db.session.commit()
+        dataset_id = dataset.id
+
+        def ingest_and_delete(*args, **kwargs):
+            result = ingest_file(*args, **kwargs)
+            db.session.execute(delete(Dataset).where(Dataset.id == dataset_id).execution_options(synchronize_session=False))
+            db.session.commit()
+            return result
+
+        with self.app.test_request_context('/'), patch('app.services.ingestion.ingest_file', ingest_and_delete):
+            ingestion_queue._run_ingestion(dataset_id)
+        self.assertIsNone(db.session.get(Dataset, dataset_id))
+        self.assertFalse(os.path.exists(path))
+
+    def test_broken_process_pool_is_replaced(self):
+        """After a worker process dies, the next ingestion runs in a new pool with a single manager."""
+        ingestion_queue.eager = False
+        pool, manager = ingestion_queue._get_process_pool()
+        self.assertIsInstance(pool.submit(os._exit, 1).exception(timeout=120), BrokenProcessPool)
+
+        with self.app.test_request_context('/'):
+            dataset = DataProcessor().process(
+                FileStorage(stream=io.BytesIO(b'a,b\n1,x\n2,y\n'), filename='sample.csv'),
+                user_id=self.user.id
+            )
+        deadline = time.time() + 120
+        while time.time() < deadline:
+            db.session.expire_all()
+            dataset = db.session.get(Dataset, dataset.id)
+            if dataset.status in ('ready', 'failed'):
+                break
+            time.sleep(0.2)
+
+        self.assertEqual(dataset.status, 'ready', dataset.error_message)
+        self.assertIsNot(ingestion_queue._get_process_pool()[0], pool)
+        self.assertIsNot(ingestion_queue._get_process_pool()[1], manager)
+        managers = [p for p in multiprocessing.active_children() if p.name.startswith('SyncManager')]
+        self.assertEqual(len(managers), 1)
+
+if __name__ == '__main__':
+    unittest.main()
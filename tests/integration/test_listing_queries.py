@@ -0,0 +1,121 @@
+import unittest
+from app import create_app, db
+from app.models import User, Dataset, Visualisation, Share
+from tests.query_count import QueryCountMixin
+
+SHARES = 25
+
+
+class ListingQueriesTestCase(QueryCountMixin, unittest.TestCase):
+    """Listings issue a constant number of SQL statements however much is shared."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.user = User(name='Viewer', email='viewer@example.com', password='password')
+        db.session.add(self.user)
+        db.session.commit()
+        # Every shared dataset and dashboard has a different owner
+        for i in range(SHARES):
+            owner = User(name=f'Owner {i}', email=f'owner{i}@example.com', password_hash='unused')
+            db.session.add(owner)
+            db.session.flush()
+            dataset = Dataset(
+                user_id=owner.id, filename=f'd{i}.csv', original_filename=f'd{i}.csv', file_path=f'/nonexistent/d{i}.csv',
+                file_type='csv', n_rows=10, n_columns=2, is_public=i % 2 == 0, profile={'a': {'name': 'a'}}
+            )
+            own = Dataset(
+                user_id=self.user.id, filename=f'own{i}.csv', original_filename=f'own{i}.csv', file_path=f'/nonexistent/own{i}.csv',
+                file_type='csv', n_rows=10, n_columns=2
+            )
+            db.session.add_all([dataset, own])
+            db.session.flush()
+            visualisation = Visualisation(dataset_id=dataset.id, title=f'Shared {i}', spec='<div></div>')
+            db.session.add_all([visualisation, Visualisation(dataset_id=own.id, title=f'Own {i}', spec='<div></div>')])
+            db.session.flush()
+            db.session.add_all([
+                Share(owner_id=owner.id, target_id=self.user.id, object_type='dataset', object_id=dataset.id),
+                Share(owner_id=owner.id, target_id=self.user.id, object_type='visualisation', object_id=visualisation.id)
+            ])
+        db.session.commit()
+
+        response = self.client.post('/auth/api/v1/login', json={'email': 'viewer@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+        db.session.remove()  # start each request with an empty identity map
+
+    def tearDown(self):
+        """Clean up the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _get(self, url, max_queries):
+        with self.assertMaxQueries(max_queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def test_shared_datasets_api(self):
+        """Owner names come from the listing query, not one lookup per dataset."""
+        datasets = self._get('/data/api/v1/shared-datasets', 2).get_json()['datasets']
+        self.assertEqual(len(datasets), SHARES)
+        self.assertEqual({ds['owner'] for ds in datasets}, {f'Owner {i}' for i in range(SHARES)})
+
+    def test_own_datasets_api(self):
+        """The user's datasets are listed with one query."""
+        self.assertEqual(len(self._get('/data/api/v1/datasets', 2).get_json()['datasets']), SHARES)
+
+    def test_datasets_page(self):
+        """Shared and public datasets are rendered with their owners without per-row queries."""
+        response = self._get('/data/', 4)
+        self.assertIn(f'Owner {SHARES - 1}'.encode(), response.data)
+        self.assertIn(f'Owner {SHARES - 2}'.encode(), response.data)
+        self.assertIn(b'shared_cursor=', response.data)
+
+    def test_datasets_page_does_not_load_profiles(self):
+        """The datasets page selects listing columns only, not the stored profiles."""
+        with self.assertMaxQueries(4) as statements:
+            self.assertEqual(self.client.get('/data/').status_code, 200)
+        self.assertFalse([s for s in statements if 'dataset.profile' in s])
+
+    def test_visualisation_apis(self):
+        """Own and shared dashboard listings include dataset and owner names from one query."""
+        own = self._get('/visual/api/v1/visualisations', 2).get_json()['visualisations']
+        self.assertEqual(len(own), SHARES)
+        self.assertTrue(all(vis['dataset_name'].startswith('own') for vis in own))
+
+        shared = self._get('/visual/api/v1/shared-visualisations', 2).get_json()['visualisations']
+        self.assertEqual(len(shared), SHARES)
+        self.assertEqual({vis['owner_name'] for vis in shared}, {f'Owner {i}' for i in range(SHARES)})
+        self.assertEqual({vis['dataset_name'] for vis in shared}, {f'd{i}.csv' for i in range(SHARES)})
+
+    def test_dashboards_page(self):
+        """The gallery loads each page of dashboards with their datasets, and the shared list, in constant queries."""
+        response = self._get('/visual/index', 4)
+        self.assertIn(b'own24.csv', response.data)
+        self.assertIn(b'd24.csv', response.data)
+        self.assertIn(b'Owner 24', response.data)
+
+    def test_listings_do_not_load_specs(self):
+        """Dashboard templates are only read by the views that show a dashboard."""
+        own = Dataset.query.filter_by(user_id=self.user.id).first()
+        visualisation = Visualisation.query.filter_by(dataset_id=own.id).first()
+        db.session.remove()
+        for url in ('/visual/index', '/visual/api/v1/visualisations', '/visual/api/v1/shared-visualisations',
+                    f'/data/view/{own.id}'):
+            with self.assertMaxQueries(10) as statements:
+                self.assertEqual(self.client.get(url).status_code, 200, url)
+            self.assertFalse([s for s in statements if 'visualisation.spec_blob' in s], url)
+
+        # The dashboard view reads the template with its permission check
+        with self.assertMaxQueries(10) as statements:
+            self.assertEqual(self.client.get(f'/visual/api/v1/visualisations/{visualisation.id}').status_code, 200)
+        self.assertEqual(len([s for s in statements if 'visualisation.spec_blob' in s]), 1)
+
+if __name__ == '__main__':
+    unittest.main()
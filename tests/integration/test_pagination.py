@@ -0,0 +1,109 @@
+import re
+import unittest
+from datetime import datetime, timedelta
+from app import create_app, db
+from app.models import User, Dataset, Visualisation
+
+COUNT = 7
+START = datetime(2024, 1, 1)
+
+
+class PaginationTestCase(unittest.TestCase):
+    """Test cases for keyset pagination of the listing pages and APIs."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.user = User(name='Test User', email='test@example.com', password='password')
+        db.session.add(self.user)
+        db.session.commit()
+        # Pairs of datasets share an upload time, so pages must break ties by id
+        for i in range(COUNT):
+            self._add(f'd{i}.csv', START + timedelta(minutes=i // 2))
+        db.session.commit()
+
+        response = self.client.post('/auth/api/v1/login', json={'email': 'test@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+
+    def tearDown(self):
+        """Clean up the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _add(self, name, uploaded_at):
+        dataset = Dataset(
+            user_id=self.user.id, filename=name, original_filename=name, file_path=f'/nonexistent/{name}',
+            file_type='csv', n_rows=10, n_columns=2, uploaded_at=uploaded_at
+        )
+        db.session.add(dataset)
+        db.session.flush()
+        db.session.add(Visualisation(dataset_id=dataset.id, title=f'Dash {name}', spec='<div></div>', created_at=uploaded_at))
+        return dataset
+
+    def _walk(self, url, key, limit):
+        items, cursor, pages = [], None, 0
+        while True:
+            response = self.client.get(url, query_string={'limit': limit, 'cursor': cursor} if cursor else {'limit': limit})
+            self.assertEqual(response.status_code, 200)
+            body = response.get_json()
+            self.assertLessEqual(len(body[key]), limit)
+            items += body[key]
+            pages += 1
+            cursor = body['next_cursor']
+            if cursor is None:
+                return items, pages
+
+    def test_api_pages_cover_everything_once(self):
+        """Following next_cursor lists every row exactly once, newest first."""
+        datasets, pages = self._walk('/data/api/v1/datasets', 'datasets', 3)
+        self.assertEqual(pages, 3)
+        expected = [ds.id for ds in Dataset.query.order_by(Dataset.uploaded_at.desc(), Dataset.id.desc())]
+        self.assertEqual([ds['id'] for ds in datasets], expected)
+
+        visualisations, pages = self._walk('/visual/api/v1/visualisations', 'visualisations', 3)
+        self.assertEqual(pages, 3)
+        self.assertEqual(len({vis['id'] for vis in visualisations}), COUNT)
+
+    def test_cursor_is_stable_under_inserts(self):
+        """Rows added after the first page do not shift the following pages."""
+        first = self.client.get('/data/api/v1/datasets?limit=3').get_json()
+        self._add('new.csv', START + timedelta(days=1))
+        db.session.commit()
+        second = self.client.get(f"/data/api/v1/datasets?limit=3&cursor={first['next_cursor']}").get_json()
+        self.assertEqual([ds['filename'] for ds in second['datasets']], ['d3.csv', 'd2.csv', 'd1.csv'])
+
+    def test_page_size_limits(self):
+        """The page size defaults to PAGE_SIZE and is capped at PAGE_SIZE_MAX."""
+        self.app.config.update(PAGE_SIZE=2, PAGE_SIZE_MAX=4)
+        self.assertEqual(len(self.client.get('/data/api/v1/datasets').get_json()['datasets']), 2)
+        self.assertEqual(len(self.client.get('/data/api/v1/datasets?limit=1000').get_json()['datasets']), 4)
+        self.assertEqual(len(self.client.get('/data/api/v1/datasets?limit=0').get_json()['datasets']), 1)
+
+    def test_invalid_cursor(self):
+        """APIs reject a malformed cursor; pages fall back to the first page."""
+        for url in ('/data/api/v1/datasets', '/data/api/v1/shared-datasets',
+                    '/visual/api/v1/visualisations', '/visual/api/v1/shared-visualisations'):
+            self.assertEqual(self.client.get(f'{url}?cursor=bogus').status_code, 400, url)
+        response = self.client.get('/visual/index?cursor=bogus')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Dash d6.csv', response.data)
+
+    def test_gallery_pages(self):
+        """The gallery links to the following page, which continues where the first one ended."""
+        first = self.client.get('/visual/index').get_data(as_text=True)
+        self.assertIn('Dash d6.csv', first)
+        self.assertNotIn('Dash d0.csv', first)
+        next_url = re.search(r'href="([^"]*cursor=[^"]*)"', first).group(1).replace('&amp;', '&')
+        second = self.client.get(next_url).get_data(as_text=True)
+        self.assertIn('Dash d0.csv', second)
+        self.assertNotIn('Dash d6.csv', second)
+        self.assertIn('Newest', second)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import unittest
+from sqlalchemy import event
+from app import create_app, db
+from app.models import User, Dataset, Visualisation, Share
+
+# Tables whose lookups must go through an index; a full scan of any of them
+# makes listings and permission checks grow with the table.
+INDEXED_TABLES = ('dataset', 'visualisation', 'share')
+
+
+class QueryPlanTestCase(unittest.TestCase):
+    """Query plan regression tests for the listing and permission queries."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        owner = User(name='Owner', email='owner@example.com', password='password')
+        self.user = User(name='Viewer', email='viewer@example.com', password='password')
+        db.session.add_all([owner, self.user])
+        db.session.commit()
+        self.dataset = Dataset(
+            user_id=owner.id, filename='sales.csv', original_filename='sales.csv', file_path='/nonexistent/sales.csv',
+            file_type='csv', n_rows=10, n_columns=2, is_public=False
+        )
+        public = Dataset(
+            user_id=owner.id, filename='public.csv', original_filename='public.csv', file_path='/nonexistent/public.csv',
+            file_type='csv', n_rows=10, n_columns=2, is_public=True
+        )
+        db.session.add_all([self.dataset, public])
+        db.session.commit()
+        self.visualisation = Visualisation(dataset_id=self.dataset.id, title='Sales', spec='<div></div>')
+        db.session.add(self.visualisation)
+        db.session.commit()
+        db.session.add_all([
+            Share(owner_id=owner.id, target_id=self.user.id, object_type='dataset', object_id=self.dataset.id),
+            Share(owner_id=owner.id, target_id=self.user.id, object_type='visualisation', object_id=self.visualisation.id)
+        ])
+        db.session.commit()
+
+        response = self.client.post('/auth/api/v1/login', json={'email': 'viewer@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+
+    def tearDown(self):
+        """Clean up the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _select_statements(self, urls):
+        statements = {}
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                statements.setdefault(statement, parameters)
+
+        event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            for url in urls:
+                self.assertLess(self.client.get(url).status_code, 400, url)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        return statements
+
+    def _plan(self, statement, parameters):
+        rows = db.session.connection().exec_driver_sql('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+        return [row[-1] for row in rows]
+
+    def _assert_no_table_scans(self, urls):
+        statements = self._select_statements(urls)
+        self.assertTrue(statements)
+        for statement, parameters in statements.items():
+            for step in self._plan(statement, parameters):
+                words = step.split()
+                if words[0] == 'SCAN' and words[1] in INDEXED_TABLES:
+                    self.fail(f"{step} in query plan of:\n{statement}")
+
+    def test_dataset_queries_use_indexes(self):
+        """Dataset listings and share checks in data/routes.py search indexes instead of scanning."""
+        self._assert_no_table_scans([
+            '/data/',
+            '/data/api/v1/datasets',
+            '/data/api/v1/shared-datasets',
+            f'/data/api/v1/datasets/{self.dataset.id}',
+            f'/data/view/{self.dataset.id}'
+        ])
+
+    def test_visualisation_queries_use_indexes(self):
+        """Dashboard listings and share checks in visual/routes.py search indexes instead of scanning."""
+        self._assert_no_table_scans([
+            '/visual/index',
+            '/visual/api/v1/visualisations',
+            '/visual/api/v1/shared-visualisations',
+            f'/visual/api/v1/visualisations/{self.visualisation.id}',
+            f'/visual/view/{self.visualisation.id}'
+        ])
+
+    def test_share_lookup_uses_composite_index(self):
+        """The permission check on (object_type, object_id, target_id) is answered from one index."""
+        query = Share.query.filter_by(object_type='visualisation', object_id=1, target_id=2)
+        compiled = query.statement.compile(db.engine)
+        plan = ' '.join(self._plan(str(compiled), tuple(compiled.params[name] for name in compiled.positiontup)))
+        # Either composite index matches all three columns; which one SQLite picks is up to its planner
+        self.assertRegex(plan, r'SEARCH share USING INDEX ix_share_\w+')
+        for column in ('object_type=?', 'object_id=?', 'target_id=?'):
+            self.assertIn(column, plan)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,167 @@
+import json
+import time
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from app import create_app, db, socketio
+from app.models import User, Dataset, Visualisation, GenerationJob
+from app.services import claude_service
+from app.services.claude_client import DASHBOARD_INSTRUCTIONS
+from app.services.generation_jobs import PROGRESS_STEP
+
+DASHBOARD_HTML = '<!DOCTYPE html><html><head><title>Sales</title></head><body>' + \
+    ''.join(f'<div class="chart" id="chart{i}"></div>' for i in range(300)) + '</body></html>'
+
+
+class FakeMessagesHandler(BaseHTTPRequestHandler):
+    """Serves POST /v1/messages as a Messages API event stream of ``server.text``."""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _event(self, event_type, data):
+        self.wfile.write(f'event: {event_type}\ndata: {json.dumps(dict(data, type=event_type))}\n\n'.encode('utf-8'))
+        self.wfile.flush()
+
+    def do_POST(self):
+        request = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.requests.append(request)
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.end_headers()
+
+        text, chunk = self.server.text, 40
+        try:
+            self._event('message_start', {'message': {
+                'id': 'msg_fake', 'type': 'message', 'role': 'assistant', 'model': request['model'],
+                'content': [], 'stop_reason': None, 'stop_sequence': None,
+                'usage': {'input_tokens': 100, 'output_tokens': 1,
+                          'cache_creation_input_tokens': 0, 'cache_read_input_tokens': 1200}
+            }})
+            self._event('content_block_start', {'index': 0, 'content_block': {'type': 'text', 'text': ''}})
+            for start in range(0, len(text), chunk):
+                self._event('content_block_delta', {'index': 0, 'delta': {'type': 'text_delta', 'text': text[start:start + chunk]}})
+                self.server.chunks_sent += 1
+                time.sleep(self.server.delay)
+            self._event('content_block_stop', {'index': 0})
+            self._event('message_delta', {'delta': {'stop_reason': 'end_turn', 'stop_sequence': None},
+                                          'usage': {'output_tokens': len(text) // 4}})
+            self._event('message_stop', {})
+        except (BrokenPipeError, ConnectionResetError):
+            self.server.aborted = True
+
+
+class StreamingGenerationTestCase(unittest.TestCase):
+    """Test cases for streamed dashboard generation against a local fake API."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeMessagesHandler)
+        self.server.requests, self.server.chunks_sent, self.server.aborted = [], 0, False
+        self.server.text, self.server.delay = DASHBOARD_HTML, 0
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.app = create_app('testing')
+        self.app.config.update(
+            ANTHROPIC_API_KEY='test-key',
+            ANTHROPIC_BASE_URL=f'http://127.0.0.1:{self.server.server_address[1]}',
+            ANTHROPIC_EXPECTED_DASHBOARD_TOKENS=len(DASHBOARD_HTML) // 4
+        )
+        claude_service.init_app(self.app)
+        claude_service.client = None
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.client = self.app.test_client()
+
+        self.user = User(name='Test User', email='test@example.com', password='password')
+        db.session.add(self.user)
+        db.session.commit()
+        self.dataset = Dataset(
+            user_id=self.user.id, filename='sales.csv', original_filename='sales.csv', file_path='/nonexistent/sales.csv',
+            file_type='csv', n_rows=10, n_columns=1, profile={'amount': {'name': 'amount', 'type': 'float64'}}
+        )
+        db.session.add(self.dataset)
+        db.session.commit()
+        response = self.client.post('/auth/api/v1/login', json={'email': 'test@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+
+    def tearDown(self):
+        """Clean up the test environment."""
+        self.server.shutdown()
+        self.server.server_close()
+        claude_service.client = None
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _generate(self):
+        with patch.object(socketio, 'emit') as emit:
+            response = self.client.post(
+                f'/visual/generate/{self.dataset.id}',
+                data={'title': 'Sales Dashboard', 'description': 'Monthly sales'},
+                headers={'X-Requested-With': 'XMLHttpRequest'}
+            )
+        self.assertEqual(response.status_code, 202)
+        progress = [args[1]['percent'] for args, kwargs in emit.call_args_list if args[0] == 'progress_update']
+        return db.session.get(GenerationJob, json.loads(response.data)['id']), progress
+
+    def test_streamed_generation_reports_token_progress(self):
+        """The HTML is assembled from the stream and progress advances with the tokens received."""
+        job, progress = self._generate()
+        self.assertEqual(job.status, 'succeeded', job.error)
+        self.assertTrue(self.server.requests[0]['stream'])
+
+        streamed = [p for p in progress if 10 < p < 90]
+        self.assertGreater(len(streamed), 1)
+        self.assertEqual(streamed, sorted(streamed))
+        self.assertLessEqual(len(streamed), 79 // PROGRESS_STEP)
+        self.assertEqual(progress[-1], 100)
+
+        visualisation = db.session.get(Visualisation, job.visualisation_id)
+        self.assertIn('id="chart299"', visualisation.spec)
+
+    def test_static_instructions_are_a_cached_prefix(self):
+        """The fixed instructions end in a cache breakpoint, the dataset details follow it, and usage is recorded."""
+        job, _ = self._generate()
+        self.assertEqual(job.status, 'succeeded', job.error)
+
+        request = self.server.requests[0]
+        self.assertEqual(request['system'][-1]['text'], DASHBOARD_INSTRUCTIONS)
+        self.assertEqual(request['system'][-1]['cache_control'], {'type': 'ephemeral'})
+        self.assertNotIn('Sales Dashboard', json.dumps(request['system']))
+        self.assertIn('Sales Dashboard', request['messages'][0]['content'])
+        self.assertNotIn('CRITICAL DATA INJECTION', request['messages'][0]['content'])
+
+        self.assertEqual((job.input_tokens, job.cache_read_input_tokens, job.cache_creation_input_tokens), (100, 1200, 0))
+        self.assertEqual(job.output_tokens, len(DASHBOARD_HTML) // 4)
+        response = self.client.get(f'/visual/api/v1/jobs/{job.id}')
+        self.assertEqual(json.loads(response.data)['usage']['cache_read_input_tokens'], 1200)
+
+    def test_prompt_caching_can_be_disabled(self):
+        """Without ANTHROPIC_PROMPT_CACHING no cache breakpoint is sent."""
+        self.app.config['ANTHROPIC_PROMPT_CACHING'] = False
+        claude_service.init_app(self.app)
+        self._generate()
+        self.assertNotIn('cache_control', json.dumps(self.server.requests[0]['system']))
+
+    def test_malformed_output_is_aborted_early(self):
+        """A response that is not HTML fails the job without waiting for the rest of the stream."""
+        self.server.text = "I'm sorry, but I can't build that dashboard. " * 400
+        self.server.delay = 0.01
+        total_chunks = -(-len(self.server.text) // 40)
+
+        job, _ = self._generate()
+        self.assertEqual(job.status, 'failed')
+        self.assertIn('not an HTML document', job.error)
+        self.assertEqual(len(self.server.requests), 1)  # not retried
+
+        deadline = time.time() + 5
+        while not self.server.aborted and time.time() < deadline:
+            time.sleep(0.05)
+        self.assertTrue(self.server.aborted)
+        self.assertLess(self.server.chunks_sent, total_chunks)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,29 @@
+from contextlib import contextmanager
+from sqlalchemy import event
+from app import db
+
+
+class QueryCountMixin:
+    """TestCase mixin for asserting how many SQL statements a block issues."""
+
+    @contextmanager
+    def assertMaxQueries(self, limit):
+        """
+        Fail if the block issues more than ``limit`` SQL statements.
+
+        Yields the list of statements, filled in as they run.
+        """
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        if len(statements) > limit:
+            self.fail(f"{len(statements)} SQL statements issued, expected at most {limit}:\n" + '\n'.join(
+                f"{i + 1}. {' '.join(statement.split())[:200]}" for i, statement in enumerate(statements)
+            ))
@@ -0,0 +1,83 @@
+import os
+import time
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from app import create_app
+from app.cache_backends import SQLiteCache
+from app.caching import cache, init_cache, bump_scopes, _scope_versions
+
+class SQLiteCacheTestCase(unittest.TestCase):
+    """Test cases for the SQLite cache backend."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'cache.sqlite3')
+        self.cache = SQLiteCache(self.path, default_timeout=60, threshold=10, key_prefix='test/')
+
+    def tearDown(self):
+        """Clean up the test environment."""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_get_set_delete(self):
+        """Values round-trip and can be deleted, added and incremented."""
+        self.assertIsNone(self.cache.get('missing'))
+        self.assertTrue(self.cache.set('key', {'rows': [1, 2]}))
+        self.assertEqual(self.cache.get('key'), {'rows': [1, 2]})
+        self.assertTrue(self.cache.has('key'))
+        self.assertFalse(self.cache.add('key', 'other'))
+        self.assertEqual(self.cache.get_many('key', 'missing'), [{'rows': [1, 2]}, None])
+        self.assertTrue(self.cache.delete('key'))
+        self.assertIsNone(self.cache.get('key'))
+        self.assertEqual(self.cache.inc('counter'), 1)
+        self.assertEqual(self.cache.inc('counter', 4), 5)
+
+    def test_entries_expire(self):
+        """Expired entries are not returned; a timeout of 0 never expires."""
+        self.cache.set('short', 1, timeout=1)
+        self.cache.set('forever', 2, timeout=0)
+        with mock.patch('app.cache_backends.time.time', return_value=time.time() + 3600):
+            self.assertIsNone(self.cache.get('short'))
+            self.assertTrue(self.cache.add('short', 3))
+            self.assertEqual(self.cache.get('forever'), 2)
+
+    def test_prune_keeps_threshold(self):
+        """Pruning drops the oldest entries beyond the threshold."""
+        self.cache.set_many({f'key{i}': i for i in range(25)})
+        self.cache._prune()
+        values = self.cache.get_many(*(f'key{i}' for i in range(25)))
+        self.assertEqual(sum(value is not None for value in values), 10)
+
+    def test_shared_between_instances(self):
+        """Separate instances (as in separate workers) see each other's writes."""
+        other = SQLiteCache(self.path, key_prefix='test/')
+        self.cache.set('key', 'value')
+        self.assertEqual(other.get('key'), 'value')
+        other.clear()
+        self.assertIsNone(self.cache.get('key'))
+
+    def test_invalidation_reaches_other_workers(self):
+        """Version stamps bumped by one app are seen by another using the same cache file."""
+        apps = []
+        for _ in range(2):
+            app = create_app('testing')
+            app.config.update(CACHE_TYPE='sqlite', CACHE_SQLITE_PATH=self.path)
+            init_cache(app)
+            apps.append(app)
+
+        with apps[0].app_context():
+            before = _scope_versions(['user/1'])
+        with apps[1].app_context():
+            self.assertEqual(_scope_versions(['user/1']), before)
+            bump_scopes('user/1')
+            after = _scope_versions(['user/1'])
+        with apps[0].app_context():
+            self.assertNotEqual(after, before)
+            self.assertEqual(_scope_versions(['user/1']), after)
+            self.assertEqual(apps[0].config['CACHE_TYPE'], 'app.cache_backends.SQLiteCache')
+            cache.clear()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,108 @@
+import os
+import io
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from werkzeug.datastructures import FileStorage
+from app import create_app, db
+from app.models import User
+from app.services import DataProcessor
+from app.services.cleaning import clean_frame, ChunkedCsvCleaner
+from app.services.column_store import read_column_store
+
+class ChunkedIngestionTestCase(unittest.TestCase):
+    """Test cases for chunked CSV cleaning."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.test_upload_dir = tempfile.mkdtemp()
+        self.app.config['UPLOAD_FOLDER'] = self.test_upload_dir
+
+    def tearDown(self):
+        """Clean up after the tests."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.test_upload_dir, ignore_errors=True)
+
+    def _sample_frame(self, n=1200):
+        rng = np.random.default_rng(7)
+        return pd.DataFrame({
+            'ints': rng.integers(0, 100, n),
+            'floats': np.where(rng.random(n) < 0.1, np.nan, rng.normal(size=n)),
+            'category': np.where(rng.random(n) < 0.1, None, rng.choice(['a', 'b', 'c'], n)),
+            'when': np.where(
+                rng.random(n) < 0.05, None,
+                pd.date_range('2020-01-01', periods=n).strftime('%m/%d/%Y')
+            ),
+            'flag': rng.choice([True, False], n),
+            'late_text': [str(i) for i in range(n - 1)] + ['oops'],
+            'empty': [None] * n,
+        })
+
+    def test_chunked_matches_in_memory(self):
+        """Cleaning in small chunks produces the same file as cleaning in memory."""
+        path = os.path.join(self.test_upload_dir, 'data.csv')
+        self._sample_frame().to_csv(path, index=False)
+
+        expected_path = path + '.expected'
+        clean_frame(pd.read_csv(path)).to_csv(expected_path, index=False)
+
+        cleaner = ChunkedCsvCleaner(chunk_rows=250)
+        plan = cleaner.collect(path)
+        columns, sidecar_written = cleaner.apply(path, plan, column_store=True)
+
+        with open(path) as actual, open(expected_path) as expected:
+            self.assertEqual(actual.read(), expected.read())
+        self.assertTrue(sidecar_written)
+        self.assertEqual(cleaner.n_rows, 1200)
+        self.assertIn('when_date', columns)
+        self.assertIn('ints_outlier', columns)
+
+        stored = read_column_store(path)
+        self.assertEqual(list(stored.columns), columns)
+        self.assertEqual(stored['flag'].dtype, bool)
+
+    def test_header_only_file(self):
+        """A CSV with a header but no rows is ingested as an empty dataset."""
+        path = os.path.join(self.test_upload_dir, 'empty.csv')
+        with open(path, 'w') as f:
+            f.write('a,b\n')
+
+        cleaner = ChunkedCsvCleaner(chunk_rows=10)
+        plan = cleaner.collect(path)
+        columns, _ = cleaner.apply(path, plan)
+        self.assertEqual(cleaner.n_rows, 0)
+        self.assertEqual(columns[:2], ['a', 'b'])
+
+    def test_processor_uses_chunked_path_above_threshold(self):
+        """DataProcessor switches to chunked cleaning for files over the threshold."""
+        user = User(name='Test User', email='test@example.com', password='password')
+        db.session.add(user)
+        db.session.commit()
+        self.app.config['INGEST_CHUNKED_THRESHOLD'] = 0
+        self.app.config['INGEST_CHUNK_ROWS'] = 2
+
+        file_storage = FileStorage(
+            stream=io.BytesIO(b'a,b\n1,x\n2,\n3,x\n100,y\n'),
+            filename='sample.csv',
+            content_type='text/csv'
+        )
+        dataset = DataProcessor().process(file_storage, user_id=user.id)
+        self.assertEqual(dataset.n_rows, 4)
+        self.assertEqual(dataset.n_columns, 3)
+
+        df = pd.read_csv(dataset.file_path)
+        self.assertEqual(df['b'].tolist(), ['x', 'x', 'x', 'y'])
+        self.assertTrue(df['a_outlier'].iloc[3])
+        self.assertEqual(dataset.profile['a']['max'], 100.0)
+        self.assertEqual(dataset.profile['b']['top_values'], {'x': 3, 'y': 1})
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,13 +1,18 @@
 import unittest
-from unittest.mock import patch, MagicMock
+from unittest.mock import patch, MagicMock, AsyncMock
 import os
 import sys
+import shutil
+import tempfile
+import asyncio
+import httpx
 import anthropic
 from flask import Flask
 
 # Add the app directory to the path so we can import the app module
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../..')))
-from app.services.claude_client import ClaudeClient
+from app.services.claude_client import ClaudeClient, retry_after_seconds, read_file_head
+from app.services.rate_governor import RateGovernor
 
 class TestClaudeClient(unittest.TestCase):
     """Tests for the ClaudeClient service."""
@@ -102,5 +107,195 @@ class TestClaudeClient(unittest.TestCase):
             with self.assertRaises(TypeError):
                 self.client._initialize_client()
 
+def _status_error(error_class, status_code, headers=None):
+    request = httpx.Request('POST', 'https://api.anthropic.com/v1/messages')
+    response = httpx.Response(status_code, headers=headers or {}, request=request)
+    return error_class('error', response=response, body=None)
+
+
+def _text_response(text):
+    block = MagicMock(type='text', text=text)
+    return MagicMock(content=[block])
+
+
+class TestClaudeRetries(unittest.TestCase):
+    """Tests for the asynchronous request path and its retry policy."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.app = Flask(__name__)
+        self.app.config['ANTHROPIC_API_KEY'] = 'test_api_key'
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = ClaudeClient()
+        self.client.init_app(self.app)
+        self.create = AsyncMock()
+        self.client._initialize_client = MagicMock(return_value=MagicMock(messages=MagicMock(create=self.create)))
+
+    def tearDown(self):
+        """Tear down test fixtures."""
+        self.app_context.pop()
+
+    def _create_message(self, sleeps):
+        async def fake_sleep(delay):
+            sleeps.append(delay)
+        with patch('app.services.claude_client.asyncio.sleep', fake_sleep):
+            return asyncio.run(self.client._create_message({'model': 'm'}, 'test'))
+
+    def test_retry_after_header_is_honoured(self):
+        """A retry-after delay from the API replaces the computed backoff."""
+        self.create.side_effect = [
+            _status_error(anthropic.RateLimitError, 429, {'retry-after': '7'}),
+            _status_error(anthropic.InternalServerError, 529, {'retry-after-ms': '1500'}),
+            _text_response('ok')
+        ]
+        sleeps = []
+        response = self._create_message(sleeps)
+        self.assertEqual(response.content[0].text, 'ok')
+        self.assertEqual(sleeps, [7.0, 1.5])
+
+    def test_backoff_is_jittered_and_capped(self):
+        """Without retry-after the delay is drawn from an exponentially growing, capped range."""
+        self.client.max_retries = 6
+        self.client.retry_max_delay = 12
+        self.create.side_effect = [anthropic.APIConnectionError(request=httpx.Request('POST', 'https://x'))] * 5 + [_text_response('ok')]
+        sleeps = []
+        self._create_message(sleeps)
+        self.assertEqual(len(sleeps), 5)
+        for attempt, delay in enumerate(sleeps):
+            self.assertLessEqual(delay, min(12, self.client.retry_delay * 2 ** attempt))
+            self.assertGreaterEqual(delay, 0)
+
+    def test_client_errors_are_not_retried(self):
+        """Requests the API rejects outright fail on the first attempt."""
+        self.create.side_effect = _status_error(anthropic.BadRequestError, 400)
+        sleeps = []
+        with self.assertRaises(anthropic.BadRequestError):
+            self._create_message(sleeps)
+        self.assertEqual(self.create.await_count, 1)
+        self.assertEqual(sleeps, [])
+
+    def test_rate_limit_pauses_the_governor(self):
+        """A 429 holds every caller for the retry delay, and unused reservations are returned."""
+        self.app.config.update(ANTHROPIC_OUTPUT_TPM_LIMIT=1000, ANTHROPIC_RPM_LIMIT=100)
+        governor = RateGovernor()
+        governor.init_app(self.app)
+        response = _text_response('ok')
+        response.usage = MagicMock(input_tokens=10, output_tokens=20, cache_creation_input_tokens=0, cache_read_input_tokens=0)
+        self.create.side_effect = [_status_error(anthropic.RateLimitError, 429, {'retry-after': '7'}), response]
+        sleeps = []
+        with patch.object(governor, 'pause') as pause:
+            with patch('app.services.claude_client.asyncio.sleep', AsyncMock(side_effect=sleeps.append)):
+                asyncio.run(self.client._create_message({'model': 'm', 'max_tokens': 500, 'messages': []}, 'test'))
+        pause.assert_called_once_with(7.0)
+        self.assertEqual(governor.queue_depth(), {'queued': 0, 'in_flight': 0})
+        # Two attempts reserved 500 output tokens each; the failed one spent its reservation, the other only 20
+        self.assertAlmostEqual(governor._store.levels()['output_tokens'], 1000 - 500 - 20, delta=1)
+
+    def test_retry_after_http_date(self):
+        """retry-after may also be an HTTP date."""
+        error = _status_error(anthropic.RateLimitError, 429, {'retry-after': 'Wed, 21 Oct 2015 07:28:00 GMT'})
+        self.assertEqual(retry_after_seconds(error), 0.0)
+        self.assertIsNone(retry_after_seconds(_status_error(anthropic.RateLimitError, 429)))
+
+
+class TestBlockingCalls(unittest.TestCase):
+    """Tests for the synchronous wrappers around the asynchronous calls."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.app = Flask(__name__)
+        self.app.config['ANTHROPIC_API_KEY'] = 'test_api_key'
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        self.client = ClaudeClient()
+        self.client.init_app(self.app)
+
+    def tearDown(self):
+        """Tear down test fixtures."""
+        self.app_context.pop()
+
+    def test_each_call_closes_its_client(self):
+        """Every blocking call gets its own client, closed when the call ends, even if it fails."""
+        clients = []
+
+        def new_client():
+            clients.append(MagicMock(close=AsyncMock()))
+            return clients[-1]
+
+        async def call(fail=False):
+            self.assertIs(self.client._initialize_client(), self.client._initialize_client())
+            if fail:
+                raise ValueError('failed')
+            return 'ok'
+
+        with patch.object(self.client, '_new_client', side_effect=new_client):
+            self.assertEqual(self.client._run(call()), 'ok')
+            with self.assertRaises(ValueError):
+                self.client._run(call(fail=True))
+        self.assertEqual(len(clients), 2)
+        for client in clients:
+            client.close.assert_awaited_once()
+        self.assertIsNone(self.client.client)
+
+    def test_calls_without_requests_make_no_client(self):
+        """A call answered without the API (e.g. from the template cache) creates no client."""
+        async def call():
+            return 'cached'
+
+        with patch.object(self.client, '_new_client') as new_client:
+            self.assertEqual(self.client._run(call()), 'cached')
+        new_client.assert_not_called()
+
+
+class TestReadFileHead(unittest.TestCase):
+    """Tests for the bounded dataset sample used in analysis prompts."""
+
+    def setUp(self):
+        """Set up test fixtures."""
+        self.tmp_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp_dir, 'data.csv')
+
+    def tearDown(self):
+        """Tear down test fixtures."""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def _write(self, text):
+        with open(self.path, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+
+    def test_reads_a_bounded_prefix(self):
+        """A large file is sampled by rows and characters without reading it all."""
+        self._write('id,value\r\n' + ''.join(f'{i},{i * 2}\r\n' for i in range(500000)))
+        reads = []
+        real_open = open
+
+        def spy_open(*args, **kwargs):
+            f = real_open(*args, **kwargs)
+            read = f.read
+            f.read = lambda size=-1: reads.append(size) or read(size)
+            return f
+
+        with patch('builtins.open', spy_open):
+            head, truncated = read_file_head(self.path, max_chars=2000, max_lines=51)
+        self.assertEqual(reads, [8001])
+        self.assertTrue(truncated)
+        self.assertEqual(head.splitlines()[0], 'id,value')
+        self.assertEqual(len(head.splitlines()), 51)
+        self.assertNotIn('\r', head)
+
+        head, truncated = read_file_head(self.path, max_chars=30, max_lines=51)
+        self.assertEqual(len(head), 30)
+        self.assertTrue(truncated)
+
+    def test_small_and_multibyte_files(self):
+        """Short files are returned whole and a character cut by the byte limit is dropped."""
+        self._write('name\nZoë\n')
+        self.assertEqual(read_file_head(self.path), ('name\nZoë\n', False))
+
+        self._write('é' * 10)
+        head, truncated = read_file_head(self.path, max_chars=3, max_lines=5)
+        self.assertEqual((head, truncated), ('ééé', True))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
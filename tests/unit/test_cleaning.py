@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from app.services import cleaning
+from app.services.cleaning import clean_frame, infer_date_format
+
+class CleanFrameTestCase(unittest.TestCase):
+    """Test cases for the batched in-memory cleaning engine."""
+
+    def test_fills_and_flags_in_bulk(self):
+        """Medians, modes and outlier flags are applied to every column."""
+        df = pd.DataFrame({
+            'a': [1.0, 2.0, np.nan, 100.0],
+            'b': [10, 11, 12, 13],
+            'label': ['x', None, 'x', 'y'],
+        })
+        cleaned = clean_frame(df)
+
+        self.assertEqual(cleaned['a'].tolist(), [1.0, 2.0, 2.0, 100.0])
+        self.assertEqual(cleaned['label'].tolist(), ['x', 'x', 'x', 'y'])
+        self.assertEqual(cleaned['a_outlier'].tolist(), [False, False, False, True])
+        self.assertEqual(cleaned['b_outlier'].dtype, bool)
+        self.assertEqual(list(cleaned.columns), ['a', 'b', 'label', 'a_outlier', 'b_outlier'])
+
+    def test_input_is_not_modified(self):
+        """The caller's frame is left untouched."""
+        df = pd.DataFrame({'a': [1.0, np.nan, 3.0], 'b': ['x', None, 'y']})
+        original = df.copy()
+        clean_frame(df)
+        pd.testing.assert_frame_equal(df, original)
+
+    def test_existing_derived_columns_are_replaced(self):
+        """Cleaning an already cleaned frame overwrites the flags instead of duplicating them."""
+        df = pd.DataFrame({'a': [1, 2, 3, 50], 'a_outlier': [False] * 4})
+        cleaned = clean_frame(df)
+        self.assertEqual(list(cleaned.columns), ['a', 'a_outlier'])
+        self.assertTrue(cleaned['a_outlier'].iloc[3])
+
+    def test_all_missing_columns(self):
+        """Columns with no values fall back to 'Unknown' (text) or stay NaN (numeric)."""
+        df = pd.DataFrame({'text': [None, None], 'num': [np.nan, np.nan]})
+        cleaned = clean_frame(df)
+        self.assertEqual(cleaned['text'].tolist(), ['Unknown', 'Unknown'])
+        self.assertTrue(cleaned['num'].isna().all())
+        self.assertFalse(cleaned['num_outlier'].any())
+
+class InferDateFormatTestCase(unittest.TestCase):
+    """Test cases for sample-based date format inference."""
+
+    def test_free_text_is_rejected_without_parsing(self):
+        """Columns that fail the cheap pre-filter are never handed to the date parser."""
+        series = pd.Series(['order shipped late', 'refund issued', 'valid_date 2025-01-01'] * 100)
+        with patch.object(cleaning, 'parse_dates', wraps=cleaning.parse_dates) as mock_parse:
+            self.assertIsNone(infer_date_format(series))
+            self.assertIsNone(clean_frame(series.to_frame('note')).get('note_date'))
+        mock_parse.assert_not_called()
+
+    def test_majority_format_wins_over_first_value(self):
+        """An odd first value does not decide the format for the whole column."""
+        series = pd.Series(['01/02/2023'] + ['2023-01-%02d' % day for day in range(1, 29)])
+        self.assertEqual(infer_date_format(series), '%Y-%m-%d')
+
+    def test_day_first_detected_from_sample(self):
+        """Days above 12 anywhere in the sample select the day-first format."""
+        series = pd.Series(['01/02/2023', '05/06/2023', '25/12/2023', '30/11/2023', '13/01/2024'])
+        self.assertEqual(infer_date_format(series), '%d/%m/%Y')
+
+    def test_sample_is_bounded(self):
+        """Only a bounded sample is inspected, and a format is still found for large columns."""
+        series = pd.Series(pd.date_range('2020-01-01', periods=5000).strftime('%d %b %Y'))
+        with patch.object(cleaning, 'parse_dates', wraps=cleaning.parse_dates) as mock_parse:
+            self.assertEqual(infer_date_format(series, sample_size=50), '%d %b %Y')
+        self.assertTrue(all(len(call.args[0]) <= 50 for call in mock_parse.call_args_list))
+
+if __name__ == '__main__':
+    unittest.main()
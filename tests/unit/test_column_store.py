@@ -0,0 +1,133 @@
+import os
+import io
+import time
+import shutil
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from werkzeug.datastructures import FileStorage
+from app import create_app, db
+from app.models import User
+from app.services import DataProcessor
+from app.services.column_store import (
+    write_column_store, read_column_store, read_schema, sidecar_path, load_dataset_frame
+)
+
+class ColumnStoreTestCase(unittest.TestCase):
+    """Test cases for the columnar sidecar store."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.test_upload_dir = tempfile.mkdtemp()
+        self.app.config['UPLOAD_FOLDER'] = self.test_upload_dir
+
+    def tearDown(self):
+        """Clean up after the tests."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.test_upload_dir, ignore_errors=True)
+
+    def _write_csv(self, df, name='data.csv'):
+        path = os.path.join(self.test_upload_dir, name)
+        df.to_csv(path, index=False)
+        return path
+
+    def test_round_trip_mixed_types(self):
+        """Numeric, bool, string, nullable string and datetime columns survive a round trip."""
+        df = pd.DataFrame({
+            'ints': [1, 2, 3],
+            'floats': [1.5, np.nan, 3.25],
+            'flags': [True, False, True],
+            'names': ['a', 'bb', 'ccc'],
+            'maybe': ['x', None, 'z'],
+            'when': pd.to_datetime(['2023-01-01', '2023-02-01', '2023-03-01']),
+        })
+        path = self._write_csv(df)
+        write_column_store(df, path)
+
+        loaded = read_column_store(path)
+        self.assertEqual(list(loaded.columns), list(df.columns))
+        self.assertEqual(loaded['ints'].tolist(), [1, 2, 3])
+        self.assertTrue(np.isnan(loaded['floats'].iloc[1]))
+        self.assertEqual(loaded['flags'].dtype, bool)
+        self.assertEqual(loaded['names'].tolist(), ['a', 'bb', 'ccc'])
+        self.assertTrue(pd.isna(loaded['maybe'].iloc[1]))
+        self.assertEqual(loaded['maybe'].iloc[2], 'z')
+        self.assertEqual(loaded['when'].iloc[1], pd.Timestamp('2023-02-01'))
+
+    def test_long_strings_use_offsets(self):
+        """Very wide string columns are stored as a byte buffer with offsets."""
+        long_value = 'é' * 1000
+        df = pd.DataFrame({'text': ['short', long_value, None]})
+        path = self._write_csv(df)
+        write_column_store(df, path)
+
+        schema = read_schema(path)
+        self.assertEqual(schema['columns'][0]['kind'], 'varstring')
+        loaded = read_column_store(path)
+        self.assertEqual(loaded['text'].iloc[0], 'short')
+        self.assertEqual(loaded['text'].iloc[1], long_value)
+        self.assertTrue(pd.isna(loaded['text'].iloc[2]))
+
+    def test_nrows_and_columns(self):
+        """Readers can load a row prefix and a column subset."""
+        df = pd.DataFrame({'a': range(100), 'b': [str(i) for i in range(100)]})
+        path = self._write_csv(df)
+        write_column_store(df, path)
+
+        loaded = read_column_store(path, columns=['b'], nrows=5)
+        self.assertEqual(list(loaded.columns), ['b'])
+        self.assertEqual(len(loaded), 5)
+
+    def test_stale_sidecar_is_ignored(self):
+        """A sidecar whose text file changed afterwards is not used."""
+        df = pd.DataFrame({'a': [1, 2, 3]})
+        path = self._write_csv(df)
+        write_column_store(df, path)
+        self.assertIsNotNone(read_schema(path))
+
+        time.sleep(0.01)
+        pd.DataFrame({'a': [1, 2, 3, 4]}).to_csv(path, index=False)
+        self.assertIsNone(read_schema(path))
+        self.assertIsNone(read_column_store(path))
+
+    def test_process_writes_sidecar_and_delete_removes_it(self):
+        """DataProcessor writes the sidecar on upload and removes it on delete."""
+        user = User(name='Test User', email='test@example.com', password='password')
+        db.session.add(user)
+        db.session.commit()
+        processor = DataProcessor()
+        file_storage = FileStorage(
+            stream=io.BytesIO(b'a,b\n1,x\n2,y\n3,z\n'),
+            filename='sample.csv',
+            content_type='text/csv'
+        )
+        dataset = processor.process(file_storage, user_id=user.id)
+        self.assertTrue(os.path.isdir(sidecar_path(dataset.file_path)))
+
+        df = load_dataset_frame(dataset)
+        self.assertEqual(len(df), 3)
+        self.assertEqual(df['b'].tolist(), ['x', 'y', 'z'])
+
+        processor.delete_dataset(dataset.id)
+        self.assertFalse(os.path.exists(sidecar_path(dataset.file_path)))
+
+    def test_legacy_dataset_is_backfilled(self):
+        """Datasets without a sidecar are parsed once and the sidecar is written."""
+        df = pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']})
+        path = self._write_csv(df)
+        dataset = type('LegacyDataset', (), {'id': 1, 'file_path': path, 'file_type': 'csv'})()
+
+        self.assertIsNone(read_schema(path))
+        loaded = load_dataset_frame(dataset)
+        self.assertEqual(loaded['b'].tolist(), ['x', 'y'])
+        self.assertIsNotNone(read_schema(path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -8,6 +8,7 @@ import uuid
 import io
 from datetime import datetime
 from app.services import DataProcessor
+from app.services.cleaning import clean_frame
 from app.models import Dataset
 from app import create_app, db
 from werkzeug.datastructures import FileStorage
@@ -55,7 +56,7 @@ class TestDataProcessor(unittest.TestCase):
             warnings.simplefilter("always")
             
             # Process the dataframe
-            cleaned_df = self.processor._clean_data(df)
+            cleaned_df = clean_frame(df)
             
             # Check that no warnings about infer_datetime_format were raised
             infer_datetime_warnings = [
@@ -87,7 +88,7 @@ class TestDataProcessor(unittest.TestCase):
         df = pd.DataFrame(data)
         
         # Process the dataframe
-        cleaned_df = self.processor._clean_data(df)
+        cleaned_df = clean_frame(df)
         
         # Check that columns with valid dates are kept
         self.assertIn('date_with_empty_date', cleaned_df.columns)
@@ -161,7 +162,7 @@ class TestDataProcessor(unittest.TestCase):
         df = pd.DataFrame(data)
         
         # Process the dataframe
-        cleaned_df = self.processor._clean_data(df)
+        cleaned_df = clean_frame(df)
         
         # Check that date column was converted
         self.assertIn('date_date', cleaned_df.columns)
@@ -177,7 +178,7 @@ class TestDataProcessor(unittest.TestCase):
         df = pd.DataFrame(data)
         
         # Process the dataframe
-        cleaned_df = self.processor._clean_data(df)
+        cleaned_df = clean_frame(df)
         
         # Check conversion
         self.assertIn('date1_date', cleaned_df.columns)
@@ -195,7 +196,7 @@ class TestDataProcessor(unittest.TestCase):
         df = pd.DataFrame(data)
         
         # Process the dataframe
-        cleaned_df = self.processor._clean_data(df)
+        cleaned_df = clean_frame(df)
         
         # Without infer_datetime_format, the mixed formats might be harder to parse
         # but at least the column with consistent empty values should work
@@ -240,7 +241,7 @@ class TestDataProcessor(unittest.TestCase):
         df = pd.DataFrame(data)
         
         # Process the dataframe - should handle all formats without issues
-        cleaned_df = self.processor._clean_data(df)
+        cleaned_df = clean_frame(df)
         
         # Check that date columns were created
         for col_name in data.keys():
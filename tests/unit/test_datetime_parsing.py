@@ -2,14 +2,11 @@ import unittest
 import pandas as pd
 import numpy as np
 import warnings
-from app.services.data_processor import DataProcessor
+from app.services.cleaning import clean_frame
 
 class DatetimeParsingTestCase(unittest.TestCase):
-    """Test cases for datetime parsing in DataProcessor after removing infer_datetime_format parameter"""
+    """Test cases for datetime parsing in clean_frame after removing infer_datetime_format parameter"""
     
-    def setUp(self):
-        self.processor = DataProcessor()
-        
     def test_datetime_parsing_without_infer_parameter(self):
         """Test datetime parsing works correctly without the deprecated parameter"""
         # Create a test DataFrame with datetime columns
@@ -25,7 +22,7 @@ class DatetimeParsingTestCase(unittest.TestCase):
         # Process the DataFrame with our cleaning method
         with warnings.catch_warnings(record=True) as w:
             warnings.simplefilter("always")
-            processed_df = self.processor._clean_data(df)
+            processed_df = clean_frame(df)
             
             # Check if there are any warnings related to infer_datetime_format
             infer_warnings = [warning for warning in w if "infer_datetime_format" in str(warning)]
@@ -51,7 +48,7 @@ class DatetimeParsingTestCase(unittest.TestCase):
         # Process the DataFrame with our cleaning method
         with warnings.catch_warnings(record=True) as w:
             warnings.simplefilter("always")
-            processed_df = self.processor._clean_data(df)
+            processed_df = clean_frame(df)
             
             # Check warnings - we expect no warnings about infer_datetime_format
             infer_warnings = [warning for warning in w if "infer_datetime_format" in str(warning)]
@@ -75,7 +72,7 @@ class DatetimeParsingTestCase(unittest.TestCase):
         # Process the DataFrame with our cleaning method
         with warnings.catch_warnings(record=True) as w:
             warnings.simplefilter("always")
-            processed_df = self.processor._clean_data(df)
+            processed_df = clean_frame(df)
             
             # Check warnings - we expect no warnings about infer_datetime_format
             infer_warnings = [warning for warning in w if "infer_datetime_format" in str(warning)]
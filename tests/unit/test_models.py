@@ -1,4 +1,8 @@
+import os
+import shutil
+import tempfile
 import unittest
+from sqlalchemy import create_engine, text
 from app import create_app, db
 from app.models import User, Dataset, Visualisation, Share
 from config import config
@@ -160,5 +164,26 @@ class ModelsTestCase(unittest.TestCase):
         self.assertEqual(retrieved_share.object_type, 'dataset')
         self.assertEqual(retrieved_share.object_id, dataset.id)
 
+    def _pragmas(self, *names):
+        tmp_dir = tempfile.mkdtemp()
+        engine = create_engine(f"sqlite:///{os.path.join(tmp_dir, 'test.db')}")
+        try:
+            with engine.connect() as connection:
+                return [connection.execute(text(f'PRAGMA {name}')).scalar() for name in names]
+        finally:
+            engine.dispose()
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    def test_sqlite_connection_profile(self):
+        """New SQLite connections get the configured tuning profile and overrides."""
+        names = ('foreign_keys', 'journal_mode', 'synchronous', 'busy_timeout', 'temp_store')
+        self.assertEqual(self._pragmas(*names), [1, 'wal', 1, 10000, 2])
+
+        self.app.config['SQLITE_PRAGMAS'] = {'busy_timeout': 2500}
+        self.assertEqual(self._pragmas('busy_timeout'), [2500])
+
+        self.app.config.update(SQLITE_PROFILE='default', SQLITE_PRAGMAS={})
+        self.assertEqual(self._pragmas('foreign_keys', 'journal_mode', 'synchronous'), [1, 'delete', 2])
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,29 @@
+import unittest
+from datetime import datetime
+from app.pagination import encode_cursor, decode_cursor, InvalidCursor
+
+
+class CursorTestCase(unittest.TestCase):
+    """Test cases for the keyset pagination cursor tokens."""
+
+    def test_round_trip(self):
+        """A token decodes to the position it was made from."""
+        timestamp = datetime(2024, 5, 17, 9, 30, 12, 345678)
+        token = encode_cursor(timestamp, 42)
+        self.assertRegex(token, r'^[A-Za-z0-9_-]+$')
+        self.assertEqual(decode_cursor(token), (timestamp, 42))
+
+    def test_stable(self):
+        """The same position always gives the same token."""
+        timestamp = datetime(2024, 5, 17, 9, 30)
+        self.assertEqual(encode_cursor(timestamp, 7), encode_cursor(timestamp, 7))
+
+    def test_invalid_tokens(self):
+        """Malformed tokens raise InvalidCursor."""
+        for token in ('', 'not base64!', 'bm90IGpzb24', encode_cursor(datetime(2024, 1, 1), 1)[:-3],
+                      'WyIyMDI0LTAxLTAxVDAwOjAwOjAwIiwiMSJd', 'WyJub3QgYSBkYXRlIiwxXQ'):
+            with self.subTest(token=token), self.assertRaises(InvalidCursor):
+                decode_cursor(token)
+
+if __name__ == '__main__':
+    unittest.main()
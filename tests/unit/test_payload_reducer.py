@@ -0,0 +1,134 @@
+import json
+import unittest
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from app.services import payload_reducer
+from app.services.payload_reducer import (
+    reduce_frame, normalize_options, lttb_indices, frame_to_records_json, frame_to_columns_json
+)
+
+class PayloadReducerTestCase(unittest.TestCase):
+    """Test cases for dashboard payload reduction."""
+
+    def _frame(self, n=10000):
+        rng = np.random.default_rng(1)
+        return pd.DataFrame({
+            'day': pd.date_range('2020-01-01', periods=n, freq='h').strftime('%Y-%m-%d %H:%M'),
+            'value': np.cumsum(rng.normal(size=n)),
+            'region': rng.choice(['north', 'south', 'rare'], n, p=[0.7, 0.299, 0.001]),
+        })
+
+    def test_small_frames_are_sent_whole(self):
+        """Datasets within the budget are not reduced."""
+        df = self._frame(100)
+        reduced, info = reduce_frame(df, None, max_rows=1000)
+        self.assertIs(reduced, df)
+        self.assertFalse(info['reduced'])
+
+    def test_uniform_sample_respects_row_and_byte_caps(self):
+        """The budget is the smaller of the row cap and what fits in the byte cap."""
+        df = self._frame()
+        reduced, info = reduce_frame(df, {'mode': 'uniform'}, max_rows=5000)
+        self.assertEqual(info['rows'], 5000)
+        self.assertTrue(reduced.index.is_monotonic_increasing)
+
+        reduced, info = reduce_frame(df, {'mode': 'full'}, max_rows=10, max_bytes=50000)
+        self.assertLessEqual(len(frame_to_records_json(reduced)), 50000 * 1.1)
+        self.assertGreater(info['rows'], 10)
+
+    def test_per_visualisation_budget_cannot_exceed_global_cap(self):
+        """A visualisation's max_rows can lower the budget but not raise it."""
+        df = self._frame()
+        self.assertEqual(reduce_frame(df, {'max_rows': 50}, max_rows=1000)[1]['rows'], 50)
+        self.assertEqual(reduce_frame(df, {'max_rows': 5000}, max_rows=1000)[1]['rows'], 1000)
+
+    def test_stratified_sample_keeps_rare_groups(self):
+        """Every group is represented, roughly in proportion."""
+        df = self._frame()
+        reduced, _ = reduce_frame(df, {'mode': 'stratified', 'stratify_by': 'region'}, max_rows=200)
+        counts = reduced['region'].value_counts()
+        self.assertIn('rare', counts)
+        self.assertAlmostEqual(counts['north'] / len(reduced), 0.7, delta=0.05)
+
+    def test_stratified_sample_stays_within_budget(self):
+        """Many small groups do not push the sample over its budget."""
+        df = self._frame()
+        df['bucket'] = np.arange(len(df)) % 150
+        df.loc[:99, 'bucket'] = -1  # one large group, the rest about 66 rows each
+        for max_rows in (100, 200, 1000):
+            reduced, info = reduce_frame(df, {'mode': 'stratified', 'stratify_by': 'bucket'}, max_rows=max_rows)
+            self.assertLessEqual(len(reduced), max_rows)
+            self.assertEqual(info['rows'], len(reduced))
+        # More groups than rows in the budget: a uniform sample of exactly the budget
+        df['id'] = np.arange(len(df))
+        reduced, _ = reduce_frame(df, {'mode': 'stratified', 'stratify_by': 'id'}, max_rows=100)
+        self.assertEqual(len(reduced), 100)
+
+    def test_lttb_keeps_extremes_and_order(self):
+        """LTTB output is ordered by x, keeps both ends and the global peak."""
+        x = np.arange(1000, dtype=float)
+        y = np.sin(x / 50)
+        y[437] = 10
+        indices = lttb_indices(x, y, 100)
+        self.assertEqual(len(indices), 100)
+        self.assertEqual(indices[0], 0)
+        self.assertEqual(indices[-1], 999)
+        self.assertIn(437, indices)
+        self.assertTrue(np.all(np.diff(indices) > 0))
+
+        reduced, info = reduce_frame(self._frame(), {'mode': 'lttb', 'x': 'day', 'y': 'value'}, max_rows=300)
+        self.assertEqual(info['rows'], 300)
+        self.assertTrue(reduced['day'].is_monotonic_increasing)
+
+    def test_aggregate_builds_group_table(self):
+        """Aggregation returns one row per group with the requested statistics."""
+        df = self._frame()
+        reduced, info = reduce_frame(df, {'mode': 'aggregate', 'group_by': 'region', 'aggregates': {'value': 'sum'}})
+        self.assertEqual(list(reduced.columns), ['region', 'value', 'count'])
+        self.assertEqual(reduced['count'].sum(), len(df))
+        self.assertAlmostEqual(reduced.set_index('region').loc['north', 'value'], df[df.region == 'north']['value'].sum())
+        self.assertTrue(info['reduced'])
+
+    def test_invalid_options(self):
+        """Unknown keys, modes and columns are rejected."""
+        for options in ({'mode': 'magic'}, {'max_rows': 0}, {'colour': 'red'}, {'aggregates': {'value': 'p99'}}):
+            with self.assertRaises(ValueError):
+                normalize_options(options)
+        with self.assertRaises(ValueError):
+            reduce_frame(self._frame(), {'mode': 'stratified', 'stratify_by': 'missing'}, max_rows=10)
+
+    def test_records_json_uses_null_for_missing_values(self):
+        """Missing values become null so the payload is valid JSON."""
+        payload = frame_to_records_json(pd.DataFrame({'a': [1.5, np.nan]}))
+        self.assertEqual(json.loads(payload), [{'a': 1.5}, {'a': None}])
+    def test_columns_format_round_trips(self):
+        """Column payloads carry the same values as records, with and without orjson."""
+        df = pd.DataFrame({
+            'x': [1.25, np.nan, 3.0],
+            'n': [1, 2, 3],
+            'flag': [True, False, True],
+            'label': ['a', None, 'c'],
+            'when': pd.to_datetime(['2024-01-01', None, '2024-03-01']),
+            'maybe': pd.array([1, None, 3], dtype='Int64'),
+        })
+        records = json.loads(frame_to_records_json(df))
+        for encoder in (payload_reducer.orjson, None):
+            with patch.object(payload_reducer, 'orjson', encoder):
+                payload = json.loads(frame_to_columns_json(df))
+            names = [field['name'] for field in payload['schema']]
+            self.assertEqual([field['type'] for field in payload['schema']],
+                             ['number', 'integer', 'boolean', 'string', 'datetime', 'integer'])
+            rows = [dict(zip(names, values)) for values in zip(*payload['columns'])]
+            self.assertEqual(payload['length'], 3)
+            for row, record in zip(rows, records):
+                self.assertEqual({k: v for k, v in row.items() if k != 'when'}, {k: v for k, v in record.items() if k != 'when'})
+                self.assertEqual(row['when'] is None, record['when'] is None)
+
+    def test_columns_format_is_smaller(self):
+        """Sending each column name once makes the payload much smaller than records."""
+        df = self._frame(2000)
+        self.assertLess(len(frame_to_columns_json(df)), 0.8 * len(frame_to_records_json(df)))
+
+if __name__ == '__main__':
+    unittest.main()
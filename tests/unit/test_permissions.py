@@ -0,0 +1,119 @@
+import unittest
+from flask_login import login_user
+from app import create_app, db
+from app.models import User, Dataset, Visualisation, Share
+from app.permissions import (
+    OWNER, SHARED, PUBLIC, dataset_access, dataset_access_many, visualisation_access,
+    visualisation_access_many, forget_access
+)
+from tests.query_count import QueryCountMixin
+
+
+class PermissionsTestCase(QueryCountMixin, unittest.TestCase):
+    """Test cases for the access resolver in app/permissions.py."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.owner = User(name='Owner', email='owner@example.com', password_hash='unused')
+        self.viewer = User(name='Viewer', email='viewer@example.com', password_hash='unused')
+        db.session.add_all([self.owner, self.viewer])
+        db.session.commit()
+        self.private = self._dataset('private.csv', is_public=False)
+        self.shared = self._dataset('shared.csv', is_public=False)
+        self.public = self._dataset('public.csv', is_public=True)
+        self.private_vis = self._visualisation(self.private)
+        self.shared_vis = self._visualisation(self.private)
+        self.shared_dataset_vis = self._visualisation(self.shared)
+        self.public_vis = self._visualisation(self.public)
+        db.session.add_all([
+            Share(owner_id=self.owner.id, target_id=self.viewer.id, object_type='dataset', object_id=self.shared.id),
+            Share(owner_id=self.owner.id, target_id=self.viewer.id, object_type='visualisation', object_id=self.shared_vis.id)
+        ])
+        db.session.commit()
+
+        self.request_context = self.app.test_request_context()
+        self.request_context.push()
+        login_user(self.viewer)
+
+    def tearDown(self):
+        """Clean up the test environment."""
+        self.request_context.pop()
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _dataset(self, name, is_public):
+        dataset = Dataset(
+            user_id=self.owner.id, filename=name, original_filename=name, file_path=f'/nonexistent/{name}',
+            file_type='csv', n_rows=10, n_columns=2, is_public=is_public
+        )
+        db.session.add(dataset)
+        db.session.commit()
+        return dataset
+
+    def _visualisation(self, dataset):
+        visualisation = Visualisation(dataset_id=dataset.id, title=dataset.filename, spec='<div></div>')
+        db.session.add(visualisation)
+        db.session.commit()
+        return visualisation
+
+    def test_dataset_levels(self):
+        """Shared and public datasets are viewable; others are not."""
+        self.assertEqual(dataset_access(self.shared.id).level, SHARED)
+        self.assertEqual(dataset_access(self.public.id).level, PUBLIC)
+        private = dataset_access(self.private.id)
+        self.assertIsNone(private.level)
+        self.assertFalse(private.can_view)
+        self.assertIsNone(dataset_access(9999))
+
+    def test_owner_level(self):
+        """The uploader owns the dataset and every dashboard built on it."""
+        login_user(self.owner)
+        access = visualisation_access(self.private_vis.id)
+        self.assertEqual(access.level, OWNER)
+        self.assertTrue(access.is_owner)
+        self.assertEqual(access.dataset.id, self.private.id)
+
+    def test_visualisation_levels(self):
+        """Dashboards are viewable when shared or when their dataset is public, not when only the dataset is shared."""
+        access = visualisation_access_many([
+            self.private_vis.id, self.shared_vis.id, self.shared_dataset_vis.id, self.public_vis.id, 9999
+        ])
+        self.assertIsNone(access[self.private_vis.id].level)
+        self.assertEqual(access[self.shared_vis.id].level, SHARED)
+        self.assertIsNone(access[self.shared_dataset_vis.id].level)
+        self.assertEqual(access[self.public_vis.id].level, PUBLIC)
+        self.assertIsNone(access[9999])
+
+    def test_batch_is_one_query(self):
+        """Resolving many objects issues a single statement."""
+        ids = [self.private.id, self.shared.id, self.public.id]
+        with self.assertMaxQueries(1):
+            access = dataset_access_many(ids)
+        self.assertEqual(set(access), set(ids))
+
+    def test_memoized_for_the_request(self):
+        """A repeated check in the same request issues no statement until forgotten."""
+        self.assertTrue(visualisation_access(self.shared_vis.id).can_view)
+        with self.assertMaxQueries(0):
+            self.assertTrue(visualisation_access(self.shared_vis.id).can_view)
+            visualisation_access_many([self.shared_vis.id])
+
+        Share.query.filter_by(object_type='visualisation', object_id=self.shared_vis.id).delete()
+        db.session.commit()
+        forget_access()
+        self.assertFalse(visualisation_access(self.shared_vis.id).can_view)
+
+    def test_memo_is_per_user(self):
+        """Switching users in a request does not reuse the other user's results."""
+        self.assertIsNone(dataset_access(self.private.id).level)
+        login_user(self.owner)
+        self.assertEqual(dataset_access(self.private.id).level, OWNER)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+import numpy as np
+import pandas as pd
+from app import create_app, db
+from app.models import User, Dataset
+from app.services import claude_service
+from app.services.cleaning import clean_frame
+from app.services.profiling import ProfileBuilder, profile_frame
+
+class ProfileFrameTestCase(unittest.TestCase):
+    """Test cases for column profiles."""
+
+    def _sample_frame(self, n=500):
+        rng = np.random.default_rng(3)
+        return pd.DataFrame({
+            'amount': rng.normal(10, 2, n),
+            'count': rng.integers(0, 50, n),
+            'region': rng.choice(['north', 'south', 'east'], n),
+            'note': [f'note {i}' for i in range(n)],
+            'when': pd.date_range('2024-01-01', periods=n, freq='h'),
+        })
+
+    def test_matches_pandas_statistics(self):
+        """Numeric, text and datetime statistics match what pandas computes."""
+        df = self._sample_frame()
+        profile = profile_frame(df)
+
+        amount = profile['amount']
+        self.assertEqual(amount['type'], 'float64')
+        self.assertAlmostEqual(amount['mean'], df['amount'].mean())
+        self.assertAlmostEqual(amount['median'], df['amount'].median())
+        self.assertAlmostEqual(amount['std'], df['amount'].std())
+        self.assertEqual(amount['min'], df['amount'].min())
+
+        self.assertEqual(profile['region']['unique_values'], 3)
+        self.assertEqual(profile['region']['top_values'], df['region'].value_counts().to_dict())
+        self.assertEqual(profile['note']['example_values'], ['note 0', 'note 1', 'note 2'])
+        self.assertEqual(profile['when']['type'], 'datetime')
+        self.assertEqual(profile['when']['min'], '2024-01-01T00:00:00')
+
+    def test_chunked_profile_matches_full_frame(self):
+        """Feeding chunks gives the same profile as the whole frame."""
+        df = self._sample_frame()
+        builder = ProfileBuilder()
+        for start in range(0, len(df), 128):
+            builder.update(df.iloc[start:start + 128])
+        chunked, full = builder.result(), profile_frame(df)
+
+        self.assertEqual(chunked.keys(), full.keys())
+        for col in ('amount', 'count'):
+            for stat in ('min', 'max', 'mean', 'median', 'std'):
+                self.assertAlmostEqual(chunked[col][stat], full[col][stat])
+        self.assertEqual(chunked['region'], full['region'])
+        self.assertEqual(chunked['note'], full['note'])
+
+class StoredProfileTestCase(unittest.TestCase):
+    """Test cases for profiles stored on datasets."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        self.test_upload_dir = tempfile.mkdtemp()
+        self.user = User(name='Test User', email='test@example.com', password='password')
+        db.session.add(self.user)
+        db.session.commit()
+
+        self.file_path = os.path.join(self.test_upload_dir, 'data.csv')
+        clean_frame(pd.DataFrame({'a': [1, 2, 3], 'b': ['x', 'y', 'x']})).to_csv(self.file_path, index=False)
+        self.dataset = Dataset(
+            user_id=self.user.id, filename='data.csv', original_filename='data.csv',
+            file_path=self.file_path, file_type='csv', n_rows=3, n_columns=3
+        )
+        db.session.add(self.dataset)
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+        shutil.rmtree(self.test_upload_dir, ignore_errors=True)
+
+    def test_metadata_uses_stored_profile(self):
+        """Prompt metadata comes from the stored profile without reading the file."""
+        self.dataset.profile = {'a': {'type': 'int64', 'name': 'a', 'min': 1.0}}
+        db.session.commit()
+        with patch('app.services.profiling.load_dataset_frame') as mock_load:
+            metadata = claude_service._get_dataset_metadata(self.dataset.id)
+        mock_load.assert_not_called()
+        self.assertEqual(metadata['column_info'], self.dataset.profile)
+
+    def test_missing_profile_is_backfilled_once(self):
+        """Datasets without a profile are profiled on first use and the result is saved."""
+        metadata = claude_service._get_dataset_metadata(self.dataset.id)
+        self.assertEqual(metadata['column_info']['b']['unique_values'], 2)
+
+        db.session.expire_all()
+        self.assertEqual(db.session.get(Dataset, self.dataset.id).profile, metadata['column_info'])
+        with patch('app.services.profiling.load_dataset_frame') as mock_load:
+            claude_service._get_dataset_metadata(self.dataset.id)
+        mock_load.assert_not_called()
+
+if __name__ == '__main__':
+    unittest.main()
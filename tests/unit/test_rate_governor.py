@@ -0,0 +1,151 @@
+import os
+import time
+import shutil
+import asyncio
+import threading
+import tempfile
+import unittest
+from unittest.mock import patch, MagicMock
+from app.services.rate_governor import MemoryBucketStore, SQLiteBucketStore, RateGovernor
+
+
+def _governor(**config):
+    governor = RateGovernor()
+    governor.init_app(MagicMock(config=config, extensions={}))
+    return governor
+
+
+class RateGovernorTestCase(unittest.TestCase):
+    """Test cases for the Claude API rate governor."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.tmp_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Clean up the test environment."""
+        shutil.rmtree(self.tmp_dir, ignore_errors=True)
+
+    def test_buckets_refill_at_the_limit(self):
+        """A bucket holds a minute's allowance and refills at limit/60 per second."""
+        store = MemoryBucketStore({'requests': 60, 'output_tokens': 600, 'input_tokens': 0})
+        now = time.time()
+        with patch('app.services.rate_governor.time.time', return_value=now):
+            self.assertEqual(store.take({'requests': 1, 'output_tokens': 590}), 0)
+            self.assertAlmostEqual(store.take({'requests': 1, 'output_tokens': 20}), 1.0)
+            store.give_back({'output_tokens': 100})  # the call used less than it reserved
+            self.assertEqual(store.take({'requests': 1, 'output_tokens': 20}), 0)
+            self.assertEqual(store.clamp({'output_tokens': 5000, 'input_tokens': 5000}), {'output_tokens': 600, 'input_tokens': 5000})
+        with patch('app.services.rate_governor.time.time', return_value=now + 6):
+            self.assertAlmostEqual(store.levels()['output_tokens'], 90 + 60)
+            store.pause(30)
+            self.assertAlmostEqual(store.take({'requests': 1}), 30)
+
+    def test_sqlite_buckets_are_shared(self):
+        """Two stores on the same file (as in two workers) draw from one budget."""
+        path = os.path.join(self.tmp_dir, 'rate.sqlite3')
+        first, second = SQLiteBucketStore({'requests': 10}, path), SQLiteBucketStore({'requests': 10}, path)
+        self.assertEqual(first.take({'requests': 6}), 0)
+        self.assertGreater(second.take({'requests': 6}), 0)
+        self.assertEqual(second.take({'requests': 4}), 0)
+        second.pause(5)
+        self.assertGreater(first.take({'requests': 0}), 4)
+
+    def test_waiting_calls_are_served_per_user_in_turn(self):
+        """A burst from one user does not push another user's call to the back of the queue."""
+        governor = _governor(ANTHROPIC_MAX_CONCURRENT=1)
+        order, depths = [], []
+
+        async def call(user):
+            async with governor.slot(user):
+                order.append(user)
+                await asyncio.sleep(0.01)
+                depths.append(governor.queue_depth('heavy'))
+
+        async def main():
+            await asyncio.gather(*[call('heavy') for _ in range(5)], call('light'))
+        asyncio.run(main())
+
+        self.assertEqual(len(order), 6)
+        self.assertLessEqual(order.index('light'), 2)
+        self.assertEqual(depths[0], {'queued': 5, 'in_flight': 1, 'queued_for_user': 4})
+        self.assertEqual(governor.queue_depth(), {'queued': 0, 'in_flight': 0})
+
+    def test_rate_limit_spaces_calls(self):
+        """Once the budget is spent, calls proceed at the refill rate instead of all at once."""
+        governor = _governor(ANTHROPIC_RPM_LIMIT=240)
+        governor._store.take({'requests': 240})
+        started = time.monotonic()
+
+        async def main():
+            for _ in range(3):
+                async with governor.slot('user'):
+                    pass
+        asyncio.run(main())
+        self.assertGreaterEqual(time.monotonic() - started, 0.5)
+
+    def test_pause_holds_calls_without_a_bucket_store(self):
+        """A pause (e.g. after a 429) delays the next call when only the concurrency is limited."""
+        governor = _governor(ANTHROPIC_MAX_CONCURRENT=2)
+        self.assertIsNone(governor._store)
+        governor.pause(0.3)
+        started = time.monotonic()
+
+        async def main():
+            async with governor.slot('user'):
+                pass
+        asyncio.run(main())
+        self.assertGreaterEqual(time.monotonic() - started, 0.3)
+
+    def test_cancelled_waiter_leaves_the_queue(self):
+        """A call cancelled while queued frees its place and does not hold a slot."""
+        governor = _governor(ANTHROPIC_MAX_CONCURRENT=1)
+
+        async def main():
+            async with governor.slot('a'):
+                waiter = asyncio.create_task(governor.slot('b').__aenter__())
+                await asyncio.sleep(0.01)
+                self.assertEqual(governor.queue_depth()['queued'], 1)
+                waiter.cancel()
+                await asyncio.gather(waiter, return_exceptions=True)
+                self.assertEqual(governor.queue_depth(), {'queued': 0, 'in_flight': 1})
+        asyncio.run(main())
+        self.assertEqual(governor.queue_depth()['in_flight'], 0)
+
+    def test_store_is_not_used_on_the_event_loop(self):
+        """Bucket updates, which may wait on the SQLite lock, run in worker threads while the loop keeps going."""
+        governor = _governor(ANTHROPIC_RPM_LIMIT=600, ANTHROPIC_RATE_STATE_PATH=os.path.join(self.tmp_dir, 'rate.sqlite3'))
+        store, threads, ticks = governor._store, [], []
+        take, give_back = store.take, store.give_back
+
+        def slow_take(amounts):
+            threads.append(threading.get_ident())
+            time.sleep(0.2)
+            return take(amounts)
+
+        def recording_give_back(amounts):
+            threads.append(threading.get_ident())
+            return give_back(amounts)
+
+        async def ticker():
+            for _ in range(10):
+                ticks.append(time.monotonic())
+                await asyncio.sleep(0.005)
+
+        async def call():
+            async with governor.slot('user', 10, 100) as permit:
+                permit.settle(5, 50)
+
+        async def main():
+            await asyncio.gather(call(), ticker())
+            return threading.get_ident()
+
+        with patch.object(store, 'take', slow_take), patch.object(store, 'give_back', recording_give_back):
+            loop_thread = asyncio.run(main())
+        self.assertEqual(len(threads), 2)
+        self.assertNotIn(loop_thread, threads)
+        self.assertLess(ticks[-1] - ticks[0], 0.2)
+        self.assertEqual(governor.queue_depth(), {'queued': 0, 'in_flight': 0})
+
+if __name__ == '__main__':
+    unittest.main()
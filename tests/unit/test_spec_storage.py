@@ -0,0 +1,129 @@
+import unittest
+from unittest import mock
+from app import create_app, db
+from app.models import User, Dataset, Visualisation, DashboardAsset
+from app.services import spec_storage
+from app.services.claude_client import ClaudeClient
+from app.services.dashboard_template import prepare_dashboard_template_html, RESPONSIVE_CSS, ERROR_HANDLING_SCRIPT
+from tests.query_count import QueryCountMixin
+
+
+class SpecStorageTestCase(QueryCountMixin, unittest.TestCase):
+    """Test cases for compressed dashboard template storage."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app('testing')
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+        spec_storage._asset_contents.clear()
+
+        user = User(name='Test User', email='test@example.com', password_hash='unused')
+        db.session.add(user)
+        db.session.commit()
+        dataset = Dataset(
+            user_id=user.id, filename='sales.csv', original_filename='sales.csv', file_path='/nonexistent/sales.csv',
+            file_type='csv', n_rows=10, n_columns=2
+        )
+        db.session.add(dataset)
+        db.session.commit()
+        self.dataset_id = dataset.id
+        self.html = prepare_dashboard_template_html(
+            '<html><head><title>Sales</title></head><body><canvas id="chart1"></canvas></body></html>'
+        )
+
+    def tearDown(self):
+        """Clean up the test environment."""
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def _save(self, html):
+        visualisation = Visualisation(dataset_id=self.dataset_id, title='Sales', spec=html)
+        db.session.add(visualisation)
+        db.session.commit()
+        return visualisation.id
+
+    def _load(self, visualisation_id):
+        db.session.expunge_all()
+        spec_storage._asset_contents.clear()
+        return db.session.get(Visualisation, visualisation_id)
+
+    def test_round_trip(self):
+        """A stored template reads back unchanged."""
+        visualisation = self._load(self._save(self.html))
+        self.assertEqual(visualisation.spec, self.html)
+        self.assertEqual(self._load(self._save('<div>plain</div>')).spec, '<div>plain</div>')
+
+    def test_boilerplate_is_stored_once(self):
+        """Injected boilerplate becomes shared assets referenced by every template."""
+        first, second = self._save(self.html), self._save(self.html)
+        self.assertEqual(DashboardAsset.query.count(), 2)
+        for visualisation_id in (first, second):
+            visualisation = self._load(visualisation_id)
+            stored = spec_storage.decompress(visualisation.spec_blob, visualisation.spec_codec)
+            self.assertNotIn(RESPONSIVE_CSS, stored)
+            self.assertNotIn(ERROR_HANDLING_SCRIPT, stored)
+            self.assertIn('<!--dynadash-asset:responsive-css@', stored)
+            self.assertLess(len(visualisation.spec_blob), len(self.html) // 4)
+
+    def test_setting_spec_does_not_touch_the_database(self):
+        """Assigning a template only compresses it; its assets are saved when the row is flushed."""
+        with self.assertMaxQueries(0):
+            visualisation = Visualisation(dataset_id=self.dataset_id, title='Sales', spec=self.html)
+        self.assertEqual(DashboardAsset.query.count(), 0)
+        db.session.add(visualisation)
+        db.session.add(Visualisation(dataset_id=self.dataset_id, title='Again', spec=self.html))
+        db.session.commit()
+        self.assertEqual(DashboardAsset.query.count(), 2)
+
+        self.app_context.pop()
+        try:
+            blob, codec, assets = spec_storage.pack_spec(self.html)
+        finally:
+            self.app_context.push()
+        self.assertEqual(codec, 'zlib')
+        self.assertEqual(len(assets), 2)
+
+    def test_generated_template_references_both_assets(self):
+        """A template as generation produces it (sanitized, then prepared) keeps no copy of either asset."""
+        raw = ('<html><head><title>Sales</title></head><body><canvas id="chart1"></canvas>'
+               '<script>new Chart(document.getElementById("chart1"), {});</script></body></html>')
+        html = prepare_dashboard_template_html(ClaudeClient()._sanitize_dashboard_html(raw))
+        blob, codec, assets = spec_storage.pack_spec(html)
+        self.assertEqual({name for name, version, content in assets}, {'responsive-css', 'error-handler'})
+        stored = spec_storage.decompress(blob, codec)
+        self.assertIn('<!--dynadash-asset:responsive-css@', stored)
+        self.assertIn('<!--dynadash-asset:error-handler@', stored)
+        self.assertNotIn("console.error('Dashboard error:'", stored)
+        self.assertEqual(spec_storage.unpack_spec(blob, codec), html)
+
+    def test_changed_boilerplate_keeps_old_versions(self):
+        """Templates saved before the boilerplate changed still expand to their own version."""
+        old = self._save(self.html)
+        with mock.patch.dict(spec_storage.DASHBOARD_ASSETS, {'responsive-css': '<style>/* v2 */</style>'}):
+            new_html = self.html.replace(RESPONSIVE_CSS, '<style>/* v2 */</style>')
+            new = self._save(new_html)
+        self.assertEqual(DashboardAsset.query.filter_by(name='responsive-css').count(), 2)
+        self.assertEqual(self._load(old).spec, self.html)
+        self.assertEqual(self._load(new).spec, new_html)
+
+    def test_zlib_fallback(self):
+        """SPEC_COMPRESSION=zlib, or zstd without the zstandard package, stores zlib."""
+        self.app.config['SPEC_COMPRESSION'] = 'zlib'
+        self.assertEqual(self._load(self._save(self.html)).spec_codec, 'zlib')
+        self.app.config['SPEC_COMPRESSION'] = 'zstd'
+        with mock.patch.object(spec_storage, 'zstandard', None):
+            self.assertEqual(self._load(self._save(self.html)).spec_codec, 'zlib')
+
+    @unittest.skipUnless(spec_storage.zstandard, 'zstandard is not installed')
+    def test_zstd(self):
+        """Templates are zstd-compressed when zstandard is installed."""
+        self.app.config['SPEC_COMPRESSION'] = 'zstd'
+        visualisation = self._load(self._save(self.html))
+        self.assertEqual(visualisation.spec_codec, 'zstd')
+        self.assertEqual(visualisation.spec, self.html)
+
+if __name__ == '__main__':
+    unittest.main()
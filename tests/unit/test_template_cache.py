@@ -0,0 +1,120 @@
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch, AsyncMock, MagicMock
+from app import create_app, db
+from app.models import User, Dataset, TemplateCacheEntry
+from app.services import claude_service
+from app.services.template_cache import (
+    template_cache_key, get_cached_template, store_template, evict, template_cache_stats, clear_templates
+)
+
+def _params(prompt='Build a dashboard\n  for sales', **overrides):
+    params = {
+        'model': 'claude-test', 'max_tokens': 100, 'temperature': 0.7,
+        'system': 'You build dashboards.', 'messages': [{'role': 'user', 'content': prompt}]
+    }
+    params.update(overrides)
+    return params
+
+
+class TemplateCacheTestCase(unittest.TestCase):
+    """Test cases for the generated dashboard template cache."""
+
+    def setUp(self):
+        """Set up the test environment."""
+        self.app = create_app('testing')
+        self.app.config['ANTHROPIC_API_KEY'] = 'test-key'
+        self.app.config['ANTHROPIC_STREAM'] = False
+        claude_service.init_app(self.app)
+        self.app_context = self.app.app_context()
+        self.app_context.push()
+        db.create_all()
+
+        self.user = User(name='Test User', email='test@example.com', password='password')
+        db.session.add(self.user)
+        db.session.commit()
+        self.dataset = Dataset(
+            user_id=self.user.id, filename='sales.csv', original_filename='sales.csv', file_path='/nonexistent/sales.csv',
+            file_type='csv', n_rows=10, n_columns=1, profile={'amount': {'name': 'amount', 'type': 'float64'}}
+        )
+        db.session.add(self.dataset)
+        db.session.commit()
+
+    def tearDown(self):
+        """Clean up the test environment."""
+        claude_service.init_app(self.app)
+        db.session.remove()
+        db.drop_all()
+        self.app_context.pop()
+
+    def test_key_normalizes_prompt_formatting(self):
+        """Indentation and blank lines do not change the key; model settings do."""
+        key = template_cache_key(_params())
+        self.assertEqual(key, template_cache_key(_params('\n    Build a dashboard\n\n    for sales\n')))
+        self.assertNotEqual(key, template_cache_key(_params('Build a dashboard for revenue')))
+        self.assertNotEqual(key, template_cache_key(_params(model='claude-other')))
+        self.assertNotEqual(key, template_cache_key(_params(temperature=0.2)))
+        self.assertEqual(len(key), 64)
+
+    def test_hits_misses_and_stats(self):
+        """Lookups are counted and hits refresh the entry."""
+        self.assertIsNone(get_cached_template('a' * 64))
+        store_template('a' * 64, 'claude-test', '<html>a</html>')
+        self.assertEqual(get_cached_template('a' * 64), '<html>a</html>')
+        self.assertEqual(get_cached_template('a' * 64), '<html>a</html>')
+
+        stats = template_cache_stats()
+        self.assertEqual((stats['entries'], stats['hits'], stats['misses']), (1, 2, 1))
+        self.assertAlmostEqual(stats['hit_rate'], 2 / 3)
+        self.assertEqual(stats['size_bytes'], len('<html>a</html>'))
+
+        self.assertEqual(clear_templates(), 1)
+        self.assertEqual(template_cache_stats()['hits'], 0)
+
+    def test_least_recently_used_are_evicted(self):
+        """Eviction keeps the most recently used entries within the count and size limits."""
+        now = datetime.utcnow()
+        for i in range(5):
+            store_template(str(i) * 64, 'claude-test', 'x' * 100)
+            TemplateCacheEntry.query.filter_by(key=str(i) * 64).update({'last_used_at': now - timedelta(minutes=10 - i)})
+        db.session.commit()
+        get_cached_template('0' * 64)  # the oldest entry becomes the most recent
+
+        self.assertEqual(evict(max_entries=3, max_bytes=10_000), 2)
+        self.assertEqual({entry.key[0] for entry in TemplateCacheEntry.query}, {'0', '3', '4'})
+        self.assertEqual(evict(max_entries=3, max_bytes=250), 1)
+        self.assertEqual({entry.key[0] for entry in TemplateCacheEntry.query}, {'0', '4'})
+
+    def test_generation_reuses_cached_template(self):
+        """A second identical generation does not call Claude; use_cache=False does and refreshes the entry."""
+        response = MagicMock(content=[MagicMock(type='text', text='<!DOCTYPE html><html><head></head><body>v1</body></html>')],
+                             stop_reason='end_turn')
+        with patch.object(claude_service, '_create_message', new_callable=AsyncMock, return_value=response) as create:
+            first = asyncio.run(claude_service.agenerate_dashboard(self.dataset.id, 'Sales', 'Monthly'))
+            second = asyncio.run(claude_service.agenerate_dashboard(self.dataset.id, 'Sales', 'Monthly'))
+            self.assertEqual(first, second)
+            self.assertEqual(create.await_count, 1)
+
+            asyncio.run(claude_service.agenerate_dashboard(self.dataset.id, 'Sales', 'Quarterly'))
+            self.assertEqual(create.await_count, 2)
+
+            response.content[0].text = response.content[0].text.replace('v1', 'v2')
+            fresh = asyncio.run(claude_service.agenerate_dashboard(self.dataset.id, 'Sales', 'Monthly', use_cache=False))
+            self.assertEqual(create.await_count, 3)
+            self.assertIn('v2', fresh)
+            self.assertIn('v2', asyncio.run(claude_service.agenerate_dashboard(self.dataset.id, 'Sales', 'Monthly')))
+            self.assertEqual(create.await_count, 3)
+
+    def test_cache_can_be_disabled(self):
+        """With TEMPLATE_CACHE_ENABLED off every generation calls Claude and nothing is stored."""
+        self.app.config['TEMPLATE_CACHE_ENABLED'] = False
+        response = MagicMock(content=[MagicMock(type='text', text='<!DOCTYPE html><html></html>')], stop_reason='end_turn')
+        with patch.object(claude_service, '_create_message', new_callable=AsyncMock, return_value=response) as create:
+            asyncio.run(claude_service.agenerate_dashboard(self.dataset.id, 'Sales'))
+            asyncio.run(claude_service.agenerate_dashboard(self.dataset.id, 'Sales'))
+        self.assertEqual(create.await_count, 2)
+        self.assertEqual(TemplateCacheEntry.query.count(), 0)
+
+if __name__ == '__main__':
+    unittest.main()